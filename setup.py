@@ -13,10 +13,18 @@ setup(name='tap-hubspot',
           'attrs==16.3.0',
           'singer-python==5.13.0',
           'requests==2.20.0',
-          'backoff==1.8.0',
           'requests_mock==1.3.0',
       ],
       extras_require= {
+          'fast_json': [
+              'orjson',
+          ],
+          'token_cache': [
+              'cryptography',
+          ],
+          'http2': [
+              'httpx[http2]',
+          ],
           'dev': [
               'pylint==2.5.3',
               'nose==1.3.7',
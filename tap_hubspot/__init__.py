@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
+import copy
 import datetime
+import hashlib
 import pytz
 import itertools
 import os
 import re
 import sys
 import json
+import time
 # pylint: disable=import-error,too-many-statements
 import attr
-import backoff
 import requests
 import singer
 import singer.messages
@@ -18,9 +20,55 @@ from singer import utils
 from singer import (transform,
                     UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING,
                     Transformer, _transform_datetime)
+from tap_hubspot.engine import RequestEngine
+from tap_hubspot.transport import Transport, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+from tap_hubspot.transport_http2 import Http2Transport, http2_available
+from tap_hubspot.rate_limit import RateLimiter, DEFAULT_HEADROOM
+from tap_hubspot.retry import SleepLedger, build_policies, with_retries
+from tap_hubspot.circuit_breaker import CircuitBreakerRegistry
+from tap_hubspot.streaming import BufferedPage, StreamingPage
+from tap_hubspot.auth import TokenManager, DEFAULT_REFRESH_MARGIN
+from tap_hubspot.token_cache import TokenCache
+from tap_hubspot.coalesce import RequestCoalescer
+from tap_hubspot.latency import LatencyTracker, endpoint_key
+from tap_hubspot.hedging import Hedger, DEFAULT_PERCENTILE, DEFAULT_BUDGET
+from tap_hubspot.timeouts import TimeoutPolicy, DEFAULT_ADAPTIVE_FACTOR, DEFAULT_ADAPTIVE_MIN
+from tap_hubspot.concurrency import AIMDController, DEFAULT_LATENCY_SPIKE
+from tap_hubspot.quota import QuotaLedger
+from tap_hubspot.http_metrics import EndpointTemplates, HttpMetrics, on_body_size
+from tap_hubspot.request_log import RequestTracer, DEFAULT_SAMPLE_RATE, DEFAULT_REDACTED_PARAMS
+from tap_hubspot.prefetch import iter_pages
+from tap_hubspot.batching import (DEFAULT_MAX_URL_LENGTH, url_length, pack, split_on_error,
+                                  repeated_param_length, joined_param_length)
+from tap_hubspot import pipeline
+from tap_hubspot.transform_pool import TransformPool
+from tap_hubspot.compiled_transform import CompiledTransformer
+from tap_hubspot.writer import MessageWriter, DEFAULT_BUFFER_SIZE, DEFAULT_FLUSH_INTERVAL
 
 LOGGER = singer.get_logger()
-SESSION = requests.Session()
+TRANSPORT = Transport()
+RATE_LIMITER = RateLimiter()
+RETRY_POLICIES = build_policies()
+# Seconds slept in retry backoff, by the stream being synced at the time
+RETRY_SLEEP = SleepLedger()
+CURRENT_STREAM = None
+CIRCUIT_BREAKERS = CircuitBreakerRegistry()
+REQUEST_COALESCER = RequestCoalescer()
+# Recent GET latencies by endpoint, e.g. `/companies/v2/companies/{id}`
+LATENCY = LatencyTracker()
+# Pool the concurrent detail fetches are issued on, sized by `max_concurrency`
+ENGINE = RequestEngine()
+HEDGER = None
+TIMEOUT_POLICY = None
+# Adaptive limit on the calls in flight, when `adaptive_concurrency` is set
+CONCURRENCY = None
+# Daily call quota ledger, when `quota_ledger_path` is set
+QUOTA = None
+REQUEST_TRACER = RequestTracer()
+# Latency, size, status and retry histograms by stream and endpoint
+HTTP_METRICS = HttpMetrics()
+# Buffered writer of every Singer message the tap outputs
+WRITER = MessageWriter()
 
 REQUEST_TIMEOUT = 300
 class InvalidAuthException(Exception):
@@ -35,6 +83,12 @@ class DependencyException(Exception):
 class UriTooLongException(Exception):
     pass
 
+class CircuitOpenException(Exception):
+    pass
+
+class QuotaReservedException(Exception):
+    pass
+
 class DataFields:
     offset = 'offset'
 
@@ -42,10 +96,15 @@ class StateFields:
     offset = 'offset'
     this_stream = 'this_stream'
 
-BASE_URL = "https://api.hubapi.com"
+DEFAULT_BASE_URL = "https://api.hubapi.com"
+BASE_URL = DEFAULT_BASE_URL
 
 CONTACTS_BY_COMPANY = "contacts_by_company"
 
+# Largest number of ids accepted by the contacts detail and v3 batch read endpoints
+CONTACTS_DETAIL_BATCH_SIZE = 100
+DEALS_V3_BATCH_SIZE = 100
+
 DEFAULT_CHUNK_SIZE = 1000 * 60 * 60 * 24
 
 V3_PREFIXES = {'hs_v2_date_entered', 'hs_v2_date_exited', 'hs_v2_latest_time_in'}
@@ -107,6 +166,8 @@ ENDPOINTS = {
     "custom_objects": "/crm/v3/objects/p_{object_name}"
 }
 
+ENDPOINT_TEMPLATES = EndpointTemplates(ENDPOINTS)
+
 def get_start(state, tap_stream_id, bookmark_key, older_bookmark_key=None):
     """
     If the current bookmark_key is available in the state, then return the bookmark_key value.
@@ -278,7 +339,8 @@ def acquire_access_token_from_refresh_token():
     }
 
 
-    resp = requests.post(BASE_URL + "/oauth/v1/token", data=payload, timeout=get_request_timeout())
+    url = BASE_URL + "/oauth/v1/token"
+    resp = TRANSPORT.post(url, data=payload, timeout=get_request_timeouts(url))
     if resp.status_code == 403:
         raise InvalidAuthException(resp.content)
 
@@ -290,6 +352,52 @@ def acquire_access_token_from_refresh_token():
         datetime.datetime.utcnow() +
         datetime.timedelta(seconds=auth['expires_in'] - 600))
     LOGGER.info("Token refreshed. Expires at %s", CONFIG['token_expires'])
+    return auth['access_token'], auth['expires_in']
+
+TOKEN_CACHE = None
+# Authorization header of the token loaded from the cache, if one was
+CACHED_TOKEN_HEADER = None
+
+def fetch_access_token():
+    """
+    Returns an access token and its lifetime in seconds. The first token of
+    a run comes from the token cache when it holds a still valid one, every
+    other token is acquired from the refresh token and saved to the cache.
+    """
+    global CACHED_TOKEN_HEADER # pylint: disable=global-statement
+    if TOKEN_CACHE is not None and CONFIG['access_token'] is None:
+        cached = TOKEN_CACHE.load(min_remaining=DEFAULT_REFRESH_MARGIN)
+        if cached:
+            access_token, expires_in = cached
+            CACHED_TOKEN_HEADER = 'Bearer {}'.format(access_token)
+            CONFIG['access_token'] = access_token
+            CONFIG['token_expires'] = (
+                datetime.datetime.utcnow() +
+                datetime.timedelta(seconds=expires_in - 600))
+            LOGGER.info("Using cached access token. Expires at %s", CONFIG['token_expires'])
+            return cached
+
+    access_token, expires_in = acquire_access_token_from_refresh_token()
+    if TOKEN_CACHE is not None:
+        TOKEN_CACHE.save(access_token, expires_in)
+    return access_token, expires_in
+
+# Refreshes the access token in the background ahead of its expiry
+TOKEN_MANAGER = TokenManager(lambda: fetch_access_token()) # pylint: disable=unnecessary-lambda
+
+def evict_cached_token(resp, headers):
+    """
+    When `resp` is a 401 to a call made with the token loaded from the token
+    cache, e.g. after the app was reinstalled, drop the token from the cache
+    and acquire a new one. Returns whether the call should be made again.
+    """
+    if resp.status_code != 401 or CACHED_TOKEN_HEADER is None \
+       or headers.get('Authorization') != CACHED_TOKEN_HEADER:
+        return False
+    LOGGER.warning("HubSpot rejected the cached access token, acquiring a new one")
+    TOKEN_CACHE.clear()
+    TOKEN_MANAGER.invalidate(CACHED_TOKEN_HEADER)
+    return True
 
 
 def giveup(exc):
@@ -307,10 +415,21 @@ def on_giveup(details):
     raise Exception("Giving up on request after {} tries with url {} and params {}" \
                     .format(details['tries'], url, params))
 
-URL_SOURCE_RE = re.compile(BASE_URL + r'/(\w+)/')
+def on_backoff(details):
+    RETRY_SLEEP.add(CURRENT_STREAM, details['wait'])
+    if details['args']:
+        HTTP_METRICS.record_retry(CURRENT_STREAM, endpoint_name(details['args'][0]), details['wait'])
+
+URL_SOURCE_RE = re.compile(r'/(\w+)/')
+
+def endpoint_name(url):
+    # Name of the ENDPOINTS entry of `url`, e.g. `companies_detail`
+    return ENDPOINT_TEMPLATES.name(str(url), BASE_URL)
 
 def parse_source_from_url(url):
-    match = URL_SOURCE_RE.match(url)
+    if not url.startswith(BASE_URL):
+        return None
+    match = URL_SOURCE_RE.match(url, len(BASE_URL))
     if match:
         return match.group(1)
     return None
@@ -325,9 +444,7 @@ def get_params_and_headers(params):
     params = params or {}
     hapikey = CONFIG['hapikey']
     if hapikey is None:
-        if CONFIG['token_expires'] is None or CONFIG['token_expires'] < datetime.datetime.utcnow():
-            acquire_access_token_from_refresh_token()
-        headers = {'Authorization': 'Bearer {}'.format(CONFIG['access_token'])}
+        headers = {'Authorization': TOKEN_MANAGER.authorization_header()}
     else:
         params['hapikey'] = hapikey
         headers = {}
@@ -338,24 +455,118 @@ def get_params_and_headers(params):
     return params, headers
 
 
+def quota_reserved_for(stream_id):
+    """
+    True when `stream_id` is one of the `low_priority_streams` and the daily
+    quota is down to its `quota_reserve`.
+    """
+    return QUOTA is not None \
+        and stream_id in (CONFIG.get('low_priority_streams') or []) \
+        and QUOTA.exhausted()
+
+def traced_send(method, url, send):
+    """
+    Call `send` and add the call to the request trace and the HTTP metrics.
+    """
+    stream = CURRENT_STREAM
+    endpoint = endpoint_name(url)
+    start = time.monotonic()
+    try:
+        resp = send()
+    except requests.exceptions.RequestException as ex:
+        duration = time.monotonic() - start
+        REQUEST_TRACER.trace(method, url, duration=duration, error=type(ex).__name__, stream=stream)
+        HTTP_METRICS.record_call(stream, endpoint, type(ex).__name__, duration)
+        raise
+    duration = time.monotonic() - start
+    REQUEST_TRACER.trace(method, url, resp.status_code, duration, stream=stream)
+    HTTP_METRICS.record_call(stream, endpoint, resp.status_code, duration)
+    on_body_size(resp, lambda size: HTTP_METRICS.record_size(stream, endpoint, size))
+    return resp
+
+def send_request(url, send):
+    """
+    Make a single attempt at a HubSpot call. `send` is only invoked once the
+    daily quota reserve, the circuit breaker of the url's API source, the
+    adaptive concurrency limit and the rate limiter allow it, and its
+    outcome is fed back to them.
+    """
+    # Checked first, as a half-open breaker hands its only probe to the call it allows
+    if quota_reserved_for(CURRENT_STREAM):
+        raise QuotaReservedException("Only {} daily API calls are left, keeping them for other streams and integrations"
+                                     .format(QUOTA.remaining))
+    breaker = CIRCUIT_BREAKERS.get(parse_source_from_url(url))
+    if breaker and not breaker.allow():
+        raise CircuitOpenException("Circuit for the {} API is open, not calling {}".format(breaker.name, url))
+
+    controller = CONCURRENCY
+    slot = controller.acquire() if controller else None
+    RATE_LIMITER.acquire()
+    start = time.monotonic()
+    try:
+        resp = send()
+    except Exception as ex:
+        if breaker:
+            breaker.record_failure()
+        if controller:
+            controller.release(slot, overloaded=isinstance(ex, requests.exceptions.RequestException))
+        raise
+    if controller:
+        controller.release(slot, overloaded=resp.status_code == 429 or resp.status_code >= 500,
+                           latency=time.monotonic() - start, key=endpoint_key(url))
+    RATE_LIMITER.update(resp.headers)
+    if QUOTA is not None:
+        QUOTA.record_call(resp.headers)
+
+    if breaker:
+        if resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    return resp
+
 # backoff for Timeout error is already included in "requests.exceptions.RequestException"
 # as it is a parent class of "Timeout" error
-@backoff.on_exception(backoff.constant,
-                      (requests.exceptions.RequestException,
-                       requests.exceptions.HTTPError),
-                      max_tries=5,
-                      jitter=None,
-                      giveup=giveup,
-                      on_giveup=on_giveup,
-                      interval=10)
-def request(url, params=None):
-
-    params, headers = get_params_and_headers(params)
-
-    req = requests.Request('GET', url, params=params, headers=headers).prepare()
-    LOGGER.info("GET %s", req.url)
+@with_retries((requests.exceptions.RequestException,
+               requests.exceptions.HTTPError),
+              get_policies=lambda: RETRY_POLICIES,
+              giveup=giveup,
+              on_giveup=on_giveup,
+              on_backoff=on_backoff)
+def send_get(url, params=None, stream=False):
+
+    request_params, headers = get_params_and_headers(params)
+
+    req = requests.Request('GET', url, params=request_params, headers=headers).prepare()
+    endpoint = endpoint_key(url)
+
+    def attempt(sending):
+        def send():
+            # Only the call itself is timed, not the waits for the rate limiter
+            sending()
+            timeout = get_request_timeouts(url)
+            start = time.monotonic()
+            try:
+                resp = TRANSPORT.send(req, tag=CURRENT_STREAM, stream=stream, timeout=timeout)
+            except requests.exceptions.ReadTimeout:
+                if TIMEOUT_POLICY is not None:
+                    TIMEOUT_POLICY.record_timeout(url, timeout[1] if isinstance(timeout, tuple) else timeout)
+                raise
+            LATENCY.record(endpoint, time.monotonic() - start)
+            if TIMEOUT_POLICY is not None:
+                TIMEOUT_POLICY.record_success(url)
+            return resp
+        return send_request(url, lambda: traced_send('GET', req.url, send))
+
     with metrics.http_request_timer(parse_source_from_url(url)) as timer:
-        resp = SESSION.send(req, timeout=get_request_timeout())
+        if HEDGER is not None and not stream:
+            resp = HEDGER.run(endpoint, attempt)
+        else:
+            resp = attempt(lambda: None)
+        if evict_cached_token(resp, headers):
+            request_params, headers = get_params_and_headers(params)
+            req = requests.Request('GET', url, params=request_params, headers=headers).prepare()
+            resp = attempt(lambda: None)
         timer.tags[metrics.Tag.http_status_code] = resp.status_code
         if resp.status_code == 403:
             raise SourceUnavailableException(resp.content)
@@ -364,6 +575,48 @@ def request(url, params=None):
         resp.raise_for_status()
 
     return resp
+
+def request(url, params=None, stream=False):
+    """
+    GET a HubSpot url. Identical buffered GETs share the response of a call
+    already in flight, or of one made within the `request_coalesce_window`.
+    """
+    if stream:
+        return send_get(url, params, stream=True)
+    key = requests.Request('GET', url, params=params).prepare().url
+    return REQUEST_COALESCER.get(key, lambda: send_get(url, params))
+
+def stream_json_enabled():
+    return CONFIG.get('stream_json') in (True, 'true', 'True')
+
+def get_page(url, params, path, stream=False):
+    """
+    Request one page of a list endpoint, with its rows under `path`. When
+    `stream_json` is configured and the caller allows it, rows are decoded
+    from the socket as they arrive. The page's continuation keys are in
+    `page.data` once its rows have been consumed.
+    """
+    if stream and stream_json_enabled():
+        return open_streaming_page(url, params, path=path)
+    return BufferedPage(request(url, params).json(), path)
+
+# The body of a streamed response is read after send_get has returned, so
+# a connection dropped while reading it is retried here
+@with_retries((requests.exceptions.RequestException,),
+              get_policies=lambda: RETRY_POLICIES,
+              giveup=giveup,
+              on_giveup=on_giveup,
+              on_backoff=on_backoff)
+def open_streaming_page(url, params, path=None, read_ahead=1):
+    """
+    Request a page to be streamed and decode its first `read_ahead` rows
+    (every row when None). Failures up to then request the page again;
+    later ones are raised to whoever consumes its rows.
+    """
+    page = StreamingPage.from_response(request(url, params, stream=True), path)
+    page.read_ahead(read_ahead)
+    return page
+
 # {"bookmarks" : {"contacts" : { "lastmodifieddate" : "2001-01-01"
 #                                "offset" : {"vidOffset": 1234
 #                                           "timeOffset": "3434434 }}
@@ -372,6 +625,50 @@ def request(url, params=None):
 # }
 # }
 
+def write_record(stream_name, record, stream_alias=None, time_extracted=None):
+    """
+    Same as `singer.write_record`, serialised with the tap's JSON codec and
+    written through the buffered message writer.
+    """
+    WRITER.write_message(singer.RecordMessage(stream=(stream_alias or stream_name),
+                                              record=record,
+                                              time_extracted=time_extracted))
+
+def write_schema(stream_name, schema, key_properties, bookmark_properties=None, stream_alias=None):
+    """
+    Same as `singer.write_schema`, written through the buffered message writer.
+    """
+    if isinstance(key_properties, (str, bytes)):
+        key_properties = [key_properties]
+    if not isinstance(key_properties, list):
+        raise Exception("key_properties must be a string or list of strings")
+
+    WRITER.write_message(singer.SchemaMessage(stream=(stream_alias or stream_name),
+                                              schema=schema,
+                                              key_properties=key_properties,
+                                              bookmark_properties=bookmark_properties))
+
+def new_transformer():
+    """
+    Transformer of the sync functions: a `CompiledTransformer`, unless the
+    `compiled_transform` config value is false.
+    """
+    if CONFIG.get('compiled_transform') in (False, 'false', 'False'):
+        return Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING)
+    return CompiledTransformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING)
+
+def write_state(state):
+    """
+    Same as `singer.write_state`, flushing the records buffered before it.
+    Called from the fetch stage of a pipeline, the state is written once the
+    records fetched before it have been.
+    """
+    staged = pipeline.current()
+    if staged is None:
+        WRITER.write_state(state)
+    else:
+        staged.defer(WRITER.write_state, copy.deepcopy(state))
+
 def lift_properties_and_versions(record):
     for key, value in record.get('properties', {}).items():
         computed_key = "property_{}".format(key)
@@ -386,32 +683,45 @@ def lift_properties_and_versions(record):
 
 # backoff for Timeout error is already included in "requests.exceptions.RequestException"
 # as it is a parent class of "Timeout" error
-@backoff.on_exception(backoff.constant,
-                      (requests.exceptions.RequestException,
-                       requests.exceptions.HTTPError),
-                      max_tries=5,
-                      jitter=None,
-                      giveup=giveup,
-                      on_giveup=on_giveup,
-                      interval=10)
+@with_retries((requests.exceptions.RequestException,
+               requests.exceptions.HTTPError),
+              get_policies=lambda: RETRY_POLICIES,
+              giveup=giveup,
+              on_giveup=on_giveup,
+              on_backoff=on_backoff)
 def post_search_endpoint(url, data, params=None):
 
-    params, headers = get_params_and_headers(params)
-    headers['content-type'] = "application/json"
-
-    with metrics.http_request_timer(url) as _:
-        resp = requests.post(
+    def send():
+        request_params, headers = get_params_and_headers(params)
+        headers['content-type'] = "application/json"
+        resp = send_request(url, lambda: traced_send('POST', url, lambda: TRANSPORT.post(
             url=url,
             json=data,
-            params=params,
-            timeout=get_request_timeout(),
-            headers=headers
-        )
+            params=request_params,
+            timeout=get_request_timeouts(url),
+            headers=headers,
+            tag=CURRENT_STREAM
+        )))
+        return resp, headers
+
+    with metrics.http_request_timer(parse_source_from_url(url)) as timer:
+        resp, headers = send()
+        if evict_cached_token(resp, headers):
+            resp, _ = send()
+        timer.tags[metrics.Tag.http_status_code] = resp.status_code
 
         resp.raise_for_status()
 
     return resp
 
+def request_concurrently(func, calls):
+    """
+    Run `func` (`request` or `post_search_endpoint`) once per entry of `calls`
+    on the engine's pool, bounded by the `max_concurrency` config value.
+    Responses are returned in the same order as `calls`.
+    """
+    return ENGINE.map(func, calls)
+
 def merge_responses(v1_data, v3_data):
     for v1_record in v1_data:
         v1_id = v1_record.get('dealId')
@@ -440,66 +750,117 @@ def process_v3_deals_records(v3_data):
 def get_v3_deals(v3_fields, v1_data):
     v1_ids = [{'id': str(record['dealId'])} for record in v1_data]
 
-    v3_body = {'inputs': v1_ids,
-               'properties': v3_fields}
     v3_url = get_url('deals_v3_batch_read')
-    v3_resp = post_search_endpoint(v3_url, v3_body)
-    return v3_resp.json()['results']
+    v3_bodies = [{'inputs': v1_ids[i:i + DEALS_V3_BATCH_SIZE],
+                  'properties': v3_fields}
+                 for i in range(0, len(v1_ids), DEALS_V3_BATCH_SIZE)]
+    v3_resps = request_concurrently(post_search_endpoint, [(v3_url, body) for body in v3_bodies])
+    return [result for v3_resp in v3_resps for result in v3_resp.json()['results']]
 
 #pylint: disable=line-too-long
-def gen_request(STATE, tap_stream_id, url, params, path, more_key, offset_keys, offset_targets, v3_fields=None):
+def gen_request(STATE, tap_stream_id, url, params, path, more_key, offset_keys, offset_targets, v3_fields=None, page_hook=None):
     if len(offset_keys) != len(offset_targets):
         raise ValueError("Number of offset_keys must match number of offset_targets")
 
-    if singer.get_offset(STATE, tap_stream_id):
-        params.update(singer.get_offset(STATE, tap_stream_id))
+    # Copied, as the params are often module level defaults the offsets would stick to
+    params = {**params, **(singer.get_offset(STATE, tap_stream_id) or {})}
 
-    with metrics.record_counter(tap_stream_id) as counter:
-        while True:
-            data = request(url, params).json()
+    prefetch_pages = get_prefetch_pages()
 
-            if data.get(path) is None:
-                raise RuntimeError("Unexpected API response: {} not in {}".format(path, data.keys()))
+    def fetch(page_params):
+        # Both hooks need every row of the page up front, and prefetching its
+        # continuation keys, so only stream otherwise
+        page = get_page(url, page_params, path, stream=not (v3_fields or page_hook or prefetch_pages))
 
-            if v3_fields:
-                v3_data = get_v3_deals(v3_fields, data[path])
+        if v3_fields:
+            rows = page.rows()
+            v3_data = get_v3_deals(v3_fields, rows)
 
-                # The shape of v3_data is different than the V1 response,
-                # so we transform v3 to look like v1
-                transformed_v3_data = process_v3_deals_records(v3_data)
-                merge_responses(data[path], transformed_v3_data)
+            # The shape of v3_data is different than the V1 response,
+            # so we transform v3 to look like v1
+            transformed_v3_data = process_v3_deals_records(v3_data)
+            merge_responses(rows, transformed_v3_data)
+        return page
 
-            for row in data[path]:
+    def next_params(page_params, page):
+        data = page.data
+        if not data.get(more_key, False):
+            return None
+        for key, target in zip(offset_keys, offset_targets):
+            if key in data:
+                page_params[target] = data[key]
+        return page_params
+
+    with metrics.record_counter(tap_stream_id) as counter:
+        for page in iter_pages(fetch, params, next_params, prefetch_pages):
+            rows = page.rows()
+
+            # Lets callers fetch whatever they need for the whole page at once
+            # (e.g. detail records) before its rows are yielded.
+            if page_hook:
+                page_hook(rows)
+
+            for row in rows:
                 counter.increment()
                 yield row
 
+            data = page.data
             if not data.get(more_key, False):
                 break
 
             STATE = singer.clear_offset(STATE, tap_stream_id)
             for key, target in zip(offset_keys, offset_targets):
                 if key in data:
-                    params[target] = data[key]
                     STATE = singer.set_offset(STATE, tap_stream_id, target, data[key])
 
-            singer.write_state(STATE)
+            write_state(STATE)
 
     STATE = singer.clear_offset(STATE, tap_stream_id)
-    singer.write_state(STATE)
+    write_state(STATE)
+
+
+CONTACTS_DETAIL_PARAMS = {'showListMemberships' : True, "formSubmissionMode" : "all"}
 
+def request_contacts_detail(vids, stream=False):
+    """
+    GET the details of the contacts in `vids`. The batch is split in halves
+    for as long as HubSpot answers 414. Returns the list of responses, or
+    with `stream` of pages already read in full, so concurrent batches
+    don't leave their sockets idle while others are consumed.
+    """
+    def fetch(batch):
+        params = {'vid': batch, **CONTACTS_DETAIL_PARAMS}
+        if stream:
+            return [open_streaming_page(get_url("contacts_detail"), params, read_ahead=None)]
+        return [request(get_url("contacts_detail"), params)]
+
+    return split_on_error(fetch, vids, UriTooLongException)
 
-def _sync_contact_vids(catalog, vids, schema, bumble_bee, bookmark_values, bookmark_key):
+def get_contact_details(vids, bookmark_values, bookmark_key):
+    """
+    Yields the detail records of the contacts in `vids`, with their bookmark
+    field set from `bookmark_values`.
+    """
     if len(vids) == 0:
         return
 
-    data = request(get_url("contacts_detail"), params={'vid': vids, 'showListMemberships' : True, "formSubmissionMode" : "all"}).json()
-    time_extracted = utils.now()
-    mdata = metadata.to_map(catalog.get('metadata'))
-    for record in data.values():
+    stream = stream_json_enabled()
+    # Spread the vids over every concurrent request
+    batch_size = min(CONTACTS_DETAIL_BATCH_SIZE, -(-len(vids) // get_max_concurrency()))
+    batches = pack(vids, url_length(get_url("contacts_detail"), CONTACTS_DETAIL_PARAMS),
+                   repeated_param_length('vid'), get_max_url_length(), batch_size)
+    responses = [resp
+                 for batch_responses in request_concurrently(request_contacts_detail,
+                                                             [((batch,), {'stream': stream}) for batch in batches])
+                 for resp in batch_responses]
+    if stream:
+        records = (record for page in responses for record in page.rows())
+    else:
+        records = (record for resp in responses for record in resp.json().values())
+    for record in records:
         # Explicitly add the bookmark field "versionTimestamp" and its value in the record.
         record[bookmark_key] = bookmark_values.get(record.get("vid"))
-        record = bumble_bee.transform(lift_properties_and_versions(record), schema, mdata)
-        singer.write_record("contacts", record, catalog.get('stream_alias'), time_extracted=time_extracted)
+        yield record
 
 default_contact_params = {
     'showListMemberships': True,
@@ -516,18 +877,21 @@ def sync_contacts(STATE, ctx):
     max_bk_value = start
     schema = load_schema("contacts")
 
-    singer.write_schema("contacts", schema, ["vid"], [bookmark_key], catalog.get('stream_alias'))
+    write_schema("contacts", schema, ["vid"], [bookmark_key], catalog.get('stream_alias'))
 
     url = get_url("contacts_all")
+    mdata = metadata.to_map(catalog.get('metadata'))
 
-    vids = []
-    # Dict to store replication key value for each contact record
-    bookmark_values = {}
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
-        # To handle records updated between start of the table sync and the end,
-        # store the current sync start in the state and not move the bookmark past this value.
-        sync_start_time = utils.now()
-        for row in gen_request(STATE, 'contacts', url, default_contact_params, 'contacts', 'has-more', ['vid-offset'], ['vidOffset']):
+    # Detail records of the contacts of the current page
+    contact_details = []
+
+    def fetch_contact_details(rows):
+        # Details are fetched before the page's offset is written to the state
+        nonlocal max_bk_value
+        vids = []
+        # Dict to store replication key value for each contact record
+        bookmark_values = {}
+        for row in rows:
             modified_time = None
             if bookmark_key in row:
                 modified_time = utils.strptime_with_tz(
@@ -544,16 +908,27 @@ def sync_contacts(STATE, ctx):
             if modified_time and modified_time >= max_bk_value:
                 max_bk_value = modified_time
 
-            if len(vids) == 100:
-                _sync_contact_vids(catalog, vids, schema, bumble_bee, bookmark_values, bookmark_key)
-                vids = []
+        contact_details[:] = get_contact_details(vids, bookmark_values, bookmark_key)
+
+    def contacts_to_sync():
+        for _ in gen_request(STATE, 'contacts', url, default_contact_params, 'contacts', 'has-more', ['vid-offset'], ['vidOffset'],
+                             page_hook=fetch_contact_details):
+            # The page's details are all yielded with its first row
+            yield from contact_details
+            contact_details.clear()
 
-        _sync_contact_vids(catalog, vids, schema, bumble_bee, bookmark_values, bookmark_key)
+    with new_transformer() as bumble_bee:
+        # To handle records updated between start of the table sync and the end,
+        # store the current sync start in the state and not move the bookmark past this value.
+        sync_start_time = utils.now()
+        run_stages("contacts", contacts_to_sync(), bumble_bee, schema, mdata,
+                   lambda record: write_record("contacts", record, catalog.get('stream_alias'),
+                                               time_extracted=utils.now()))
 
     # Don't bookmark past the start of this sync to account for updated records during the sync.
     new_bookmark = min(max_bk_value, sync_start_time)
     STATE = singer.write_bookmark(STATE, 'contacts', bookmark_key, utils.strftime(new_bookmark))
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 class ValidationPredFailed(Exception):
@@ -577,7 +952,7 @@ def _sync_contacts_by_company_batch_read(STATE, ctx, company_ids):
     mdata = metadata.to_map(catalog.get('metadata'))
     url = get_url("contacts_by_company_v3")
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
+    with new_transformer() as bumble_bee:
         with metrics.record_counter(CONTACTS_BY_COMPANY) as counter:
             body = {'inputs': [{'id': company_id} for company_id in company_ids]}
             contacts_to_company_rows = post_search_endpoint(url, body).json()
@@ -587,11 +962,22 @@ def _sync_contacts_by_company_batch_read(STATE, ctx, company_ids):
                     record = {'company-id' : row['from']['id'],
                               'contact-id' : contact['id']}
                     record = bumble_bee.transform(lift_properties_and_versions(record), schema, mdata)
-                    singer.write_record("contacts_by_company", record, time_extracted=utils.now())
+                    write_record("contacts_by_company", record, time_extracted=utils.now())
     STATE = singer.set_offset(STATE, "contacts_by_company", 'offset', company_ids[-1])
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
+def get_company_modified_time(row_properties, bookmark_field_in_record):
+    if bookmark_field_in_record in row_properties:
+        # Hubspot returns timestamps in millis
+        timestamp_millis = row_properties[bookmark_field_in_record]['timestamp'] / 1000.0
+        return datetime.datetime.fromtimestamp(timestamp_millis, datetime.timezone.utc)
+    if 'createdate' in row_properties:
+        # Hubspot returns timestamps in millis
+        timestamp_millis = row_properties['createdate']['timestamp'] / 1000.0
+        return datetime.datetime.fromtimestamp(timestamp_millis, datetime.timezone.utc)
+    return None
+
 default_company_params = {
     'limit': 250, 'properties': ["createdate", "hs_lastmodifieddate"]
 }
@@ -599,14 +985,14 @@ default_company_params = {
 def sync_companies(STATE, ctx):
     catalog = ctx.get_catalog_from_id(singer.get_currently_syncing(STATE))
     mdata = metadata.to_map(catalog.get('metadata'))
-    bumble_bee = Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING)
+    bumble_bee = new_transformer()
     bookmark_key = 'property_hs_lastmodifieddate'
     bookmark_field_in_record = 'hs_lastmodifieddate'
 
     start = utils.strptime_to_utc(get_start(STATE, "companies", bookmark_key, older_bookmark_key=bookmark_field_in_record))
     LOGGER.info("sync_companies from %s", start)
     schema = load_schema('companies')
-    singer.write_schema("companies", schema, ["companyId"], [bookmark_key], catalog.get('stream_alias'))
+    write_schema("companies", schema, ["companyId"], [bookmark_key], catalog.get('stream_alias'))
 
     # Because this stream doesn't query by `lastUpdated`, it cycles
     # through the data set every time. The issue with this is that there
@@ -616,13 +1002,13 @@ def sync_companies(STATE, ctx):
     # sync's start in the state and not move the bookmark past this value.
     current_sync_start = get_current_sync_start(STATE, "companies") or utils.now()
     STATE = write_current_sync_start(STATE, "companies", current_sync_start)
-    singer.write_state(STATE)
+    write_state(STATE)
 
     url = get_url("companies_all")
     max_bk_value = start
     if CONTACTS_BY_COMPANY in ctx.selected_stream_ids:
         contacts_by_company_schema = load_schema(CONTACTS_BY_COMPANY)
-        singer.write_schema('contacts_by_company', contacts_by_company_schema, ["company-id", "contact-id"])
+        write_schema('contacts_by_company', contacts_by_company_schema, ["company-id", "contact-id"])
 
         # This code handles the interrutped sync. When sync is interrupted,
         # last batch of `contacts_by_company` extraction may get interrupted.
@@ -638,30 +1024,36 @@ def sync_companies(STATE, ctx):
                 offset = contacts_by_company_offset
 
             STATE = singer.set_offset(STATE, 'companies', 'offset', offset)
-            singer.write_state(STATE)
+            write_state(STATE)
+
+    # Detail records for the companies of the current page, keyed by company id
+    company_details = {}
+
+    def fetch_company_details(rows):
+        company_details.clear()
+        detail_ids = []
+        for row in rows:
+            modified_time = get_company_modified_time(row['properties'], bookmark_field_in_record)
+            if not modified_time or modified_time >= start:
+                detail_ids.append(row['companyId'])
+        responses = request_concurrently(request, [get_url("companies_detail", company_id=company_id) for company_id in detail_ids])
+        for company_id, resp in zip(detail_ids, responses):
+            company_details[company_id] = resp.json()
 
     # This list collects the recently modified company ids to extract `contacts_by_company` records in batch
     company_ids = []
     with bumble_bee:
-        for row in gen_request(STATE, 'companies', url, default_company_params, 'companies', 'has-more', ['offset'], ['offset']):
-            row_properties = row['properties']
-            modified_time = None
-            if bookmark_field_in_record in row_properties:
-                # Hubspot returns timestamps in millis
-                timestamp_millis = row_properties[bookmark_field_in_record]['timestamp'] / 1000.0
-                modified_time = datetime.datetime.fromtimestamp(timestamp_millis, datetime.timezone.utc)
-            elif 'createdate' in row_properties:
-                # Hubspot returns timestamps in millis
-                timestamp_millis = row_properties['createdate']['timestamp'] / 1000.0
-                modified_time = datetime.datetime.fromtimestamp(timestamp_millis, datetime.timezone.utc)
+        for row in gen_request(STATE, 'companies', url, default_company_params, 'companies', 'has-more', ['offset'], ['offset'],
+                               page_hook=fetch_company_details):
+            modified_time = get_company_modified_time(row['properties'], bookmark_field_in_record)
 
             if modified_time and modified_time >= max_bk_value:
                 max_bk_value = modified_time
 
             if not modified_time or modified_time >= start:
-                record = request(get_url("companies_detail", company_id=row['companyId'])).json()
+                record = company_details[row['companyId']]
                 record = bumble_bee.transform(lift_properties_and_versions(record), schema, mdata)
-                singer.write_record("companies", record, catalog.get('stream_alias'), time_extracted=utils.now())
+                write_record("companies", record, catalog.get('stream_alias'), time_extracted=utils.now())
 
             if CONTACTS_BY_COMPANY in ctx.selected_stream_ids:
                 # Collect the recently modified company id
@@ -682,7 +1074,7 @@ def sync_companies(STATE, ctx):
     new_bookmark = min(max_bk_value, current_sync_start)
     STATE = singer.write_bookmark(STATE, 'companies', bookmark_key, utils.strftime(new_bookmark))
     STATE = write_current_sync_start(STATE, 'companies', None)
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 def has_selected_custom_field(mdata):
@@ -721,7 +1113,7 @@ def sync_deals(STATE, ctx):
               'properties' : []}
 
     schema = load_schema("deals")
-    singer.write_schema("deals", schema, ["dealId"], [bookmark_key], catalog.get('stream_alias'))
+    write_schema("deals", schema, ["dealId"], [bookmark_key], catalog.get('stream_alias'))
 
     # Check if we should  include associations
     for key in mdata.keys():
@@ -750,10 +1142,8 @@ def sync_deals(STATE, ctx):
 
     url = get_url('deals_all')
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
-        # To handle records updated between start of the table sync and the end,
-        # store the current sync start in the state and not move the bookmark past this value.
-        sync_start_time = utils.now()
+    def deals_to_sync():
+        nonlocal max_bk_value
         for row in gen_request(STATE, 'deals', url, params, 'deals', "hasMore", ["offset"], ["offset"], v3_fields=v3_fields):
             row_properties = row['properties']
             modified_time = None
@@ -769,36 +1159,86 @@ def sync_deals(STATE, ctx):
                 max_bk_value = modified_time
 
             if not modified_time or modified_time >= start:
-                record = bumble_bee.transform(lift_properties_and_versions(row), schema, mdata)
-                singer.write_record("deals", record, catalog.get('stream_alias'), time_extracted=utils.now())
+                yield row
+
+    with new_transformer() as bumble_bee:
+        # To handle records updated between start of the table sync and the end,
+        # store the current sync start in the state and not move the bookmark past this value.
+        sync_start_time = utils.now()
+        run_stages("deals", deals_to_sync(), bumble_bee, schema, mdata,
+                   lambda record: write_record("deals", record, catalog.get('stream_alias'),
+                                               time_extracted=utils.now()))
 
     # Don't bookmark past the start of this sync to account for updated records during the sync.
     new_bookmark = min(max_bk_value, sync_start_time)
     STATE = singer.write_bookmark(STATE, 'deals', bookmark_key, utils.strftime(new_bookmark))
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 
+def merge_property_pages(pages, path):
+    """
+    Merge the `properties` of rows with the same id from pages of the same
+    request made with different chunks of properties, into the first page.
+    """
+    merged = pages[0]
+    rows_by_id = {row.get('id'): row for row in merged.get(path) or []}
+    for page in pages[1:]:
+        for row in page.get(path) or []:
+            merged_row = rows_by_id.get(row.get('id'))
+            if merged_row is not None:
+                merged_row.setdefault('properties', {}).update(row.get('properties') or {})
+    return merged
+
+def get_properties_page(url, params, path, stream=True):
+    """
+    Request one page of a v3 list endpoint selecting the comma joined
+    `properties` param. When the properties don't fit in one url, or HubSpot
+    answers 414, the page is requested once per chunk of properties (chunks
+    getting a 414 are split again) and the rows' properties are merged.
+    """
+    properties = params.get('properties')
+    if not properties:
+        return get_page(url, params, path, stream=stream)
+
+    chunks = pack(properties.split(','), url_length(url, {**params, 'properties': ''}),
+                  joined_param_length, get_max_url_length())
+    if len(chunks) == 1:
+        try:
+            return get_page(url, params, path, stream=stream)
+        except UriTooLongException:
+            pass
+
+    def fetch(chunk):
+        return [request(url, {**params, 'properties': ','.join(chunk)}).json()]
+
+    LOGGER.info("Requesting the selected properties of %s in chunks to keep urls short", url)
+    pages = [page
+             for chunk_pages in request_concurrently(
+                 lambda chunk: split_on_error(fetch, chunk, UriTooLongException), [(chunk,) for chunk in chunks])
+             for page in chunk_pages]
+    return BufferedPage(merge_property_pages(pages, path), path)
+
 def get_v3_records(tap_stream_id, url, params, path, more_key):
     """
     Cursor-based API Pagination : Used in tickets stream implementation
     """
-    with metrics.record_counter(tap_stream_id) as counter:
-        while True:
-            data = request(url, params).json()
+    prefetch_pages = get_prefetch_pages()
 
-            if data.get(path) is None:
-                raise RuntimeError(
-                    "Unexpected API response: {} not in {}".format(path, data.keys()))
+    def next_params(page_params, page):
+        data = page.data
+        if not data.get(more_key):
+            return None
+        page_params['after'] = data.get(more_key).get('next').get('after')
+        return page_params
 
-            for row in data[path]:
+    with metrics.record_counter(tap_stream_id) as counter:
+        for page in iter_pages(lambda page_params: get_properties_page(url, page_params, path, stream=not prefetch_pages),
+                               params, next_params, prefetch_pages):
+            for row in page.rows():
                 counter.increment()
                 yield row
 
-            if not data.get(more_key):
-                break
-            params['after'] = data.get(more_key).get('next').get('after')
-
 def sync_v3_stream(STATE, ctx, stream_id, params, primary_key="id", bookmark_key="updatedAt"):
     """
     Function to sync streams that are using v3 endpoints
@@ -812,15 +1252,13 @@ def sync_v3_stream(STATE, ctx, stream_id, params, primary_key="id", bookmark_key
     LOGGER.info(f"Sync {stream_id} from %s", bookmark_value)
 
     schema = load_schema(stream_id)
-    singer.write_schema(stream_id, schema, [primary_key],
+    write_schema(stream_id, schema, [primary_key],
                         [bookmark_key], catalog.get('stream_alias'))
 
     url = get_url(stream_id)
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as transformer:
-        # To handle records updated between start of the table sync and the end,
-        # store the current sync start in the state and not move the bookmark past this value.
-        sync_start_time = utils.now()
+    def rows_to_sync():
+        nonlocal max_bk_value
         for row in get_v3_records(stream_id, url, params, 'results', "paging"):
             # Parsing the string formatted date to datetime object
             modified_time = utils.strptime_to_utc(row[bookmark_key])
@@ -828,17 +1266,23 @@ def sync_v3_stream(STATE, ctx, stream_id, params, primary_key="id", bookmark_key
             # Checking the bookmark value is present on the record and it
             # is greater than or equal to defined previous bookmark value
             if modified_time and modified_time >= bookmark_value:
-                # Transforms the data and filters out the selected fields from the catalog
-                record = transformer.transform(lift_properties_and_versions(row), schema, mdata)
-                singer.write_record(stream_id, record, catalog.get(
-                    'stream_alias'), time_extracted=utils.now())
                 if modified_time >= max_bk_value:
                     max_bk_value = modified_time
+                yield row
+
+    with new_transformer() as transformer:
+        # To handle records updated between start of the table sync and the end,
+        # store the current sync start in the state and not move the bookmark past this value.
+        sync_start_time = utils.now()
+        # Transforms the data and filters out the selected fields from the catalog
+        run_stages(stream_id, rows_to_sync(), transformer, schema, mdata,
+                   lambda record: write_record(stream_id, record, catalog.get('stream_alias'),
+                                               time_extracted=utils.now()))
 
     # Don't bookmark past the start of this sync to account for updated records during the sync.
     new_bookmark = min(max_bk_value, sync_start_time)
     STATE = singer.write_bookmark(STATE, stream_id, bookmark_key, utils.strftime(new_bookmark))
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 def sync_tickets(STATE, ctx):
@@ -860,16 +1304,27 @@ def sync_campaigns(STATE, ctx):
     catalog = ctx.get_catalog_from_id(singer.get_currently_syncing(STATE))
     mdata = metadata.to_map(catalog.get('metadata'))
     schema = load_schema("campaigns")
-    singer.write_schema("campaigns", schema, ["id"], catalog.get('stream_alias'))
+    write_schema("campaigns", schema, ["id"], catalog.get('stream_alias'))
     LOGGER.info("sync_campaigns(NO bookmarks)")
     url = get_url("campaigns_all")
     params = {'limit': 500}
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
-        for row in gen_request(STATE, 'campaigns', url, params, "campaigns", "hasMore", ["offset"], ["offset"]):
-            record = request(get_url("campaigns_detail", campaign_id=row['id'])).json()
+    # Detail records for the campaigns of the current page, keyed by campaign id
+    campaign_details = {}
+
+    def fetch_campaign_details(rows):
+        campaign_details.clear()
+        campaign_ids = [row['id'] for row in rows]
+        responses = request_concurrently(request, [get_url("campaigns_detail", campaign_id=campaign_id) for campaign_id in campaign_ids])
+        for campaign_id, resp in zip(campaign_ids, responses):
+            campaign_details[campaign_id] = resp.json()
+
+    with new_transformer() as bumble_bee:
+        for row in gen_request(STATE, 'campaigns', url, params, "campaigns", "hasMore", ["offset"], ["offset"],
+                               page_hook=fetch_campaign_details):
+            record = campaign_details[row['id']]
             record = bumble_bee.transform(lift_properties_and_versions(record), schema, mdata)
-            singer.write_record("campaigns", record, catalog.get('stream_alias'), time_extracted=utils.now())
+            write_record("campaigns", record, catalog.get('stream_alias'), time_extracted=utils.now())
 
     return STATE
 
@@ -878,7 +1333,7 @@ def sync_entity_chunked(STATE, catalog, entity_name, key_properties, path):
     schema = load_schema(entity_name)
     bookmark_key = 'startTimestamp'
 
-    singer.write_schema(entity_name, schema, key_properties, [bookmark_key], catalog.get('stream_alias'))
+    write_schema(entity_name, schema, key_properties, [bookmark_key], catalog.get('stream_alias'))
 
     start = get_start(STATE, entity_name, bookmark_key)
     LOGGER.info("sync_%s from %s", entity_name, start)
@@ -904,38 +1359,36 @@ def sync_entity_chunked(STATE, catalog, entity_name, key_properties, path):
                 'endTimestamp': end_ts,
                 'limit': 1000,
             }
-            with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
+            with new_transformer() as bumble_bee:
                 while True:
                     our_offset = singer.get_offset(STATE, entity_name)
                     if bool(our_offset) and our_offset.get('offset') is not None:
                         params[StateFields.offset] = our_offset.get('offset')
 
-                    data = request(url, params).json()
+                    page = get_page(url, params, path, stream=True)
                     time_extracted = utils.now()
 
-                    if data.get(path) is None:
-                        raise RuntimeError("Unexpected API response: {} not in {}".format(path, data.keys()))
-
-                    for row in data[path]:
+                    for row in page.rows():
                         counter.increment()
                         record = bumble_bee.transform(lift_properties_and_versions(row), schema, mdata)
-                        singer.write_record(entity_name,
-                                            record,
-                                            catalog.get('stream_alias'),
-                                            time_extracted=time_extracted)
+                        write_record(entity_name,
+                                     record,
+                                     catalog.get('stream_alias'),
+                                     time_extracted=time_extracted)
+                    data = page.data
                     if data.get('hasMore'):
                         STATE = singer.set_offset(STATE, entity_name, 'offset', data['offset'])
-                        singer.write_state(STATE)
+                        write_state(STATE)
                     else:
                         STATE = singer.clear_offset(STATE, entity_name)
-                        singer.write_state(STATE)
+                        write_state(STATE)
                         break
             STATE = singer.write_bookmark(STATE, entity_name, 'startTimestamp', utils.strftime(datetime.datetime.fromtimestamp((start_ts / 1000), datetime.timezone.utc)))  # pylint: disable=line-too-long
-            singer.write_state(STATE)
+            write_state(STATE)
             start_ts = end_ts
 
     STATE = singer.clear_offset(STATE, entity_name)
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 def sync_subscription_changes(STATE, ctx):
@@ -954,7 +1407,7 @@ def sync_contact_lists(STATE, ctx):
     mdata = metadata.to_map(catalog.get('metadata'))
     schema = load_schema("contact_lists")
     bookmark_key = 'updatedAt'
-    singer.write_schema("contact_lists", schema, ["listId"], [bookmark_key], catalog.get('stream_alias'))
+    write_schema("contact_lists", schema, ["listId"], [bookmark_key], catalog.get('stream_alias'))
 
     start = get_start(STATE, "contact_lists", bookmark_key)
     max_bk_value = start
@@ -963,7 +1416,7 @@ def sync_contact_lists(STATE, ctx):
 
     url = get_url("contact_lists")
     params = {'count': 250}
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
+    with new_transformer() as bumble_bee:
         # To handle records updated between start of the table sync and the end,
         # store the current sync start in the state and not move the bookmark past this value.
         sync_start_time = utils.now()
@@ -971,14 +1424,14 @@ def sync_contact_lists(STATE, ctx):
             record = bumble_bee.transform(lift_properties_and_versions(row), schema, mdata)
 
             if record[bookmark_key] >= start:
-                singer.write_record("contact_lists", record, catalog.get('stream_alias'), time_extracted=utils.now())
+                write_record("contact_lists", record, catalog.get('stream_alias'), time_extracted=utils.now())
             if record[bookmark_key] >= max_bk_value:
                 max_bk_value = record[bookmark_key]
 
     # Don't bookmark past the start of this sync to account for updated records during the sync.
     new_bookmark = min(utils.strptime_to_utc(max_bk_value), sync_start_time)
     STATE = singer.write_bookmark(STATE, 'contact_lists', bookmark_key, utils.strftime(new_bookmark))
-    singer.write_state(STATE)
+    write_state(STATE)
 
     return STATE
 
@@ -988,7 +1441,7 @@ def sync_forms(STATE, ctx):
     schema = load_schema("forms")
     bookmark_key = 'updatedAt'
 
-    singer.write_schema("forms", schema, ["guid"], [bookmark_key], catalog.get('stream_alias'))
+    write_schema("forms", schema, ["guid"], [bookmark_key], catalog.get('stream_alias'))
     start = get_start(STATE, "forms", bookmark_key)
     max_bk_value = start
 
@@ -997,7 +1450,7 @@ def sync_forms(STATE, ctx):
     data = request(get_url("forms")).json()
     time_extracted = utils.now()
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
+    with new_transformer() as bumble_bee:
         # To handle records updated between start of the table sync and the end,
         # store the current sync start in the state and not move the bookmark past this value.
         sync_start_time = utils.now()
@@ -1005,14 +1458,14 @@ def sync_forms(STATE, ctx):
             record = bumble_bee.transform(lift_properties_and_versions(row), schema, mdata)
 
             if record[bookmark_key] >= start:
-                singer.write_record("forms", record, catalog.get('stream_alias'), time_extracted=time_extracted)
+                write_record("forms", record, catalog.get('stream_alias'), time_extracted=time_extracted)
             if record[bookmark_key] >= max_bk_value:
                 max_bk_value = record[bookmark_key]
 
     # Don't bookmark past the start of this sync to account for updated records during the sync.
     new_bookmark = min(utils.strptime_to_utc(max_bk_value), sync_start_time)
     STATE = singer.write_bookmark(STATE, 'forms', bookmark_key, utils.strftime(new_bookmark))
-    singer.write_state(STATE)
+    write_state(STATE)
 
     return STATE
 
@@ -1021,33 +1474,33 @@ def sync_workflows(STATE, ctx):
     mdata = metadata.to_map(catalog.get('metadata'))
     schema = load_schema("workflows")
     bookmark_key = 'updatedAt'
-    singer.write_schema("workflows", schema, ["id"], [bookmark_key], catalog.get('stream_alias'))
+    write_schema("workflows", schema, ["id"], [bookmark_key], catalog.get('stream_alias'))
     start = get_start(STATE, "workflows", bookmark_key)
     max_bk_value = start
 
     STATE = singer.write_bookmark(STATE, 'workflows', bookmark_key, max_bk_value)
-    singer.write_state(STATE)
+    write_state(STATE)
 
     LOGGER.info("sync_workflows from %s", start)
 
     data = request(get_url("workflows")).json()
     time_extracted = utils.now()
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
+    with new_transformer() as bumble_bee:
         # To handle records updated between start of the table sync and the end,
         # store the current sync start in the state and not move the bookmark past this value.
         sync_start_time = utils.now()
         for row in data['workflows']:
             record = bumble_bee.transform(lift_properties_and_versions(row), schema, mdata)
             if record[bookmark_key] >= start:
-                singer.write_record("workflows", record, catalog.get('stream_alias'), time_extracted=time_extracted)
+                write_record("workflows", record, catalog.get('stream_alias'), time_extracted=time_extracted)
             if record[bookmark_key] >= max_bk_value:
                 max_bk_value = record[bookmark_key]
 
     # Don't bookmark past the start of this sync to account for updated records during the sync.
     new_bookmark = min(utils.strptime_to_utc(max_bk_value), sync_start_time)
     STATE = singer.write_bookmark(STATE, 'workflows', bookmark_key, utils.strftime(new_bookmark))
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 def sync_owners(STATE, ctx):
@@ -1063,7 +1516,7 @@ def sync_engagements(STATE, ctx):
     mdata = metadata.to_map(catalog.get('metadata'))
     schema = load_schema("engagements")
     bookmark_key = 'lastUpdated'
-    singer.write_schema("engagements", schema, ["engagement_id"], [bookmark_key], catalog.get('stream_alias'))
+    write_schema("engagements", schema, ["engagement_id"], [bookmark_key], catalog.get('stream_alias'))
     start = get_start(STATE, "engagements", bookmark_key)
 
     # Because this stream doesn't query by `lastUpdated`, it cycles
@@ -1074,13 +1527,13 @@ def sync_engagements(STATE, ctx):
     # sync's start in the state and not move the bookmark past this value.
     current_sync_start = get_current_sync_start(STATE, "engagements") or utils.now()
     STATE = write_current_sync_start(STATE, "engagements", current_sync_start)
-    singer.write_state(STATE)
+    write_state(STATE)
 
     max_bk_value = start
     LOGGER.info("sync_engagements from %s", start)
 
     STATE = singer.write_bookmark(STATE, 'engagements', bookmark_key, start)
-    singer.write_state(STATE)
+    write_state(STATE)
 
     url = get_url("engagements_all")
     params = {'limit': int(CONFIG.get('engagements_page_size') or 190)}
@@ -1089,14 +1542,14 @@ def sync_engagements(STATE, ctx):
 
     time_extracted = utils.now()
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
+    with new_transformer() as bumble_bee:
         for engagement in engagements:
             record = bumble_bee.transform(lift_properties_and_versions(engagement), schema, mdata)
             if record['engagement'][bookmark_key] >= start:
                 # hoist PK and bookmark field to top-level record
                 record['engagement_id'] = record['engagement']['id']
                 record[bookmark_key] = record['engagement'][bookmark_key]
-                singer.write_record("engagements", record, catalog.get('stream_alias'), time_extracted=time_extracted)
+                write_record("engagements", record, catalog.get('stream_alias'), time_extracted=time_extracted)
                 if record['engagement'][bookmark_key] >= max_bk_value:
                     max_bk_value = record['engagement'][bookmark_key]
 
@@ -1104,45 +1557,46 @@ def sync_engagements(STATE, ctx):
     new_bookmark = min(utils.strptime_to_utc(max_bk_value), current_sync_start)
     STATE = singer.write_bookmark(STATE, 'engagements', bookmark_key, utils.strftime(new_bookmark))
     STATE = write_current_sync_start(STATE, 'engagements', None)
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 def sync_deal_pipelines(STATE, ctx):
     catalog = ctx.get_catalog_from_id(singer.get_currently_syncing(STATE))
     mdata = metadata.to_map(catalog.get('metadata'))
     schema = load_schema('deal_pipelines')
-    singer.write_schema('deal_pipelines', schema, ['pipelineId'], catalog.get('stream_alias'))
+    write_schema('deal_pipelines', schema, ['pipelineId'], catalog.get('stream_alias'))
     LOGGER.info('sync_deal_pipelines')
     data = request(get_url('deal_pipelines')).json()
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as bumble_bee:
+    with new_transformer() as bumble_bee:
         for row in data:
             record = bumble_bee.transform(lift_properties_and_versions(row), schema, mdata)
-            singer.write_record("deal_pipelines", record, catalog.get('stream_alias'), time_extracted=utils.now())
-    singer.write_state(STATE)
+            write_record("deal_pipelines", record, catalog.get('stream_alias'), time_extracted=utils.now())
+    write_state(STATE)
     return STATE
 
 def gen_request_custom_objects(tap_stream_id, url, params, path, more_key):
     """
     Cursor-based API Pagination : Used in custom_objects stream implementation
     """
-    try:
-        with metrics.record_counter(tap_stream_id) as counter:
-            while True:
-                data = request(url, params).json()
+    prefetch_pages = get_prefetch_pages()
 
-                if data.get(path) is None:
-                    raise RuntimeError(
-                        "Unexpected API response: {} not in {}".format(path, data.keys()))
+    def next_params(page_params, page):
+        data = page.data
+        if not data.get(more_key):
+            return None
+        page_params['after'] = data.get(more_key, {}).get('next', {}).get('after', None)
+        if page_params['after'] is None:
+            return None
+        return page_params
 
-                for row in data[path]:
+    try:
+        with metrics.record_counter(tap_stream_id) as counter:
+            for page in iter_pages(lambda page_params: get_properties_page(url, page_params, path,
+                                                                           stream=not prefetch_pages),
+                                   params, next_params, prefetch_pages):
+                for row in page.rows():
                     counter.increment()
                     yield row
-
-                if not data.get(more_key):
-                    break
-                params['after'] = data.get(more_key, {}).get('next', {}).get('after', None)
-                if params['after'] is None:
-                    break
     except SourceUnavailableException as ex:
         warning_message = str(ex).replace(CONFIG['access_token'], 10 * '*')
         LOGGER.warning(warning_message)
@@ -1162,10 +1616,10 @@ def sync_custom_objects(stream_id, primary_key, bookmark_key, catalog, STATE, pa
 
     LOGGER.info(f"Sync record for {stream_id} from {bookmark_value}")
     schema = catalog.get('schema')
-    singer.write_schema(stream_id, schema, [primary_key],
+    write_schema(stream_id, schema, [primary_key],
                         [bookmark_key], catalog.get('stream_alias'))
 
-    with Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING) as transformer:
+    with new_transformer() as transformer:
         # To handle records updated between start of the table sync and the end,
         # store the current sync start in the state and not move the bookmark past this value.
         sync_start_time = utils.now()
@@ -1178,7 +1632,7 @@ def sync_custom_objects(stream_id, primary_key, bookmark_key, catalog, STATE, pa
             if modified_time and modified_time >= bookmark_value:
                 # transforms the data and filters out the selected fields from the catalog
                 record = transformer.transform(lift_properties_and_versions(row), schema, mdata)
-                singer.write_record(stream_id, record, catalog.get(
+                write_record(stream_id, record, catalog.get(
                     'stream'), time_extracted=utils.now())
             if modified_time and modified_time >= max_bk_value:
                 max_bk_value = modified_time
@@ -1186,7 +1640,7 @@ def sync_custom_objects(stream_id, primary_key, bookmark_key, catalog, STATE, pa
     # Don't bookmark past the start of this sync to account for updated records during the sync.
     new_bookmark = min(max_bk_value, sync_start_time)
     STATE = singer.write_bookmark(STATE, stream_id, bookmark_key, utils.strftime(new_bookmark))
-    singer.write_state(STATE)
+    write_state(STATE)
     return STATE
 
 
@@ -1328,10 +1782,16 @@ def do_sync(STATE, catalog):
     selected_streams = get_selected_streams(remaining_streams, ctx)
     LOGGER.info('Starting sync. Will sync these streams: %s',
                 [stream.tap_stream_id for stream in selected_streams])
+    global CURRENT_STREAM # pylint: disable=global-statement
     for stream in selected_streams:
+        if quota_reserved_for(stream.tap_stream_id):
+            LOGGER.warning('Deferring low priority stream %s, only %s daily API calls are left',
+                           stream.tap_stream_id, QUOTA.remaining)
+            continue
         LOGGER.info('Syncing %s', stream.tap_stream_id)
+        CURRENT_STREAM = stream.tap_stream_id
         STATE = singer.set_currently_syncing(STATE, stream.tap_stream_id)
-        singer.write_state(STATE)
+        write_state(STATE)
 
         try:
             if stream.tap_stream_id in custom_objects:
@@ -1345,8 +1805,26 @@ def do_sync(STATE, catalog):
             LOGGER.fatal(f"For stream - {stream.tap_stream_id}, please select fewer fields. "
                          f"The current selection exceeds Hubspot's maximum character allowance.")
             raise ex
+        except CircuitOpenException as ex:
+            # Leave the stream's bookmarks where they are so the next run picks it up again
+            LOGGER.error("Skipping the rest of stream %s: %s", stream.tap_stream_id, ex)
+        except QuotaReservedException as ex:
+            LOGGER.warning("Deferring the rest of low priority stream %s: %s", stream.tap_stream_id, ex)
+        finally:
+            if QUOTA is not None:
+                QUOTA.save()
+            LOGGER.info('%s spent %.1f seconds sleeping in retry backoff',
+                        stream.tap_stream_id, RETRY_SLEEP.get(stream.tap_stream_id))
+            transferred = TRANSPORT.transfer.get(stream.tap_stream_id)
+            LOGGER.info('%s received %s response bytes over the wire, %s after decompression',
+                        stream.tap_stream_id, transferred['compressed'], transferred['uncompressed'])
+            if CONFIG.get('metrics_summary_per_stream') in (True, 'true', 'True'):
+                log_http_summary(stream.tap_stream_id)
+    CURRENT_STREAM = None
     STATE = singer.set_currently_syncing(STATE, None)
-    singer.write_state(STATE)
+    write_state(STATE)
+    log_connection_stats()
+    log_http_summary()
     LOGGER.info("Sync completed")
 
 class Context:
@@ -1456,6 +1934,282 @@ def get_request_timeout():
         request_timeout = REQUEST_TIMEOUT
     return request_timeout
 
+def get_request_timeouts(url):
+    """
+    Timeout to call `url` with: the `request_timeout` scalar, or a
+    `(connect, read)` pair when per endpoint timeouts are configured.
+    """
+    if TIMEOUT_POLICY is None:
+        return get_request_timeout()
+    return TIMEOUT_POLICY.timeouts(url)
+
+def get_max_url_length():
+    # Longest url the tap sends before splitting ids or properties over several calls
+    return int(CONFIG.get('max_url_length') or DEFAULT_MAX_URL_LENGTH)
+
+def get_prefetch_pages():
+    # Number of list pages fetched ahead of the page being synced, 0 (none) by default
+    return max(int(CONFIG.get('prefetch_pages') or 0), 0)
+
+def get_pipeline_queue_size():
+    # Records queued between the fetch, transform and emit stages of a sync, 0 (no pipeline) by default
+    return max(int(CONFIG.get('pipeline_queue_size') or 0), 0)
+
+def get_transform_processes():
+    # Worker processes transforming records, 0 (transform in the tap's own process) by default
+    return max(int(CONFIG.get('transform_processes') or 0), 0)
+
+def run_stages(stream_id, source, transformer, schema, mdata, emit):
+    """
+    Emit the rows of `source` once lifted and transformed by `transformer`:
+    as a pipeline of fetch, transform and emit threads when
+    `pipeline_queue_size` or `transform_processes` is configured, one row at
+    a time on this thread otherwise. With `transform_processes`, rows are
+    transformed by that many worker processes.
+    """
+    def transform(row):
+        return transformer.transform(lift_properties_and_versions(row), schema, mdata)
+
+    queue_size = get_pipeline_queue_size()
+    processes = get_transform_processes()
+    if not queue_size and not processes:
+        pipeline.run_sequentially(source, transform, emit)
+        return
+
+    pool = None
+    if processes:
+        pool = TransformPool(processes, transformer, schema, mdata, lift_properties_and_versions)
+    staged = pipeline.Pipeline(stream_id, transform, emit, queue_size or pipeline.DEFAULT_QUEUE_SIZE, pool=pool)
+    try:
+        staged.run(source)
+    finally:
+        if pool is not None:
+            pool.close()
+        LOGGER.info('%s pipeline: %s', stream_id, ', '.join(
+            '{} {} rows in {:.1f}s'.format(stage, staged.counts[stage], staged.timings[stage])
+            for stage in (pipeline.FETCH, pipeline.TRANSFORM, pipeline.EMIT)))
+
+def get_max_concurrency():
+    # Number of HubSpot calls that may be in flight at once, 1 (serial) by default
+    config_max_concurrency = CONFIG.get('max_concurrency')
+    if config_max_concurrency and int(config_max_concurrency) > 1:
+        return int(config_max_concurrency)
+    return 1
+
+def configure_base_url():
+    """
+    Send every call to the `base_url` config value, e.g. a local stand-in
+    server, instead of the HubSpot API.
+    """
+    global BASE_URL # pylint: disable=global-statement
+    BASE_URL = (CONFIG.get('base_url') or DEFAULT_BASE_URL).rstrip('/')
+
+def configure_transport():
+    """
+    Rebuild the shared transport from the `http2`, `pool_connections`,
+    `pool_maxsize`, `keep_alive` and `compression` config values.
+    """
+    global TRANSPORT # pylint: disable=global-statement
+    pool_maxsize = max(int(CONFIG.get('pool_maxsize') or DEFAULT_POOL_MAXSIZE), get_max_concurrency())
+    transport_class = Transport
+    if CONFIG.get('http2') in (True, 'true', 'True'):
+        if http2_available():
+            transport_class = Http2Transport
+        else:
+            LOGGER.warning("http2 is set but httpx with its http2 extra is not installed, using HTTP/1.1")
+    TRANSPORT.close()
+    TRANSPORT = transport_class(pool_connections=int(CONFIG.get('pool_connections') or DEFAULT_POOL_CONNECTIONS),
+                          pool_maxsize=pool_maxsize,
+                          keep_alive=CONFIG.get('keep_alive', True) not in (False, 'false', 'False'),
+                          compression=CONFIG.get('compression', True) not in (False, 'false', 'False'))
+
+def configure_retry_policies():
+    """
+    Overlay the `retry_policies` config value on the default retry policies.
+    """
+    global RETRY_POLICIES # pylint: disable=global-statement
+    RETRY_POLICIES = build_policies(CONFIG.get('retry_policies'))
+
+def configure_circuit_breakers():
+    """
+    Enable per API source circuit breakers when `circuit_breaker_failure_rate`
+    is configured.
+    """
+    global CIRCUIT_BREAKERS # pylint: disable=global-statement
+    failure_rate = CONFIG.get('circuit_breaker_failure_rate')
+    if not failure_rate:
+        CIRCUIT_BREAKERS = CircuitBreakerRegistry()
+        return
+    CIRCUIT_BREAKERS = CircuitBreakerRegistry(
+        enabled=True,
+        failure_rate=float(failure_rate),
+        window=int(CONFIG.get('circuit_breaker_window') or 20),
+        min_calls=int(CONFIG.get('circuit_breaker_min_calls') or 10),
+        reset_timeout=float(CONFIG.get('circuit_breaker_reset_seconds') or 60))
+
+def configure_token_cache():
+    """
+    Enable the encrypted access token cache when `token_cache_path` is
+    configured.
+    """
+    global TOKEN_CACHE # pylint: disable=global-statement
+    TOKEN_CACHE = TokenCache.from_config(CONFIG)
+
+def configure_request_coalescer():
+    """
+    Rebuild the request coalescer with the `request_coalesce_window` config
+    value, in seconds.
+    """
+    global REQUEST_COALESCER # pylint: disable=global-statement
+    REQUEST_COALESCER = RequestCoalescer(window=float(CONFIG.get('request_coalesce_window') or 0))
+
+def configure_engine():
+    """
+    Issue concurrent detail fetches on a pool of `max_concurrency` threads.
+    """
+    global ENGINE # pylint: disable=global-statement
+    ENGINE.close()
+    ENGINE = RequestEngine(get_max_concurrency())
+
+def configure_hedging():
+    """
+    Enable hedged GET requests when `hedge_requests` is configured, tuned by
+    `hedge_percentile` and `hedge_budget`.
+    """
+    global HEDGER # pylint: disable=global-statement
+    if HEDGER is not None:
+        HEDGER.close()
+        HEDGER = None
+    if CONFIG.get('hedge_requests') in (True, 'true', 'True'):
+        HEDGER = Hedger(LATENCY,
+                        percentile=float(CONFIG.get('hedge_percentile') or DEFAULT_PERCENTILE),
+                        budget=float(CONFIG.get('hedge_budget') or DEFAULT_BUDGET),
+                        max_workers=2 * get_max_concurrency() + 2)
+
+def configure_timeouts():
+    """
+    Use separate connect and read timeouts when `connect_timeout`,
+    `timeout_profiles` or `adaptive_timeouts` is configured. Both default
+    to `request_timeout`.
+    """
+    global TIMEOUT_POLICY # pylint: disable=global-statement
+    adaptive = CONFIG.get('adaptive_timeouts') in (True, 'true', 'True')
+    if not (CONFIG.get('connect_timeout') or CONFIG.get('timeout_profiles') or adaptive):
+        TIMEOUT_POLICY = None
+        return
+    TIMEOUT_POLICY = TimeoutPolicy(
+        connect=float(CONFIG.get('connect_timeout') or get_request_timeout()),
+        read=get_request_timeout(),
+        profiles=CONFIG.get('timeout_profiles'),
+        tracker=LATENCY if adaptive else None,
+        factor=float(CONFIG.get('adaptive_timeout_factor') or DEFAULT_ADAPTIVE_FACTOR),
+        minimum=float(CONFIG.get('adaptive_timeout_min') or DEFAULT_ADAPTIVE_MIN))
+
+def log_concurrency_window(window):
+    metrics.log(LOGGER, metrics.Point('gauge', 'http_concurrency_window', window, {}))
+
+def configure_adaptive_concurrency():
+    """
+    Let an AIMD controller find how many of the `max_concurrency` calls may
+    be in flight when `adaptive_concurrency` is configured.
+    """
+    global CONCURRENCY # pylint: disable=global-statement
+    if CONFIG.get('adaptive_concurrency') not in (True, 'true', 'True'):
+        CONCURRENCY = None
+        return
+    CONCURRENCY = AIMDController(
+        max_window=get_max_concurrency(),
+        latency_spike=float(CONFIG.get('adaptive_concurrency_latency_spike') or DEFAULT_LATENCY_SPIKE),
+        on_change=log_concurrency_window)
+    log_concurrency_window(CONCURRENCY.limit)
+
+def get_portal_key():
+    # Identifies the portal in the quota ledger without storing credentials
+    if CONFIG.get('portal_id'):
+        return str(CONFIG['portal_id'])
+    credential = CONFIG.get('hapikey') or CONFIG.get('refresh_token') or ''
+    return hashlib.sha256(credential.encode('utf-8')).hexdigest()[:16]
+
+def configure_quota():
+    """
+    Track the portal's daily API quota in the `quota_ledger_path` file when
+    it is configured, keeping `quota_reserve` calls for other integrations.
+    """
+    global QUOTA # pylint: disable=global-statement
+    path = CONFIG.get('quota_ledger_path')
+    if not path:
+        QUOTA = None
+        return
+    QUOTA = QuotaLedger(path, get_portal_key(), reserve=int(CONFIG.get('quota_reserve') or 0))
+    LOGGER.info("Daily API quota: %s calls made today, %s remaining", QUOTA.calls, QUOTA.remaining)
+
+def configure_request_log():
+    """
+    Rebuild the request trace with the `request_log_sample_rate` and
+    `request_log_redact` config values and start its log listener.
+    """
+    global REQUEST_TRACER # pylint: disable=global-statement
+    REQUEST_TRACER.stop()
+    sample_rate = CONFIG.get('request_log_sample_rate')
+    REQUEST_TRACER = RequestTracer(
+        sample_rate=DEFAULT_SAMPLE_RATE if sample_rate in (None, '') else float(sample_rate),
+        redacted_params=DEFAULT_REDACTED_PARAMS + tuple(CONFIG.get('request_log_redact') or ()))
+    REQUEST_TRACER.start()
+
+def configure_writer():
+    """
+    Rebuild the message writer with the `output_buffer_size` (bytes) and
+    `output_flush_interval` (seconds) config values.
+    """
+    global WRITER # pylint: disable=global-statement
+    WRITER.close()
+    buffer_size = CONFIG.get('output_buffer_size')
+    flush_interval = CONFIG.get('output_flush_interval')
+    WRITER = MessageWriter(
+        buffer_size=DEFAULT_BUFFER_SIZE if buffer_size in (None, '') else int(buffer_size),
+        flush_interval=DEFAULT_FLUSH_INTERVAL if flush_interval in (None, '') else float(flush_interval))
+
+def configure_rate_limiter():
+    """
+    Rebuild the rate limiter from the `rate_limit_pacing` and
+    `rate_limit_headroom` config values.
+    """
+    global RATE_LIMITER # pylint: disable=global-statement
+    headroom = CONFIG.get('rate_limit_headroom')
+    RATE_LIMITER = RateLimiter(headroom=DEFAULT_HEADROOM if headroom in (None, '') else int(headroom),
+                               enabled=CONFIG.get('rate_limit_pacing', True) not in (False, 'false', 'False'))
+
+def log_connection_stats():
+    LOGGER.info("HTTP requests by status: %s",
+                ", ".join("{} {}={}".format(method, status, count)
+                          for (method, status), count in sorted(REQUEST_TRACER.counts().items())))
+    stats = TRANSPORT.connection_stats()
+    LOGGER.info("HTTP connections: %s requests sent, %s new connections, %s reused connections",
+                stats['requests'], stats['new_connections'], stats['reused_connections'])
+    LOGGER.info("Rate limiter paced requests for %.1f seconds, %s daily calls remaining",
+                RATE_LIMITER.total_wait, RATE_LIMITER.daily_remaining)
+    LOGGER.info("%s duplicate GET requests were answered without calling HubSpot",
+                REQUEST_COALESCER.coalesced)
+    if CONCURRENCY is not None:
+        LOGGER.info("Adaptive concurrency window ended at %s of %s calls in flight",
+                    CONCURRENCY.limit, CONCURRENCY.max_window)
+    if HEDGER is not None:
+        LOGGER.info("Hedged %s of %s GET requests, the hedge responded first %s times",
+                    HEDGER.hedges, HEDGER.calls, HEDGER.hedge_wins)
+
+def log_http_summary(stream=None):
+    """
+    Log where the HTTP calls of `stream`, or of the whole sync, spent their
+    time: one line per endpoint with its call count, statuses, latency
+    percentiles, bytes received and retries.
+    """
+    lines = HTTP_METRICS.summary(stream)
+    if not lines:
+        return
+    LOGGER.info("HTTP calls by endpoint%s:", " for " + stream if stream else "")
+    for line in lines:
+        LOGGER.info("  %s", line)
+
 def main_impl():
     args = utils.parse_args(
         ["redirect_uri",
@@ -1465,17 +2219,36 @@ def main_impl():
          "start_date"])
 
     CONFIG.update(args.config)
+    configure_base_url()
+    configure_transport()
+    configure_rate_limiter()
+    configure_engine()
+    configure_retry_policies()
+    configure_circuit_breakers()
+    configure_token_cache()
+    configure_request_coalescer()
+    configure_hedging()
+    configure_timeouts()
+    configure_adaptive_concurrency()
+    configure_quota()
+    configure_request_log()
+    configure_writer()
     STATE = {}
 
     if args.state:
         STATE.update(args.state)
 
-    if args.discover:
-        do_discover()
-    elif args.properties:
-        do_sync(STATE, args.properties)
-    else:
-        LOGGER.info("No properties were selected")
+    try:
+        if args.discover:
+            do_discover()
+        elif args.properties:
+            do_sync(STATE, args.properties)
+        else:
+            LOGGER.info("No properties were selected")
+    finally:
+        WRITER.flush()
+        TOKEN_MANAGER.stop()
+        REQUEST_TRACER.stop()
 
 def main():
     try:
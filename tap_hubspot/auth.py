@@ -0,0 +1,108 @@
+"""
+OAuth access token shared by every thread making HubSpot calls.
+"""
+import threading
+import time
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Refresh this many seconds before the token expires
+DEFAULT_REFRESH_MARGIN = 600
+# Stop handing out a token this many seconds before it expires
+EXPIRY_SAFETY_MARGIN = 60
+# Wait before retrying a failed background refresh
+RETRY_INTERVAL = 30
+
+
+class _Token:
+    __slots__ = ('header', 'expires_at')
+
+    def __init__(self, header, expires_at):
+        self.header = header
+        self.expires_at = expires_at
+
+
+class TokenManager:
+    """
+    Holds the current bearer token and refreshes it on a background timer
+    `refresh_margin` seconds ahead of its expiry.
+
+    `fetch_token()` must return the new access token and its lifetime in
+    seconds. `authorization_header()` is a plain attribute read while the
+    token is valid; callers only block (and see the refresh's exception) when
+    there is no valid token yet, e.g. for the first call or when background
+    refreshes have kept failing until the token expired.
+    """
+
+    def __init__(self, fetch_token, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 clock=time.monotonic, timer_factory=threading.Timer):
+        self.fetch_token = fetch_token
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.timer_factory = timer_factory
+
+        self._token = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._stopped = False
+
+    def authorization_header(self):
+        token = self._token
+        if token is not None and self.clock() < token.expires_at:
+            return token.header
+        with self._lock:
+            token = self._token
+            if token is None or self.clock() >= token.expires_at:
+                token = self._refresh()
+            return token.header
+
+    def invalidate(self, header):
+        """
+        Refresh the token right away if `header` is still the current one,
+        e.g. after HubSpot rejected it. Threads rejected with the same token
+        only refresh it once.
+        """
+        with self._lock:
+            if self._token is not None and self._token.header == header:
+                self._refresh()
+
+    def _refresh(self):
+        access_token, expires_in = self.fetch_token()
+        now = self.clock()
+        token = _Token('Bearer {}'.format(access_token),
+                       now + max(expires_in - EXPIRY_SAFETY_MARGIN, 0))
+        self._token = token
+        self._schedule(max(expires_in - self.refresh_margin, 0))
+        return token
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._stopped:
+            return
+        self._timer = self.timer_factory(delay, self._refresh_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._stopped:
+                return
+            try:
+                self._refresh()
+            except Exception as ex: # pylint: disable=broad-except
+                token = self._token
+                remaining = token.expires_at - self.clock() if token else 0
+                LOGGER.warning("Background token refresh failed (%s), current token expires in %d seconds",
+                               ex, remaining)
+                if remaining > 0:
+                    self._schedule(min(RETRY_INTERVAL, remaining))
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
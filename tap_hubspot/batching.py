@@ -0,0 +1,68 @@
+"""
+Sizing of GET requests that carry many ids or property names in their url.
+
+HubSpot answers 414 when a url is too long. Batches are packed so their
+encoded url stays under a length limit, and a batch that still gets a 414
+is split in halves until every part fits.
+"""
+import urllib.parse
+
+import requests
+
+DEFAULT_MAX_URL_LENGTH = 4000
+# Left for parameters added after sizing, e.g. `hapikey` or a paging cursor
+URL_HEADROOM = 200
+
+
+def url_length(url, params):
+    return len(requests.Request('GET', url, params=params).prepare().url)
+
+
+def repeated_param_length(name):
+    """
+    Encoded length added by each `name=<item>` of a repeated query param.
+    """
+    return lambda item: len(urllib.parse.urlencode({name: item})) + 1
+
+
+def joined_param_length(item):
+    """
+    Encoded length added by each item of a comma joined query param.
+    """
+    return len(urllib.parse.quote_plus(str(item))) + len(urllib.parse.quote_plus(','))
+
+
+def pack(items, base_length, item_length, max_length, max_items=None):
+    """
+    Split `items` into consecutive batches of at most `max_items` whose url,
+    `base_length` plus the `item_length` of each item, fits in `max_length`.
+    Every batch holds at least one item.
+    """
+    budget = max_length - URL_HEADROOM
+    batches = []
+    batch, length = [], base_length
+    for item in items:
+        cost = item_length(item)
+        if batch and (length + cost > budget or (max_items and len(batch) >= max_items)):
+            batches.append(batch)
+            batch, length = [], base_length
+        batch.append(item)
+        length += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def split_on_error(fetch, items, error):
+    """
+    Call `fetch(items)`, which returns a list of results. When it raises
+    `error`, fetch each half of `items` the same way and return their
+    results concatenated. A single item that raises `error` re-raises it.
+    """
+    try:
+        return fetch(items)
+    except error:
+        if len(items) <= 1:
+            raise
+    middle = len(items) // 2
+    return split_on_error(fetch, items[:middle], error) + split_on_error(fetch, items[middle:], error)
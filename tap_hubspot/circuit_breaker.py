@@ -0,0 +1,100 @@
+"""
+Circuit breakers keyed by HubSpot API source (`contacts`, `email`, `crm`, ...).
+
+A breaker starts closed and records the outcome of the last `window` calls.
+Once at least `min_calls` outcomes are recorded and the share of failures
+reaches `failure_rate`, it opens and every call is refused until
+`reset_timeout` seconds have passed. It then goes half-open and lets a
+single probe through: a successful probe closes it again, a failed one
+re-opens it for another `reset_timeout`.
+"""
+import collections
+import threading
+import time
+
+import singer
+
+LOGGER = singer.get_logger()
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=10, reset_timeout=60.0,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = collections.deque(maxlen=window)
+        self._opened_at = None
+        self._probe_in_flight = False
+        self.state = CLOSED
+
+    def allow(self):
+        """
+        Returns whether a call may be made now.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                LOGGER.info("Circuit for %s is half-open, probing", self.name)
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                LOGGER.info("Circuit for %s closed", self.name)
+                self.state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls \
+               and failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        LOGGER.warning("Circuit for %s opened, failing fast for %s seconds", self.name, self.reset_timeout)
+        self.state = OPEN
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+
+
+class CircuitBreakerRegistry:
+    """
+    Hands out one breaker per API source. A registry built with
+    `enabled=False` never refuses a call.
+    """
+
+    def __init__(self, enabled=False, **breaker_kwargs):
+        self.enabled = enabled
+        self.breaker_kwargs = breaker_kwargs
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, source):
+        if not self.enabled or source is None:
+            return None
+        with self._lock:
+            if source not in self._breakers:
+                self._breakers[source] = CircuitBreaker(source, **self.breaker_kwargs)
+            return self._breakers[source]
@@ -0,0 +1,60 @@
+"""
+Sharing of identical GET requests.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+
+class RequestCoalescer:
+    """
+    Runs `fetch` once per key for callers that ask for the same key while it
+    is in flight, and, for `window` seconds after it succeeded, answers
+    later callers with the same result. Failures are handed to every caller
+    that was waiting on them and are never remembered.
+    """
+
+    def __init__(self, window=0, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._memo = {}
+        self.coalesced = 0
+
+    def _prune(self, now):
+        expired = [key for key, (expires_at, _) in self._memo.items() if expires_at <= now]
+        for key in expired:
+            del self._memo[key]
+
+    def get(self, key, fetch):
+        with self._lock:
+            now = self.clock()
+            self._prune(now)
+            if key in self._memo:
+                self.coalesced += 1
+                return self._memo[key][1]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fetch()
+        except BaseException as ex:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(ex)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if self.window > 0:
+                self._memo[key] = (self.clock() + self.window, result)
+        future.set_result(result)
+        return result
@@ -0,0 +1,77 @@
+"""
+JSON codec used to decode HubSpot responses and encode Singer messages.
+
+`orjson` is used when it is installed and the standard library (or
+singer-python's own encoder for messages) otherwise. Every input the fast
+path could treat differently from the standard encoders falls back to them,
+so the decoded values and emitted messages are the same either way:
+
+- integers too large for 64 bits, which orjson would decode as floats
+- numbers out of the double range and lone surrogates, which orjson rejects
+- `Decimal`, `datetime` and other values the standard encoder doesn't
+  serialise natively, which go through singer-python's `format_message`
+- NaN and infinite floats, which orjson writes as `null` where the
+  standard encoder writes `NaN` and `Infinity`
+"""
+import json
+import math
+import re
+
+import singer.messages
+
+try:
+    import orjson
+except ImportError: # pragma: no cover
+    orjson = None
+
+# 19+ digit integers may not fit in 64 bits
+LONG_INTEGER_RE = re.compile(rb'\d{19,}')
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+
+def loads(data):
+    """
+    Decode a JSON document given as bytes or str.
+    """
+    if orjson is not None:
+        raw = data.encode('utf-8') if isinstance(data, str) else data
+        if not LONG_INTEGER_RE.search(raw):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+    return json.loads(data)
+
+
+def _unsupported(obj):
+    raise TypeError(type(obj).__name__)
+
+
+def _has_non_finite(value):
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite(item) for item in value)
+    return False
+
+
+def format_message(message):
+    """
+    Serialise a Singer message to a single line of UTF-8 bytes, without the
+    trailing newline.
+    """
+    if orjson is not None:
+        data = message.asdict()
+        try:
+            encoded = orjson.dumps(data, default=_unsupported, option=ORJSON_OPTIONS)
+        except TypeError:
+            pass
+        else:
+            # Non-finite floats come out as null, so only messages with nulls are checked
+            if b'null' not in encoded or not _has_non_finite(data):
+                return encoded
+    return singer.messages.format_message(message).encode('utf-8')
+
@@ -0,0 +1,414 @@
+"""
+Record transformer compiled from a stream's schema and metadata.
+
+`singer.Transformer` walks the metadata and the JSON schema again for
+every record, looking up the selection of every nested key and the type
+and format of every field. For contacts and deals, that means every
+`property_*` field and every entry of `properties`. `CompiledTransformer`
+turns a schema and its metadata into nested closures once instead:
+
+- fields left out by the metadata are dropped through one lookup per
+  record, and metadata is only walked where it has entries
+- every schema node becomes one function trying its types in singer's
+  order ("null" last), with its format and type checks resolved ahead
+- datetimes given as unix epochs are converted and formatted inline
+
+Records come out the same as with `singer.Transformer`, and the same paths
+are collected in `removed` and `filtered`. A record that doesn't match its
+schema is transformed again by `singer.Transformer`, so it fails with the
+same `SchemaMismatch`.
+"""
+import datetime
+import decimal
+import re
+
+from singer import Transformer
+from singer.transform import (NO_INTEGER_DATETIME_PARSING, UNIX_SECONDS_INTEGER_DATETIME_PARSING,
+                              VALID_DATETIME_FORMATS, breadcrumb_path, string_to_datetime)
+from singer.utils import strftime
+
+FAILED = (False, None)
+DATETIME_CACHE_SIZE = 1 << 16
+
+# Formatted datetimes by epoch value
+_datetime_cache = {}
+UTC = datetime.timezone.utc
+
+
+def _format_utc(dtime):
+    # Same as singer.utils.strftime, whose %04Y pads years below 1000 differently by platform
+    if dtime.year < 1000:
+        return strftime(dtime)
+    return '%04d-%02d-%02dT%02d:%02d:%02d.%06dZ' % (dtime.year, dtime.month, dtime.day, dtime.hour,
+                                                     dtime.minute, dtime.second, dtime.microsecond)
+
+
+def _milliseconds_to_datetime(value):
+    # HubSpot repeats the same timestamps across the properties and versions of a record
+    cache = _datetime_cache
+    if value.__class__ in (int, str):
+        formatted = cache.get(value)
+        if formatted is not None:
+            return formatted
+    if value is None or value == "":
+        return None
+    try:
+        formatted = _format_utc(datetime.datetime.fromtimestamp(float(value) / 1000.0, UTC))
+    except Exception: # pylint: disable=broad-except
+        return string_to_datetime(value)
+    if value.__class__ in (int, str):
+        if len(cache) >= DATETIME_CACHE_SIZE:
+            cache.clear()
+        cache[value] = formatted
+    return formatted
+
+
+def _seconds_to_datetime(value):
+    if value is None or value == "":
+        return None
+    try:
+        return _format_utc(datetime.datetime.fromtimestamp(int(value), UTC))
+    except Exception: # pylint: disable=broad-except
+        return string_to_datetime(value)
+
+
+def _string_to_datetime(value):
+    if value is None or value == "":
+        return None
+    return string_to_datetime(value)
+
+
+def _datetime_parser(integer_datetime_fmt):
+    if integer_datetime_fmt not in VALID_DATETIME_FORMATS:
+        def invalid(value):
+            if value is None or value == "":
+                return None
+            raise Exception("Invalid integer datetime parsing option")
+        return invalid
+    if integer_datetime_fmt == NO_INTEGER_DATETIME_PARSING:
+        return _string_to_datetime
+    if integer_datetime_fmt == UNIX_SECONDS_INTEGER_DATETIME_PARSING:
+        return _seconds_to_datetime
+    return _milliseconds_to_datetime
+
+
+# Transforms of the leaf types, each returning (success, value) like `Transformer._transform`
+
+def _null(data, _):
+    if data is None or data == "":
+        return True, None
+    return FAILED
+
+
+def _string(data, _):
+    if data is not None:
+        try:
+            return True, str(data)
+        except Exception: # pylint: disable=broad-except
+            pass
+    return FAILED
+
+
+def _integer(data, _):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return True, int(data)
+    except Exception: # pylint: disable=broad-except
+        return FAILED
+
+
+def _number(data, _):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return True, float(data)
+    except Exception: # pylint: disable=broad-except
+        return FAILED
+
+
+def _boolean(data, _):
+    if isinstance(data, str) and data.lower() == "false":
+        return True, False
+    try:
+        return True, bool(data)
+    except Exception: # pylint: disable=broad-except
+        return FAILED
+
+
+def _decimal(data, _):
+    if isinstance(data, (str, float, int)):
+        try:
+            return True, str(decimal.Decimal(str(data)))
+        except Exception: # pylint: disable=broad-except
+            return FAILED
+    if isinstance(data, decimal.Decimal):
+        try:
+            return True, 'NaN' if data.is_snan() else str(data)
+        except Exception: # pylint: disable=broad-except
+            return FAILED
+    return FAILED
+
+
+def _unknown(data, _):
+    return FAILED
+
+
+LEAF_TYPES = {'string': _string, 'integer': _integer, 'number': _number, 'boolean': _boolean}
+
+
+def _string_or_null(data, _):
+    # Same as trying _string then _null, for the most common type of HubSpot fields
+    if data is not None:
+        try:
+            return True, str(data)
+        except Exception: # pylint: disable=broad-except
+            pass
+        if data == "":
+            return True, None
+        return FAILED
+    return True, None
+
+
+class _Compiler:
+    """
+    Compiles schema nodes into `(transform, needs_path)` pairs, where
+    `transform(data, path)` returns `(success, value)` and `path`, the
+    list of keys and indexes leading to `data`, is only built for the
+    nodes that report removed fields.
+    """
+
+    def __init__(self, integer_datetime_fmt, removed):
+        self._to_datetime = _datetime_parser(integer_datetime_fmt)
+        self._removed = removed
+        # Keyed by id, HubSpot schemas share the same node between `properties` and `property_*`
+        self._compiled = {}
+
+    def compile(self, schema):
+        key = id(schema)
+        if key not in self._compiled:
+            self._compiled[key] = (schema, self._compile(schema))
+        return self._compiled[key][1]
+
+    def _compile(self, schema):
+        if "anyOf" in schema:
+            return self._any_of([self.compile(subschema) for subschema in schema["anyOf"]])
+
+        if "type" not in schema:
+            return (lambda data, _: (True, data)), False
+
+        types = schema["type"]
+        types = list(types) if isinstance(types, list) else [types]
+        if "null" in types:
+            types.remove("null")
+            types.append("null")
+
+        if types == ["string", "null"] and schema.get("format") not in ("date-time", "singer.decimal"):
+            return _string_or_null, False
+
+        compiled = [self._type(typ, schema) for typ in types]
+        needs_path = any(needs for _, needs in compiled)
+        transforms = [transform for transform, _ in compiled]
+        if len(transforms) == 1:
+            return transforms[0], needs_path
+
+        def first_matching_type(data, path):
+            for transform in transforms:
+                success, value = transform(data, path)
+                if success:
+                    return success, value
+            return FAILED
+
+        return first_matching_type, needs_path
+
+    def _any_of(self, compiled):
+        transforms = [transform for transform, _ in compiled]
+
+        def first_matching_schema(data, path):
+            for transform in transforms:
+                success, value = transform(data, path)
+                if success:
+                    return success, value
+            return FAILED
+
+        return first_matching_schema, any(needs for _, needs in compiled)
+
+    def _type(self, typ, schema):
+        if typ == "null":
+            return _null, False
+        if schema.get("format") == "date-time":
+            to_datetime = self._to_datetime
+
+            def date_time(data, _):
+                value = to_datetime(data)
+                if value is None:
+                    return FAILED
+                return True, value
+
+            return date_time, False
+        if schema.get("format") == "singer.decimal":
+            return _decimal, False
+        if typ == "object":
+            return self._object(schema.get("properties", {}), schema.get("patternProperties"))
+        if typ == "array":
+            return self._array(schema)
+        return LEAF_TYPES.get(typ, _unknown), False
+
+    def _object(self, properties, pattern_properties):
+        if properties == {} and not pattern_properties:
+            return (lambda data, _: (True, data) if isinstance(data, dict) else FAILED), False
+
+        children = {key: self.compile(subschema) for key, subschema in properties.items()}
+        # Strings pass through `str` unchanged, so they and None need no call for string fields
+        strings = {key for key, (transform, _) in children.items() if transform is _string_or_null}
+        by_patterns = {}
+        removed = self._removed
+
+        def child_of(key):
+            # Same lookup as Transformer._transform_object for keys missing from the properties
+            patterns = tuple(pattern for pattern in (pattern_properties or {}) if re.match(pattern, key))
+            if not patterns:
+                return None
+            if patterns not in by_patterns:
+                by_patterns[patterns] = self._any_of([self.compile(pattern_properties[pattern])
+                                                      for pattern in patterns])
+            return by_patterns[patterns]
+
+        def transform_object(data, path):
+            if not isinstance(data, dict):
+                return FAILED
+            result = {}
+            success = True
+            for key, value in data.items():
+                if key in strings and (value is None or value.__class__ is str):
+                    result[key] = value
+                    continue
+                child = children.get(key)
+                if child is None:
+                    child = child_of(key) if pattern_properties else None
+                    if child is None:
+                        removed.add(".".join(map(str, path + [key])))
+                        continue
+                transform, needs_path = child
+                child_success, result[key] = transform(value, path + [key] if needs_path else None)
+                success = success and child_success
+            return success, result
+
+        return transform_object, True
+
+    def _array(self, schema):
+        if "items" not in schema:
+            def no_items(data, path):
+                raise KeyError("items")
+            return no_items, False
+
+        transform, needs_path = self.compile(schema["items"])
+
+        def transform_array(data, path):
+            if not isinstance(data, list):
+                return FAILED
+            result = []
+            success = True
+            for i, row in enumerate(data):
+                row_success, value = transform(row, path + [i] if needs_path else None)
+                result.append(value)
+                success = success and row_success
+            return success, result
+
+        return transform_array, needs_path
+
+
+def _compile_filter(metadata, filtered, parent=(), branches=None):
+    """
+    Function doing what `Transformer.filter_data_by_metadata` does to data
+    at the `parent` breadcrumb, or None when it would leave it untouched.
+    """
+    if branches is None:
+        # Every breadcrumb some metadata is nested under
+        branches = {breadcrumb[:depth] for breadcrumb in metadata for depth in range(len(breadcrumb))}
+    fields = set()
+    has_items = False
+    depth = len(parent)
+    for breadcrumb in metadata:
+        if len(breadcrumb) > depth + 1 and breadcrumb[:depth] == parent and breadcrumb[depth] == 'properties':
+            fields.add(breadcrumb[depth + 1])
+        elif len(breadcrumb) > depth and breadcrumb[:depth] == parent and breadcrumb[depth] == 'items':
+            has_items = True
+
+    dropped = {}
+    nested = {}
+    for field in fields:
+        breadcrumb = parent + ('properties', field)
+        field_metadata = metadata.get(breadcrumb, {})
+        if field_metadata.get('inclusion') == 'automatic':
+            continue
+        if field_metadata.get('selected') is False or field_metadata.get('inclusion') == 'unsupported':
+            dropped[field] = breadcrumb_path(breadcrumb)
+            continue
+        if breadcrumb in branches:
+            child = _compile_filter(metadata, filtered, breadcrumb, branches)
+            if child is not None:
+                nested[field] = child
+    items = _compile_filter(metadata, filtered, parent + ('items',), branches) if has_items else None
+
+    if not dropped and not nested and items is None:
+        return None
+
+    def filter_data(data):
+        if isinstance(data, dict):
+            if len(dropped) < len(data):
+                drops = [(field, path) for field, path in dropped.items() if field in data]
+            else:
+                drops = [(field, dropped[field]) for field in data if field in dropped]
+            for field, path in drops:
+                del data[field]
+                filtered.add(path)
+            for field, child in nested.items():
+                if field in data:
+                    data[field] = child(data[field])
+        if isinstance(data, list) and items is not None:
+            data = [items(row) for row in data]
+        return data
+
+    return filter_data
+
+
+class _Plan:
+    def __init__(self, transformer, schema, metadata):
+        # Held so the ids the plans are cached by stay unique
+        self.schema = schema
+        self.metadata = metadata
+        self.filter = _compile_filter(metadata, transformer.filtered) if metadata else None
+        self.transform, _ = _Compiler(transformer.integer_datetime_fmt, transformer.removed).compile(schema)
+
+
+class CompiledTransformer(Transformer):
+    """
+    Drop-in `singer.Transformer` compiling each schema and metadata pair it
+    is called with on first use. A `pre_hook` isn't compiled, the records
+    of transformers given one go through `singer.Transformer` as is.
+    """
+
+    def __init__(self, integer_datetime_fmt=NO_INTEGER_DATETIME_PARSING, pre_hook=None):
+        super().__init__(integer_datetime_fmt, pre_hook)
+        self._plans = {}
+
+    def compile(self, schema, metadata=None):
+        key = (id(schema), id(metadata))
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = _Plan(self, schema, metadata)
+        return plan
+
+    def transform(self, data, schema, metadata=None):
+        if self.pre_hook:
+            return super().transform(data, schema, metadata)
+
+        plan = self.compile(schema, metadata)
+        if plan.filter is not None:
+            data = plan.filter(data)
+        success, transformed_data = plan.transform(data, [])
+        if not success:
+            # Let singer-python collect the errors and raise them
+            return super().transform(data, schema, metadata)
+        return transformed_data
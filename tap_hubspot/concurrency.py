@@ -0,0 +1,89 @@
+"""
+Additive-increase/multiplicative-decrease (AIMD) control of the number of
+HubSpot calls in flight.
+"""
+import threading
+
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_LATENCY_SPIKE = 3.0
+# Weight of the latest call in the smoothed latency
+LATENCY_SMOOTHING = 0.1
+
+
+class AIMDController:
+    """
+    Bounds the calls in flight to `window`, which moves between
+    `min_window` and `max_window`.
+
+    Each healthy call grows the window by `1 / window`, i.e. by about one
+    slot per window's worth of calls. A call that was throttled, failed
+    with a 5xx or timeout, or took longer than `latency_spike` times the
+    smoothed latency of its endpoint cuts it by `decrease_factor`. Latencies
+    are smoothed per endpoint, as some (e.g. detail batches) are slow by
+    nature next to others (e.g. list pages). Only calls started after
+    the last cut can cut it again, so a burst of failures from one window
+    counts once. `on_change(window)` is called whenever the number of
+    usable slots changes.
+    """
+
+    def __init__(self, max_window, min_window=1, initial_window=None,
+                 decrease_factor=DEFAULT_DECREASE_FACTOR, latency_spike=DEFAULT_LATENCY_SPIKE,
+                 on_change=None):
+        self.max_window = max_window
+        self.min_window = min_window
+        self.decrease_factor = decrease_factor
+        self.latency_spike = latency_spike
+        self.on_change = on_change
+
+        self.window = float(initial_window or min_window)
+        self.in_flight = 0
+        # Smoothed latency by endpoint key
+        self.smoothed_latency = {}
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self):
+        return max(int(self.window), self.min_window)
+
+    def acquire(self):
+        """
+        Wait for a free slot. Returns a token to hand back to `release`.
+        """
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            return self._generation
+
+    def release(self, token, overloaded, latency=None, key=None):
+        """
+        Free the slot taken by `acquire`, recording whether the call was
+        `overloaded` (429, 5xx or timeout) and its latency in seconds, which
+        is compared with earlier calls to the same endpoint `key`.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            before = self.limit
+
+            spike = False
+            if latency is not None:
+                smoothed = self.smoothed_latency.get(key)
+                if smoothed is None:
+                    self.smoothed_latency[key] = latency
+                else:
+                    spike = latency > self.latency_spike * smoothed
+                    self.smoothed_latency[key] = smoothed + LATENCY_SMOOTHING * (latency - smoothed)
+
+            if overloaded or spike:
+                if token == self._generation:
+                    self._generation += 1
+                    self.window = max(self.window * self.decrease_factor, float(self.min_window))
+            else:
+                self.window = min(self.window + 1.0 / self.window, float(self.max_window))
+
+            after = self.limit
+            self._cond.notify_all()
+
+        if after != before and self.on_change:
+            self.on_change(after)
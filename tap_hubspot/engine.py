@@ -0,0 +1,47 @@
+"""
+Worker pool used to issue several HubSpot calls at once.
+
+The blocking `request()` and `post_search_endpoint()` functions keep owning
+retries, give-up handling and error mapping. The engine only schedules those
+calls on a bounded worker pool so more than one round trip can be in flight.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RequestEngine:
+    """
+    Runs blocking request callables concurrently on one long-lived pool of
+    `max_concurrency` threads, and returns their results in submission
+    order. The first exception raised by any call is re-raised to the
+    caller; calls that had not started are cancelled.
+    """
+
+    def __init__(self, max_concurrency=1):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._executor = None
+        if self.max_concurrency > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                thread_name_prefix='hubspot-request')
+
+    def map(self, func, calls):
+        """
+        `calls` is an iterable of argument tuples (or `(args, kwargs)` pairs
+        when the second element is a dict) passed to `func`.
+        """
+        calls = [self._normalise(call) for call in calls]
+        if self._executor is None or len(calls) <= 1:
+            return [func(*args, **kwargs) for args, kwargs in calls]
+        return list(self._executor.map(lambda call: func(*call[0], **call[1]), calls))
+
+    @staticmethod
+    def _normalise(call):
+        if isinstance(call, tuple) and len(call) == 2 and isinstance(call[1], dict) \
+           and isinstance(call[0], tuple):
+            return call
+        if not isinstance(call, tuple):
+            call = (call,)
+        return call, {}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,82 @@
+"""
+Hedged requests: a second copy of a slow idempotent call is sent once the
+first has been on the wire longer than most recent calls to the same
+endpoint, and whichever responds successfully first is used.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_PERCENTILE = 0.95
+DEFAULT_BUDGET = 0.05
+
+
+def _not_timed():
+    pass
+
+
+class Hedger:
+    """
+    `run(key, attempt)` calls `attempt(sending)` and, if it hasn't returned
+    within the `percentile` latency of `key` in `tracker` of calling
+    `sending()`, calls it a second time concurrently. Attempts call
+    `sending()` right before their request goes out, so time spent waiting
+    for the rate limiter doesn't count. The first copy to return a result
+    that is `ok` (or has no `ok` attribute) wins, failing that the first
+    to return at all; the call only fails if both copies raise. Hedges are
+    capped at `budget` times the number of calls made through `run`, so
+    they never take more than that share of the requests (and rate limit)
+    of a sync.
+    """
+
+    def __init__(self, tracker, percentile=DEFAULT_PERCENTILE, budget=DEFAULT_BUDGET, max_workers=4):
+        self.tracker = tracker
+        self.percentile = percentile
+        self.budget = budget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _take_budget(self):
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def run(self, key, attempt):
+        with self._lock:
+            self.calls += 1
+        threshold = self.tracker.percentile(key, self.percentile)
+        if threshold is None:
+            return attempt(_not_timed)
+
+        sent = threading.Event()
+        primary = self._executor.submit(attempt, sent.set)
+        primary.add_done_callback(lambda _: sent.set())
+        sent.wait()
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self._take_budget():
+            return primary.result()
+
+        backup = self._executor.submit(attempt, _not_timed)
+        pending = {primary, backup}
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                if not getattr(future.result(), 'ok', True):
+                    # e.g. a fast 429 or 5xx, only used if the other copy does no better
+                    fallback = fallback or future
+                    continue
+                if future is backup:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return future.result()
+        return (fallback or primary).result()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
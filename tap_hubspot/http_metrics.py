@@ -0,0 +1,198 @@
+"""
+In-process registry of HTTP call metrics by stream and endpoint template.
+
+Each call is filed under the name of its `ENDPOINTS` entry, e.g.
+`companies_detail` rather than the url of one company, with histograms of
+its latency and response size, its status codes, and the retries and
+backoff sleep it caused. `summary()` condenses them into one log line per
+endpoint, slowest in total first.
+"""
+import bisect
+import collections
+import re
+import threading
+import urllib.parse
+
+import requests
+
+from tap_hubspot.latency import endpoint_key
+
+# Upper bounds of the histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20, 100 << 20)
+
+
+class EndpointTemplates:
+    """
+    Matches urls to the names of an `ENDPOINTS` style dict of path
+    templates such as `/companies/v2/companies/{company_id}`.
+    """
+
+    def __init__(self, endpoints):
+        patterns = []
+        for name, path in endpoints.items():
+            pattern = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>[^/]+)', re.escape(path.rstrip('/')))
+            patterns.append((path.count('{'), -len(path), name, re.compile('^' + pattern + '/?$')))
+        # Fixed paths before templated ones, so `/deals/v1/deal/paged` isn't taken for `/deals/v1/deal/{deal_id}`
+        self._patterns = [(name, pattern) for _, _, name, pattern in sorted(patterns)]
+
+    def match(self, path):
+        """
+        Name of the template `path` matches and its arguments, or `(None, {})`.
+        """
+        for name, pattern in self._patterns:
+            found = pattern.match(path)
+            if found:
+                return name, found.groupdict()
+        return None, {}
+
+    def name(self, url, base_url=''):
+        """
+        Name of the template of `url`, or its path with ids replaced when it
+        matches none.
+        """
+        if base_url and url.startswith(base_url):
+            path = urllib.parse.urlsplit(url[len(base_url):]).path
+        else:
+            path = urllib.parse.urlsplit(url).path
+        return self.match(path)[0] or endpoint_key(url)
+
+
+class Histogram:
+    """
+    Counts of values by bucket, with their sum and maximum. Percentiles are
+    reported as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        if not self.total:
+            return None
+        rank = fraction * self.total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statuses = collections.Counter()
+        self.retries = 0
+        self.backoff = 0.0
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.size.merge(other.size)
+        self.statuses.update(other.statuses)
+        self.retries += other.retries
+        self.backoff += other.backoff
+
+
+def _format_size(size):
+    if size < 1 << 10:
+        return '{} B'.format(int(size))
+    if size < 1 << 20:
+        return '{:.1f} kB'.format(size / (1 << 10))
+    return '{:.1f} MB'.format(size / (1 << 20))
+
+
+def _format_seconds(seconds):
+    return '-' if seconds is None else '{:.2f}s'.format(seconds)
+
+
+class HttpMetrics:
+    """
+    Thread safe `EndpointStats` by stream and endpoint name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = collections.defaultdict(EndpointStats)
+
+    def record_call(self, stream, endpoint, status, latency):
+        """
+        Record a call answered with the `status` code, or failed with the
+        `status` exception name, after `latency` seconds.
+        """
+        with self._lock:
+            stats = self._stats[(stream, endpoint)]
+            stats.statuses[status] += 1
+            stats.latency.add(latency)
+
+    def record_size(self, stream, endpoint, size):
+        with self._lock:
+            self._stats[(stream, endpoint)].size.add(size)
+
+    def record_retry(self, stream, endpoint, wait):
+        with self._lock:
+            stats = self._stats[(stream, endpoint)]
+            stats.retries += 1
+            stats.backoff += wait
+
+    def stats(self, stream=None):
+        """
+        `EndpointStats` by endpoint, of `stream` only when given.
+        """
+        merged = collections.defaultdict(EndpointStats)
+        with self._lock:
+            for (stats_stream, endpoint), stats in self._stats.items():
+                if stream is None or stats_stream == stream:
+                    merged[endpoint].merge(stats)
+        return dict(merged)
+
+    def summary(self, stream=None):
+        """
+        One line per endpoint, the endpoints with the most time spent in
+        calls first.
+        """
+        lines = []
+        stats_by_endpoint = self.stats(stream)
+        for endpoint, stats in sorted(stats_by_endpoint.items(), key=lambda item: -item[1].latency.sum):
+            statuses = ' '.join('{}={}'.format(status, count)
+                                for status, count in sorted(stats.statuses.items(), key=lambda item: str(item[0])))
+            line = '{}: {} calls ({}), {} total, p50 {}, p95 {}, max {}'.format(
+                endpoint, stats.latency.total, statuses, _format_seconds(stats.latency.sum),
+                _format_seconds(stats.latency.percentile(0.5)), _format_seconds(stats.latency.percentile(0.95)),
+                _format_seconds(stats.latency.max))
+            if stats.size.total:
+                line += ', {} received (max {})'.format(_format_size(stats.size.sum), _format_size(stats.size.max))
+            if stats.retries:
+                line += ', {} retries, {} in backoff'.format(stats.retries, _format_seconds(stats.backoff))
+            lines.append(line)
+        return lines
+
+
+def on_body_size(resp, callback):
+    """
+    Call `callback` with the decoded body size of `resp`: right away for a
+    buffered response, once a streamed one has been read and closed.
+    """
+    if not isinstance(resp, requests.Response):
+        return
+    if resp._content_consumed: # pylint: disable=protected-access
+        callback(len(resp.content or b''))
+    elif hasattr(resp, 'on_close'):
+        resp.on_close(lambda wire_bytes, body_bytes: callback(body_bytes))
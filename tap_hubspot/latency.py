@@ -0,0 +1,50 @@
+"""
+Recent response latencies by endpoint.
+"""
+import collections
+import re
+import threading
+import urllib.parse
+
+DEFAULT_WINDOW = 500
+DEFAULT_MIN_SAMPLES = 20
+
+ID_SEGMENT_RE = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_key(url):
+    """
+    Path of `url` with numeric ids replaced, so that e.g. every company
+    detail call shares the `/companies/v2/companies/{id}` key.
+    """
+    return ID_SEGMENT_RE.sub('/{id}', urllib.parse.urlsplit(url).path)
+
+
+class LatencyTracker:
+    """
+    Thread safe sliding window of the last `window` latencies, in seconds,
+    recorded for each key. Percentiles are only reported once a key has
+    `min_samples` latencies.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, min_samples=DEFAULT_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+
+    def record(self, key, seconds):
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key, fraction):
+        """
+        Latency below which `fraction` (0-1) of the key's recorded latencies
+        fall, or None if too few have been recorded.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < max(self.min_samples, 1):
+            return None
+        index = min(int(fraction * len(samples)), len(samples) - 1)
+        return samples[index]
@@ -0,0 +1,239 @@
+"""
+Staged runtime for syncing a stream: fetch, transform and emit run on their
+own threads, connected by bounded queues.
+
+The fetch stage iterates over a source of raw rows (HTTP calls and paging
+happen there), the transform stage turns each row into a record, and the
+emit stage writes records on the calling thread. A full queue blocks the
+stage feeding it, so a slow stage holds back the ones before it instead of
+buffering the whole stream. Every stage is a single thread, so records are
+emitted in the order the source produced them.
+
+The transform stage can hand rows to a pool of worker processes instead,
+in chunks of up to `chunk_size` rows. Chunks are then resolved by the emit
+stage in the order they were submitted.
+
+Work that must happen in order with the records, such as writing a state
+message after a page's records, is passed down the queues as a marker with
+`defer()` and run by the emit stage once every record before it has been
+written.
+"""
+import queue
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_CHUNK_SIZE = 100
+FETCH = 'fetch'
+TRANSFORM = 'transform'
+EMIT = 'emit'
+
+_DONE = object()
+_IDLE = object()
+_local = threading.local()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class _Marker:
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+
+class _Chunk:
+    __slots__ = ('pending', 'size')
+
+    def __init__(self, pending, size):
+        self.pending = pending
+        self.size = size
+
+
+class _Failure:
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def current():
+    """
+    The pipeline whose fetch stage is running on this thread, or None.
+    """
+    return getattr(_local, 'pipeline', None)
+
+
+class Pipeline:
+    """
+    Runs `transform(row)` and `emit(record)` over the rows of a source, on
+    separate threads with queues of `queue_size` items between them.
+    `transform` may return None to drop a row. With a `pool` (see
+    `TransformPool`), rows are transformed by `pool.submit(rows)` instead,
+    and transform timings add up the time of every worker. Busy seconds and
+    item counts are kept per stage in `timings` and `counts`.
+    """
+
+    def __init__(self, name, transform, emit, queue_size=DEFAULT_QUEUE_SIZE, pool=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.name = name
+        self.transform = transform
+        self.emit = emit
+        self.queue_size = queue_size
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.timings = {FETCH: 0.0, TRANSFORM: 0.0, EMIT: 0.0}
+        self.counts = {FETCH: 0, TRANSFORM: 0, EMIT: 0}
+        self._fetched = queue.Queue(queue_size)
+        # Keep about as many rows in flight with a pool, rather than as many chunks
+        self._transformed = queue.Queue(max(queue_size // chunk_size, 1) if pool else queue_size)
+        self._stopped = threading.Event()
+
+    def defer(self, func, *args):
+        """
+        Call `func(*args)` from the emit stage once the rows fetched so far
+        have been emitted. Only valid from the fetch stage.
+        """
+        self._put(self._fetched, _Marker(func, args))
+
+    def _put(self, out, item):
+        while True:
+            if self._stopped.is_set():
+                raise PipelineStopped()
+            try:
+                out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _fetch(self, source):
+        _local.pipeline = self
+        try:
+            rows = iter(source)
+            while True:
+                start = time.monotonic()
+                row = next(rows, _DONE)
+                self.timings[FETCH] += time.monotonic() - start
+                if row is _DONE:
+                    break
+                self.counts[FETCH] += 1
+                self._put(self._fetched, row)
+            self._put(self._fetched, _DONE)
+        except PipelineStopped:
+            pass
+        except BaseException as ex: # pylint: disable=broad-except
+            try:
+                self._put(self._fetched, _Failure(ex))
+            except PipelineStopped:
+                pass
+        finally:
+            _local.pipeline = None
+            close = getattr(source, 'close', None)
+            if close is not None and self._stopped.is_set():
+                close()
+
+    def _transform(self):
+        try:
+            if self.pool is not None:
+                self._submit_chunks()
+                return
+            while True:
+                item = self._fetched.get()
+                if item is not _DONE and not isinstance(item, (_Marker, _Failure)):
+                    start = time.monotonic()
+                    try:
+                        item = self.transform(item)
+                    finally:
+                        self.timings[TRANSFORM] += time.monotonic() - start
+                    self.counts[TRANSFORM] += 1
+                    if item is None:
+                        continue
+                self._put(self._transformed, item)
+                if item is _DONE or isinstance(item, _Failure):
+                    return
+        except PipelineStopped:
+            pass
+        except BaseException as ex: # pylint: disable=broad-except
+            try:
+                self._put(self._transformed, _Failure(ex))
+            except PipelineStopped:
+                pass
+
+    def _submit_chunks(self):
+        chunk = []
+        while True:
+            try:
+                # Don't hold rows back waiting for a full chunk while the fetch stage is busy
+                item = self._fetched.get(block=not chunk)
+            except queue.Empty:
+                item = _IDLE
+            is_row = item is not _IDLE and item is not _DONE and not isinstance(item, (_Marker, _Failure))
+            if is_row:
+                chunk.append(item)
+                if len(chunk) < self.chunk_size:
+                    continue
+            if chunk:
+                start = time.monotonic()
+                pending = self.pool.submit(chunk)
+                self.timings[TRANSFORM] += time.monotonic() - start
+                self._put(self._transformed, _Chunk(pending, len(chunk)))
+                chunk = []
+            if not is_row and item is not _IDLE:
+                self._put(self._transformed, item)
+                if item is _DONE or isinstance(item, _Failure):
+                    return
+
+    def run(self, source):
+        """
+        Sync every row of `source`, returning once the last record has been
+        emitted. The first error raised by any stage is re-raised here after
+        the other stages have been stopped.
+        """
+        threads = [threading.Thread(target=self._fetch, args=(source,), name=self.name + '-fetch', daemon=True),
+                   threading.Thread(target=self._transform, name=self.name + '-transform', daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = self._transformed.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                start = time.monotonic()
+                try:
+                    if isinstance(item, _Marker):
+                        item.func(*item.args)
+                    elif isinstance(item, _Chunk):
+                        records, seconds = item.pending.get()
+                        # Waiting on the workers is transform time, not emit time
+                        start = time.monotonic()
+                        self.timings[TRANSFORM] += seconds
+                        self.counts[TRANSFORM] += item.size
+                        for record in records:
+                            if record is not None:
+                                self.emit(record)
+                                self.counts[EMIT] += 1
+                    else:
+                        self.emit(item)
+                        self.counts[EMIT] += 1
+                finally:
+                    self.timings[EMIT] += time.monotonic() - start
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+
+
+def run_sequentially(source, transform, emit):
+    """
+    Same as `Pipeline.run` on the calling thread alone, for when the stages
+    are not worth a thread each.
+    """
+    for row in source:
+        record = transform(row)
+        if record is not None:
+            emit(record)
@@ -0,0 +1,86 @@
+"""
+Iteration over the pages of a paginated HubSpot endpoint, optionally
+fetching the next pages on a background thread while the rows of the
+current one are being processed.
+
+Prefetching needs the continuation key of a page as soon as it has been
+fetched, so prefetched pages are read whole rather than streamed. Pages are
+always handed to the consumer in order, and the consumer remains the one
+recording offsets in the state, so a sync interrupted with pages still in
+the prefetch buffer resumes from the last page it actually emitted.
+"""
+import queue
+import threading
+
+_DONE = object()
+
+
+def iter_pages(fetch, params, next_params, depth=0):
+    """
+    Yields the pages of an endpoint. `fetch(params)` returns a page and
+    `next_params(params, page)` the params of the page after it, or None
+    after the last page. With a `depth` above 0, up to that many pages are
+    fetched ahead of the page being consumed.
+    """
+    if depth <= 0:
+        while params is not None:
+            page = fetch(params)
+            yield page
+            params = next_params(params, page)
+        return
+
+    prefetcher = PagePrefetcher(fetch, dict(params), next_params, depth)
+    try:
+        yield from prefetcher
+    finally:
+        prefetcher.close()
+
+
+class PagePrefetcher:
+    """
+    Fetches pages on a daemon thread into a buffer the iterator reads from.
+    A page is only fetched while fewer than `depth` pages wait to be
+    consumed; an error raised by `fetch` is re-raised by the iterator in
+    place of the page that failed.
+    """
+
+    def __init__(self, fetch, params, next_params, depth):
+        self._fetch = fetch
+        self._next_params = next_params
+        self._pages = queue.Queue()
+        self._slots = threading.Semaphore(depth)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(params,), daemon=True)
+        self._thread.start()
+
+    def _run(self, params):
+        try:
+            while params is not None:
+                self._slots.acquire()
+                if self._closed.is_set():
+                    return
+                page = self._fetch(params)
+                params = self._next_params(params, page)
+                self._pages.put((page, None))
+        except Exception as ex: # pylint: disable=broad-except
+            self._pages.put((None, ex))
+            return
+        self._pages.put((_DONE, None))
+
+    def __iter__(self):
+        while True:
+            page, error = self._pages.get()
+            if error is not None:
+                raise error
+            if page is _DONE:
+                return
+            self._slots.release()
+            yield page
+
+    def close(self):
+        """
+        Stop fetching pages. A fetch already in flight completes in the
+        background and its page is dropped.
+        """
+        self._closed.set()
+        self._slots.release()
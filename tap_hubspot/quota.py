@@ -0,0 +1,130 @@
+"""
+Daily API call quota of a HubSpot portal, persisted across runs.
+
+The ledger counts the calls the tap makes per portal and UTC day in a local
+JSON file. Whenever a response carries the
+`X-HubSpot-RateLimit-Daily-Remaining` header, the ledger is re-seeded from
+it, so calls made by other integrations of the portal are accounted for
+too. Between headers, the remaining quota is the last seen value minus the
+calls made since.
+"""
+import datetime
+import json
+import os
+import tempfile
+import threading
+
+import singer
+
+from tap_hubspot.rate_limit import DAILY_HEADER, DAILY_REMAINING_HEADER, _header_int
+
+LOGGER = singer.get_logger()
+
+
+def utc_today():
+    return datetime.datetime.utcnow().date().isoformat()
+
+
+class QuotaLedger:
+    """
+    Quota of `portal` recorded in the file at `path`. The last `reserve`
+    calls of the day are kept for other integrations: `exhausted()` is
+    true once no more than `reserve` calls are left.
+    """
+
+    def __init__(self, path, portal, reserve=0, today=utc_today):
+        self.path = path
+        self.portal = portal
+        self.reserve = reserve
+        self.today = today
+        self._lock = threading.Lock()
+
+        self.day = None
+        self.calls = 0
+        self.daily_max = None
+        self.seed_remaining = None
+        self.calls_since_seed = 0
+        self._load()
+
+    def _read_file(self):
+        try:
+            with open(self.path) as ledger_file:
+                return json.load(ledger_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as ex:
+            LOGGER.warning("Ignoring unreadable quota ledger %s: %s", self.path, ex)
+            return {}
+
+    def _load(self):
+        entry = self._read_file().get(self.portal) or {}
+        self.day = self.today()
+        if entry.get('day') != self.day:
+            return
+        self.calls = entry.get('calls', 0)
+        self.daily_max = entry.get('daily_max')
+        self.seed_remaining = entry.get('remaining')
+
+    def _roll_over(self):
+        day = self.today()
+        if day != self.day:
+            self.day = day
+            self.calls = 0
+            self.seed_remaining = None
+            self.calls_since_seed = 0
+
+    def record_call(self, headers=None):
+        """
+        Count one call, re-seeding the remaining quota from its response
+        headers when they carry it.
+        """
+        daily_max = _header_int(headers or {}, DAILY_HEADER)
+        daily_remaining = _header_int(headers or {}, DAILY_REMAINING_HEADER)
+        with self._lock:
+            self._roll_over()
+            self.calls += 1
+            if daily_max is not None:
+                self.daily_max = daily_max
+            if daily_remaining is not None:
+                self.seed_remaining = daily_remaining
+                self.calls_since_seed = 0
+            else:
+                self.calls_since_seed += 1
+
+    @property
+    def remaining(self):
+        """
+        Calls left today, or None while neither the remaining quota nor the
+        daily maximum has been seen.
+        """
+        with self._lock:
+            self._roll_over()
+            if self.seed_remaining is not None:
+                return max(self.seed_remaining - self.calls_since_seed, 0)
+            if self.daily_max is not None:
+                return max(self.daily_max - self.calls, 0)
+            return None
+
+    def exhausted(self):
+        remaining = self.remaining
+        return remaining is not None and remaining <= self.reserve
+
+    def save(self):
+        remaining = self.remaining
+        with self._lock:
+            entry = {'day': self.day, 'calls': self.calls,
+                     'daily_max': self.daily_max, 'remaining': remaining}
+        ledger = self._read_file()
+        ledger[self.portal] = entry
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as tmp_file:
+                    json.dump(ledger, tmp_file)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as ex:
+            LOGGER.warning("Could not write quota ledger %s: %s", self.path, ex)
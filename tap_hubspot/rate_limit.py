@@ -0,0 +1,121 @@
+"""
+Token bucket that paces outgoing calls using HubSpot's rate limit headers.
+
+Every HubSpot response carries the size of the current rolling window and
+how many calls are left in it:
+
+    X-HubSpot-RateLimit-Max                    calls allowed per interval
+    X-HubSpot-RateLimit-Remaining              calls left in the interval
+    X-HubSpot-RateLimit-Interval-Milliseconds  length of the interval
+    X-HubSpot-RateLimit-Daily                  calls allowed per day
+    X-HubSpot-RateLimit-Daily-Remaining        calls left today
+
+The bucket refills at `max / interval` tokens per second and is re-synced to
+`remaining` on every response, so calls are spread out just under the limit
+instead of running into 429s.
+"""
+import threading
+import time
+
+import singer
+
+LOGGER = singer.get_logger()
+
+MAX_HEADER = 'X-HubSpot-RateLimit-Max'
+REMAINING_HEADER = 'X-HubSpot-RateLimit-Remaining'
+INTERVAL_HEADER = 'X-HubSpot-RateLimit-Interval-Milliseconds'
+DAILY_HEADER = 'X-HubSpot-RateLimit-Daily'
+DAILY_REMAINING_HEADER = 'X-HubSpot-RateLimit-Daily-Remaining'
+
+DEFAULT_HEADROOM = 2
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket. Until the first response with rate limit
+    headers has been seen the bucket is unbounded and `acquire` never waits.
+
+    `headroom` is the number of calls left unused in each interval to absorb
+    other integrations sharing the portal's limit.
+    """
+
+    def __init__(self, headroom=DEFAULT_HEADROOM, enabled=True, clock=time.monotonic, sleep=time.sleep):
+        self.headroom = headroom
+        self.enabled = enabled
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        self.capacity = None
+        self.refill_rate = None
+        self.tokens = None
+        self.daily_max = None
+        self.daily_remaining = None
+        self.total_wait = 0.0
+        self._updated_at = clock()
+
+    def _refill(self, now):
+        if self.capacity is None:
+            return
+        elapsed = now - self._updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available. Returns the number
+        of seconds spent waiting.
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if self.tokens is None:
+                return 0.0
+            self.tokens -= 1
+            wait = 0.0
+            if self.tokens < 0:
+                wait = -self.tokens / self.refill_rate
+            self.total_wait += wait
+
+        if wait > 0:
+            LOGGER.debug("Pacing HubSpot calls, waiting %.2f seconds for rate limit", wait)
+            self._sleep(wait)
+        return wait
+
+    def update(self, headers):
+        """
+        Re-sync the bucket from a response's rate limit headers.
+        """
+        if headers is None:
+            return
+        max_calls = _header_int(headers, MAX_HEADER)
+        remaining = _header_int(headers, REMAINING_HEADER)
+        interval_ms = _header_int(headers, INTERVAL_HEADER)
+        daily_max = _header_int(headers, DAILY_HEADER)
+        daily_remaining = _header_int(headers, DAILY_REMAINING_HEADER)
+
+        with self._lock:
+            if daily_max is not None:
+                self.daily_max = daily_max
+            if daily_remaining is not None:
+                self.daily_remaining = daily_remaining
+
+            if not max_calls or remaining is None or not interval_ms:
+                return
+            now = self._clock()
+            self.capacity = max(max_calls - self.headroom, 1)
+            self.refill_rate = self.capacity / (interval_ms / 1000.0)
+            self.tokens = min(self.capacity, remaining - self.headroom)
+            self._updated_at = now
@@ -0,0 +1,149 @@
+"""
+Structured, sampled trace of the HTTP requests made by the tap.
+
+Every request is counted, but only a `sample_rate` share of them is logged,
+as one JSON object per line with credentials redacted and repeated query
+params (e.g. the 100 `vid`s of a contacts batch) collapsed to a count.
+Trace records go through a queue to a listener thread that formats and
+writes them with the root logger's handlers, so the calling thread never
+waits on log I/O.
+"""
+import collections
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import urllib.parse
+
+TRACE_LOGGER_NAME = 'tap_hubspot.requests'
+
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_REDACTED_PARAMS = ('hapikey', 'access_token', 'refresh_token', 'client_secret', 'code')
+REDACTED = '***'
+MAX_LOGGED_URL_LENGTH = 500
+
+
+def redact_url(url, redacted_params=DEFAULT_REDACTED_PARAMS):
+    """
+    `url` with the values of `redacted_params` masked and params repeated
+    more than twice replaced by their count.
+    """
+    parts = urllib.parse.urlsplit(url)
+    counts = collections.Counter()
+    pairs = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    for name, _ in pairs:
+        counts[name] += 1
+
+    query = []
+    collapsed = set()
+    for name, value in pairs:
+        if counts[name] > 2:
+            if name not in collapsed:
+                query.append('{}=[{} values]'.format(name, counts[name]))
+                collapsed.add(name)
+            continue
+        if name.lower() in redacted_params:
+            query.append('{}={}'.format(name, REDACTED))
+        else:
+            query.append('{}={}'.format(name, urllib.parse.quote(value, safe=',')))
+
+    redacted = urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, '&'.join(query), ''))
+    if len(redacted) > MAX_LOGGED_URL_LENGTH:
+        redacted = redacted[:MAX_LOGGED_URL_LENGTH] + '...'
+    return redacted
+
+
+class TraceEvent:
+    """
+    Log message argument that is only serialised when the listener thread
+    formats the record.
+    """
+    __slots__ = ('fields', 'redacted_params')
+
+    def __init__(self, fields, redacted_params):
+        self.fields = fields
+        self.redacted_params = redacted_params
+
+    def __str__(self):
+        fields = dict(self.fields)
+        fields['url'] = redact_url(str(fields['url']), self.redacted_params)
+        return json.dumps(fields, sort_keys=True)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock handler formats records before queueing them; leave that to
+    # the listener thread
+    def prepare(self, record):
+        return record
+
+
+class _RootHandlers(logging.Handler):
+    # Writes with whatever handlers the root logger has when the record is
+    # handled, as singer-python reconfigures them on every `get_logger()`
+    def handle(self, record):
+        for handler in logging.getLogger().handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+class RequestTracer:
+    """
+    Counts requests by method and status class and logs a sampled share of
+    them through an asynchronous handler started by `start()`.
+    """
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, redacted_params=DEFAULT_REDACTED_PARAMS,
+                 logger=None, rand=random.random):
+        self.sample_rate = sample_rate
+        self.redacted_params = tuple(name.lower() for name in redacted_params)
+        self.logger = logger or logging.getLogger(TRACE_LOGGER_NAME)
+        self.rand = rand
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+        self._handler = None
+        self._listener = None
+
+    def start(self):
+        if self._listener is not None:
+            return
+        log_queue = queue.SimpleQueue()
+        self._handler = _DeferredQueueHandler(log_queue)
+        self._listener = logging.handlers.QueueListener(log_queue, _RootHandlers())
+        self.logger.addHandler(self._handler)
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self._listener.start()
+
+    def stop(self):
+        """
+        Write out the queued records and detach the handler.
+        """
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self.logger.removeHandler(self._handler)
+        self.logger.propagate = True
+        self._listener = self._handler = None
+
+    def trace(self, method, url, status=None, duration=None, error=None, **fields):
+        status_class = '{}xx'.format(status // 100) if status else (error or 'error')
+        with self._lock:
+            self._counts[(method, status_class)] += 1
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and self.rand() >= self.sample_rate):
+            return
+        event = {'method': method, 'url': url, 'status': status, **fields}
+        if duration is not None:
+            event['duration_ms'] = round(duration * 1000, 1)
+        if error is not None:
+            event['error'] = error
+        self.logger.info("request %s", TraceEvent(event, self.redacted_params))
+
+    def counts(self):
+        """
+        Requests made, by `(method, status class)`, e.g. `('GET', '2xx')`.
+        """
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,170 @@
+"""
+Retry policies for HubSpot calls.
+
+Failures are sorted into three classes, each with its own policy:
+
+    rate_limit    429 responses
+    server_error  5xx responses
+    timeout       timeouts, connection errors and any other failure that
+                  did not produce a response
+
+Waits grow exponentially with the number of failures in a class and use
+full jitter (a uniform draw between 0 and the exponential cap) so that
+concurrent workers don't retry in lock-step. A `Retry-After` header, when
+present, sets the minimum wait, up to the policy's `max_delay`.
+"""
+import collections
+import datetime
+import email.utils
+import functools
+import random
+import threading
+import time
+
+import singer
+
+LOGGER = singer.get_logger()
+
+RATE_LIMIT = 'rate_limit'
+SERVER_ERROR = 'server_error'
+TIMEOUT = 'timeout'
+
+
+class RetryPolicy:
+    def __init__(self, max_tries=5, base_delay=1.0, max_delay=30.0, factor=2.0):
+        self.max_tries = int(max_tries)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.factor = float(factor)
+
+    def wait(self, failures, retry_after=None):
+        """
+        Seconds to wait after the `failures`-th failure in this class.
+        """
+        cap = min(self.max_delay, self.base_delay * self.factor ** (failures - 1))
+        wait = random.uniform(0, cap)
+        if retry_after is not None:
+            # A bad header mustn't stall the sync for longer than the class allows
+            wait = max(wait, min(retry_after, self.max_delay))
+        return wait
+
+    def __eq__(self, other):
+        return isinstance(other, RetryPolicy) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return 'RetryPolicy({})'.format(', '.join('{}={}'.format(k, v) for k, v in vars(self).items()))
+
+
+DEFAULT_POLICIES = {
+    RATE_LIMIT: RetryPolicy(max_tries=5, base_delay=2.0, max_delay=60.0),
+    SERVER_ERROR: RetryPolicy(max_tries=5, base_delay=1.0, max_delay=30.0),
+    TIMEOUT: RetryPolicy(max_tries=5, base_delay=1.0, max_delay=30.0),
+}
+
+
+def build_policies(config_policies=None):
+    """
+    Overlay the `retry_policies` config value, e.g.
+    `{"rate_limit": {"max_tries": 8, "max_delay": 120}}`, on the defaults.
+    """
+    policies = {}
+    for name, default in DEFAULT_POLICIES.items():
+        overrides = (config_policies or {}).get(name) or {}
+        policies[name] = RetryPolicy(**{**vars(default), **overrides})
+    return policies
+
+
+def classify(exc):
+    response = getattr(exc, 'response', None)
+    if response is not None:
+        if response.status_code == 429:
+            return RATE_LIMIT
+        if response.status_code >= 500:
+            return SERVER_ERROR
+    return TIMEOUT
+
+
+def parse_retry_after(exc):
+    """
+    Seconds requested by the response's `Retry-After` header, which can be
+    a number of seconds or an HTTP date.
+    """
+    response = getattr(exc, 'response', None)
+    if response is None or response.headers is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+class SleepLedger:
+    """
+    Thread safe totals of seconds slept in retry backoff, by stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = collections.defaultdict(float)
+
+    def add(self, key, seconds):
+        with self._lock:
+            self._totals[key] += seconds
+
+    def get(self, key):
+        with self._lock:
+            return self._totals.get(key, 0.0)
+
+    def totals(self):
+        with self._lock:
+            return dict(self._totals)
+
+
+def with_retries(exceptions, get_policies, giveup, on_giveup, on_backoff=None):
+    """
+    Decorator retrying the wrapped call on `exceptions` according to the
+    policy of each failure's class. `giveup`, `on_giveup` and `on_backoff`
+    follow the `backoff` library conventions: `giveup(exc)` stops retrying
+    immediately, and the handlers receive a details dict with `target`,
+    `args`, `kwargs`, `tries`, `elapsed` (and `wait` for `on_backoff`).
+    """
+    def decorator(target):
+        @functools.wraps(target)
+        def retry(*args, **kwargs):
+            policies = get_policies()
+            failures = collections.Counter()
+            tries = 0
+            start = time.monotonic()
+            while True:
+                tries += 1
+                try:
+                    return target(*args, **kwargs)
+                except exceptions as exc:
+                    details = {'target': target, 'args': args, 'kwargs': kwargs,
+                               'tries': tries, 'elapsed': time.monotonic() - start}
+                    failure_class = classify(exc)
+                    failures[failure_class] += 1
+                    policy = policies[failure_class]
+                    if giveup(exc) or failures[failure_class] >= policy.max_tries:
+                        on_giveup(details)
+                        raise
+
+                    wait = policy.wait(failures[failure_class], parse_retry_after(exc))
+                    details.update(wait=wait, failure_class=failure_class, exception=exc)
+                    LOGGER.info("Backing off %s(...) for %.1fs after %s (%s)",
+                                target.__name__, wait, failure_class, exc)
+                    if on_backoff:
+                        on_backoff(details)
+                    time.sleep(wait)
+        return retry
+    return decorator
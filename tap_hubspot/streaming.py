@@ -0,0 +1,168 @@
+"""
+Pages of HubSpot list endpoints.
+
+A page is a JSON object holding the rows under one key (`contacts`,
+`results`, `events`, ...) next to continuation keys such as `has-more`,
+`offset` or `paging`. `BufferedPage` wraps an already decoded body, while
+`StreamingPage` decodes the rows one at a time as the body arrives from the
+socket, so the first row is available before the whole body is read and the
+full object tree is never held in memory. In both cases `data` holds the
+continuation keys once `rows()` has been consumed.
+"""
+import codecs
+import itertools
+import json
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = ' \t\n\r'
+
+
+def unexpected_response(path, keys):
+    return RuntimeError("Unexpected API response: {} not in {}".format(path, keys))
+
+
+class BufferedPage:
+    def __init__(self, data, path):
+        if data.get(path) is None:
+            raise unexpected_response(path, data.keys())
+        self.data = data
+        self.path = path
+
+    def rows(self):
+        return self.data[self.path]
+
+
+class StreamingPage:
+    """
+    Incremental decoder for a `{"<path>": [row, ...], "<key>": value, ...}`
+    body, or for a `{"<id>": row, ...}` body when `path` is None. `chunks` is
+    an iterable of bytes, e.g. `resp.iter_content()`.
+    """
+
+    def __init__(self, chunks, path, on_close=None):
+        self.path = path
+        self.data = {}
+        self._chunks = iter(chunks)
+        self._on_close = on_close
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._rows = None
+        self._read_ahead = []
+
+    @classmethod
+    def from_response(cls, resp, path):
+        return cls(resp.iter_content(chunk_size=STREAM_CHUNK_SIZE), path, on_close=resp.close)
+
+    def _fill(self, min_length=1):
+        """
+        Append the next chunks to the buffer, at least `min_length`
+        characters of them unless the body ends first. Returns False at the
+        end of the body.
+        """
+        if self._eof:
+            return False
+        if self._pos > STREAM_CHUNK_SIZE:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        texts = []
+        length = 0
+        for chunk in self._chunks:
+            text = self._text_decoder.decode(chunk)
+            texts.append(text)
+            length += len(text)
+            if length >= min_length:
+                break
+        else:
+            texts.append(self._text_decoder.decode(b'', final=True))
+            self._eof = True
+        self._buf += ''.join(texts)
+        return length > 0 or not self._eof
+
+    def _peek(self):
+        """
+        Skip whitespace and return the next character without consuming it.
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of response", self._buf, self._pos)
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char not in chars:
+            raise json.JSONDecodeError("Expected one of {!r}".format(chars), self._buf, self._pos)
+        self._pos += 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Read as much again as the value so far before decoding it
+                # again, so rows spanning many chunks aren't re-decoded per chunk
+                if not self._fill(len(self._buf) - self._pos):
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def read_ahead(self, count=1):
+        """
+        Decode the first `count` rows (every row when None) right away, so
+        errors reading the start of the body are raised here rather than
+        once the rows are consumed.
+        """
+        self._rows = self._decode_rows()
+        self._read_ahead = list(itertools.islice(self._rows, count))
+
+    def rows(self):
+        if self._rows is None:
+            self._rows = self._decode_rows()
+        yield from self._read_ahead
+        yield from self._rows
+
+    def _decode_rows(self):
+        found = False
+        try:
+            self._expect('{')
+            if self._peek() == '}':
+                self._pos += 1
+            else:
+                while True:
+                    key = self._value()
+                    self._expect(':')
+                    if self.path is None:
+                        found = True
+                        yield self._value()
+                    elif key == self.path and self._peek() == '[':
+                        found = True
+                        self._pos += 1
+                        if self._peek() == ']':
+                            self._pos += 1
+                        else:
+                            while True:
+                                yield self._value()
+                                if self._expect(',]') == ']':
+                                    break
+                    else:
+                        self.data[key] = self._value()
+                    if self._expect(',}') == '}':
+                        break
+        finally:
+            if self._on_close:
+                self._on_close()
+
+        if not found and self.path is not None:
+            raise unexpected_response(self.path, self.data.keys())
@@ -0,0 +1,108 @@
+"""
+Benchmark of `CompiledTransformer` against `singer.Transformer`, on the
+records of a stream served by a stand-in `SyntheticPortal`.
+
+Both transformers get the same lifted records, schema and metadata, with
+the first `selected` fraction of the stream's fields selected. The records
+they produce must be identical; the time each took is then printed, e.g.
+
+    python -m tap_hubspot.tests.benchmark_transform --stream contacts --records 1000 --property-count 500
+"""
+import argparse
+import copy
+import time
+from unittest import mock
+
+from singer import Transformer, metadata, UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING
+
+import tap_hubspot
+from tap_hubspot import codec
+from tap_hubspot.compiled_transform import CompiledTransformer
+from tap_hubspot.tests.standin_server import StandinServer, SyntheticPortal
+
+STREAM_ROWS = {
+    'contacts': ('contacts_detail', lambda records: {'vid': [str(vid) for vid in range(1, records + 1)]},
+                 lambda data: list(data.values())),
+    'deals': ('deals_all', lambda records: {}, lambda data: data['deals']),
+    'tickets': ('tickets', lambda records: {}, lambda data: data['results']),
+}
+
+
+def load_stream(stream_id, records, property_count=20, selected=1.0):
+    """
+    Schema, metadata map and lifted records of `stream_id` from a synthetic
+    portal of `records` records with `property_count` properties each.
+    """
+    portal = SyntheticPortal(pages=1, page_size=records, property_count=property_count)
+    stream = next(stream for stream in tap_hubspot.STREAMS if stream.tap_stream_id == stream_id)
+    with StandinServer(portal) as server, \
+         mock.patch.dict(tap_hubspot.CONFIG, {'base_url': server.base_url, 'hapikey': 'standin'}):
+        tap_hubspot.configure_base_url()
+        try:
+            schema, mdata = tap_hubspot.load_discovered_schema(stream)
+        finally:
+            tap_hubspot.CONFIG.pop('base_url')
+            tap_hubspot.configure_base_url()
+
+    mdata = metadata.to_map(mdata)
+    mdata = metadata.write(mdata, (), 'selected', True)
+    fields = sorted(schema['properties'])
+    for i, field in enumerate(fields):
+        mdata = metadata.write(mdata, ('properties', field), 'selected', i < selected * len(fields))
+
+    endpoint, params, rows = STREAM_ROWS[stream_id]
+    _, _, body = portal.respond('GET', tap_hubspot.ENDPOINTS[endpoint], params(records), b'')
+    return schema, mdata, [tap_hubspot.lift_properties_and_versions(row) for row in rows(codec.loads(body))]
+
+
+def time_transform(transformer, rows, schema, mdata, repeat):
+    """
+    Records transformed by `transformer` and the best time of `repeat` runs.
+    """
+    best = None
+    for _ in range(repeat):
+        copies = copy.deepcopy(rows)
+        start = time.perf_counter()
+        transformed = [transformer.transform(row, schema, mdata) for row in copies]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return transformed, best
+
+
+def benchmark(stream_id='contacts', records=1000, property_count=200, selected=1.0, repeat=3):
+    """
+    Seconds taken by `singer.Transformer` and `CompiledTransformer` to
+    transform the same records, after checking they produce the same ones.
+    """
+    schema, mdata, rows = load_stream(stream_id, records, property_count, selected)
+    singer_transformer = Transformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING)
+    compiled_transformer = CompiledTransformer(UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING)
+
+    expected, singer_seconds = time_transform(singer_transformer, rows, schema, mdata, repeat)
+    transformed, compiled_seconds = time_transform(compiled_transformer, rows, schema, mdata, repeat)
+
+    if transformed != expected:
+        raise AssertionError('CompiledTransformer records differ from singer.Transformer ones')
+    if (compiled_transformer.removed, compiled_transformer.filtered) != \
+            (singer_transformer.removed, singer_transformer.filtered):
+        raise AssertionError('CompiledTransformer removed or filtered different paths')
+    return {'singer': singer_seconds, 'compiled': compiled_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--stream', choices=sorted(STREAM_ROWS), default='contacts')
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--property-count', type=int, default=200)
+    parser.add_argument('--selected', type=float, default=1.0, help='Fraction of the fields selected')
+    parser.add_argument('--repeat', type=int, default=3, help='Best of this many runs is reported')
+    args = parser.parse_args()
+
+    seconds = benchmark(args.stream, args.records, args.property_count, args.selected, args.repeat)
+    for name in ('singer', 'compiled'):
+        print('{:>8}: {:.3f}s, {:.0f} records/s'.format(name, seconds[name], args.records / seconds[name]))
+    print('{:.1f}x faster'.format(seconds['singer'] / seconds['compiled']))
+
+
+if __name__ == '__main__':
+    main()
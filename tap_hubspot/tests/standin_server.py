@@ -0,0 +1,553 @@
+"""
+Local stand-in for the HubSpot API, to profile and benchmark the tap
+without a live portal.
+
+It serves every `ENDPOINTS` entry plus the OAuth token endpoint, in one of
+three modes:
+
+- `synthetic`: generated records, `pages` pages of `page_size` rows for
+  every list endpoint, each with `property_count` properties holding
+  `value_size` character values. The same options serve the same data.
+- `record`: proxies every call to `upstream` (the HubSpot API) and saves
+  the exchanges to a cassette file, with credentials left out.
+- `replay`: answers from a recorded cassette. Calls are matched on method,
+  path, query and body, without credentials; a call made several times
+  gets the recorded responses in order, then the last one again.
+
+Every response can be delayed by `latency` seconds plus up to `jitter`
+seconds drawn from a seeded random. Run the tap against it by setting
+`base_url` in its config, e.g.
+
+    python -m tap_hubspot.tests.standin_server --port 8000 --pages 50 --page-size 100 --latency 0.05
+    tap-hubspot --config config.json --catalog catalog.json  # with "base_url": "http://127.0.0.1:8000"
+"""
+import argparse
+import collections
+import datetime
+import gzip
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from tap_hubspot import DEFAULT_BASE_URL, ENDPOINTS
+from tap_hubspot.http_metrics import EndpointTemplates
+
+TOKEN_PATH = '/oauth/v1/token'
+PORTAL_ID = 1000
+DEFAULT_START = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Never written to a cassette nor used to match calls
+CREDENTIAL_PARAMS = {'hapikey', 'access_token', 'refresh_token', 'client_id', 'client_secret',
+                     'redirect_uri', 'code'}
+RECORDED_HEADERS = {'content-type', 'retry-after'}
+
+
+ENDPOINT_TEMPLATES = EndpointTemplates(ENDPOINTS)
+
+
+def match_endpoint(path):
+    """
+    Name of the `ENDPOINTS` entry `path` belongs to and its path arguments,
+    or `(None, {})`.
+    """
+    return ENDPOINT_TEMPLATES.match(path)
+
+
+def interaction_key(method, path, query, body):
+    """
+    Identifies a call in a cassette: its method, path, sorted query and
+    body, without credentials.
+    """
+    params = sorted((name, value) for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True)
+                    if name not in CREDENTIAL_PARAMS)
+    body = body.decode('utf-8') if body else ''
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True)
+    except ValueError:
+        body = urllib.parse.urlencode(sorted((name, value) for name, value in urllib.parse.parse_qsl(body)
+                                             if name not in CREDENTIAL_PARAMS))
+    return '{} {}?{} {}'.format(method, path.rstrip('/'), urllib.parse.urlencode(params), body)
+
+
+def _json_response(data, status=200):
+    return status, {'Content-Type': 'application/json;charset=utf-8'}, json.dumps(data).encode('utf-8')
+
+
+def _token_response():
+    return _json_response({'access_token': 'standin-access-token', 'refresh_token': 'standin-refresh-token',
+                           'expires_in': 21600})
+
+
+class SyntheticPortal:
+    """
+    Generates the responses of a portal holding `pages * page_size` records
+    of every object type, modified `interval` apart from `start` on.
+    """
+
+    def __init__(self, pages=3, page_size=100, property_count=20, value_size=16, custom_objects=1,
+                 start=DEFAULT_START, interval=datetime.timedelta(minutes=1)):
+        self.pages = pages
+        self.page_size = page_size
+        self.property_count = property_count
+        self.value_size = value_size
+        self.custom_objects = ['standin_object_{}'.format(i) for i in range(custom_objects)]
+        self.start = start
+        self.interval = interval
+
+    @property
+    def record_count(self):
+        return self.pages * self.page_size
+
+    # Values
+
+    def _time(self, i):
+        return self.start + self.interval * i
+
+    def _millis(self, i):
+        return int(self._time(i).timestamp() * 1000)
+
+    def _iso(self, i):
+        return self._time(i).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+    def _value(self, i, name):
+        value = '{}-{}-'.format(name, i)
+        return (value * (self.value_size // len(value) + 1))[:self.value_size]
+
+    def _property_names(self):
+        return ['standin_property_{}'.format(n) for n in range(self.property_count)]
+
+    def _property_definitions(self):
+        return ([{'name': 'createdate', 'type': 'datetime'},
+                 {'name': 'hs_lastmodifieddate', 'type': 'datetime'}]
+                + [{'name': name, 'type': 'string'} for name in self._property_names()])
+
+    def _v1_properties(self, i, with_source=False):
+        properties = {'createdate': self._millis(i), 'hs_lastmodifieddate': self._millis(i)}
+        properties.update({name: self._value(i, name) for name in self._property_names()})
+        result = {}
+        for name, value in properties.items():
+            prop = {'value': value,
+                    'versions': [{'name': name, 'value': str(value), 'timestamp': self._millis(i),
+                                  'source': 'API', 'sourceId': None, 'sourceVid': []}]}
+            if with_source:
+                prop.update({'timestamp': self._millis(i), 'source': 'API', 'sourceId': None})
+            result[name] = prop
+        return result
+
+    def _v3_properties(self, i, selected=None):
+        properties = {'createdate': self._iso(i), 'hs_lastmodifieddate': self._iso(i)}
+        properties.update({name: self._value(i, name) for name in self._property_names()})
+        if selected:
+            properties = {name: value for name, value in properties.items() if name in selected}
+        return properties
+
+    # Paging
+
+    def _page(self, params, key='offset'):
+        offset = int(params.get(key) or 0)
+        return range(offset, min(offset + self.page_size, self.record_count))
+
+    def _v1_page(self, rows_key, rows, params, more_key, offset_key='offset', param_key='offset'):
+        page = self._page(params, param_key)
+        return {rows_key: [rows(i) for i in page],
+                more_key: page.stop < self.record_count,
+                offset_key: page.stop}
+
+    def _v3_page(self, rows, params):
+        page = self._page(params, 'after')
+        data = {'results': [rows(i) for i in page]}
+        if page.stop < self.record_count:
+            data['paging'] = {'next': {'after': str(page.stop)}}
+        return data
+
+    def _window_page(self, rows_key, rows, params):
+        # Records of the `startTimestamp`..`endTimestamp` window, paged by offset
+        in_window = [i for i in range(self.record_count)
+                     if int(params['startTimestamp']) <= self._millis(i) < int(params['endTimestamp'])]
+        offset = int(params.get('offset') or 0)
+        page = in_window[offset:offset + self.page_size]
+        return {rows_key: [rows(i) for i in page],
+                'hasMore': offset + self.page_size < len(in_window),
+                'offset': offset + len(page)}
+
+    # Records
+
+    def _v3_record(self, i, params):
+        selected = params['properties'].split(',') if params.get('properties') else None
+        return {'id': str(i + 1), 'properties': self._v3_properties(i, selected),
+                'createdAt': self._iso(i), 'updatedAt': self._iso(i), 'archived': False}
+
+    def _company(self, i):
+        return {'companyId': i + 1, 'portalId': PORTAL_ID, 'properties': self._v1_properties(i, with_source=True)}
+
+    def _campaign(self, i):
+        return {'id': i + 1, 'appId': 1, 'appName': 'Batch', 'contentId': i + 1, 'name': self._value(i, 'name'),
+                'subject': self._value(i, 'subject'), 'type': 'BATCH_EMAIL', 'subType': 'batch',
+                'numIncluded': 100, 'numQueued': 0, 'counters': {'sent': 100, 'open': 50}}
+
+    def _engagement(self, i):
+        return {'engagement': {'id': i + 1, 'portalId': PORTAL_ID, 'active': True, 'type': 'NOTE',
+                               'ownerId': 1, 'createdAt': self._millis(i), 'lastUpdated': self._millis(i),
+                               'timestamp': self._millis(i)},
+                'associations': {'contactIds': [i + 1], 'companyIds': [], 'dealIds': []},
+                'attachments': [],
+                'metadata': {'body': self._value(i, 'body')}}
+
+    def _subscription_change(self, i):
+        return {'timestamp': self._millis(i), 'portalId': PORTAL_ID,
+                'recipient': 'contact{}@example.com'.format(i),
+                'changes': [{'change': 'UNSUBSCRIBED', 'changeType': 'SUBSCRIPTION_STATUS', 'source': 'SOURCE_RECIPIENT',
+                             'portalId': PORTAL_ID, 'subscriptionId': 1, 'timestamp': self._millis(i)}]}
+
+    def _email_event(self, i):
+        return {'id': 'event-{}'.format(i), 'created': self._millis(i), 'type': 'OPEN', 'portalId': PORTAL_ID,
+                'appId': 1, 'appName': 'Batch', 'emailCampaignId': i + 1,
+                'recipient': 'contact{}@example.com'.format(i), 'userAgent': self._value(i, 'agent')}
+
+    def _contact_list(self, i):
+        return {'listId': i + 1, 'internalListId': i + 1, 'portalId': PORTAL_ID, 'name': self._value(i, 'list'),
+                'listType': 'STATIC', 'dynamic': False, 'archived': False, 'readOnly': False, 'deleteable': True,
+                'createdAt': self._millis(i), 'updatedAt': self._millis(i), 'filters': []}
+
+    def _form(self, i):
+        return {'guid': 'form-{}'.format(i), 'portalId': PORTAL_ID, 'name': self._value(i, 'form'),
+                'method': 'POST', 'createdAt': self._millis(i), 'updatedAt': self._millis(i),
+                'formFieldGroups': [], 'cloneable': True, 'editable': True, 'formType': 'HUBSPOT'}
+
+    def _workflow(self, i):
+        return {'id': i + 1, 'name': self._value(i, 'workflow'), 'type': 'DRIP_DELAY', 'enabled': True,
+                'insertedAt': self._millis(i), 'updatedAt': self._millis(i)}
+
+    def _owner(self, i):
+        return {'id': str(i + 1), 'email': 'owner{}@example.com'.format(i), 'firstName': 'Owner',
+                'lastName': str(i), 'userId': i + 1, 'createdAt': self._iso(i), 'updatedAt': self._iso(i),
+                'archived': False}
+
+    def _deal_pipeline(self, i):
+        return {'pipelineId': 'pipeline-{}'.format(i), 'label': self._value(i, 'pipeline'), 'active': True,
+                'displayOrder': i, 'staticDefault': i == 0,
+                'stages': [{'stageId': 'stage-{}-{}'.format(i, n), 'label': 'Stage {}'.format(n),
+                            'probability': n / 4, 'active': True, 'displayOrder': n, 'closedWon': n == 4}
+                           for n in range(5)]}
+
+    # Endpoints
+
+    def respond(self, method, path, params, body):
+        """
+        `(status, headers, body)` of a call, or a 404 for unknown paths.
+        """
+        if path == TOKEN_PATH:
+            return _token_response()
+
+        name, args = match_endpoint(path)
+        handler = getattr(self, '_' + name, None) if name else None
+        if handler is None:
+            return _json_response({'status': 'error', 'message': 'Unknown path ' + path}, status=404)
+        if method == 'POST':
+            return _json_response(handler(json.loads(body or b'{}')))
+        return _json_response(handler(params, **args))
+
+    def _contacts_properties(self, _):
+        return self._property_definitions()
+
+    _companies_properties = _deals_properties = _contacts_properties
+
+    def _tickets_properties(self, _):
+        return {'results': self._property_definitions()}
+
+    def _deals_v3_properties(self, _):
+        return {'results': self._property_definitions() + [{'name': 'hs_v2_date_entered_closedwon',
+                                                            'type': 'datetime'}]}
+
+    def _contacts_all(self, params):
+        return self._v1_page('contacts', lambda i: {'vid': i + 1, 'versionTimestamp': self._millis(i)},
+                             params, 'has-more', 'vid-offset', 'vidOffset')
+
+    _contacts_recent = _contacts_all
+
+    def _contacts_detail(self, params):
+        vids = params['vid'] if isinstance(params.get('vid'), list) else [params['vid']]
+        return {vid: {'vid': int(vid), 'canonical-vid': int(vid), 'portal-id': PORTAL_ID, 'is-contact': True,
+                      'properties': self._v1_properties(int(vid) - 1), 'merged-vids': [],
+                      'identity-profiles': [], 'list-memberships': [], 'form-submissions': []}
+                for vid in vids}
+
+    def _companies_all(self, params):
+        return self._v1_page('companies', self._company, params, 'has-more')
+
+    def _companies_recent(self, params):
+        page = self._v1_page('results', self._company, params, 'hasMore')
+        page['total'] = self.record_count
+        return page
+
+    def _companies_detail(self, _, company_id):
+        return self._company(int(company_id) - 1)
+
+    def _contacts_by_company_v3(self, body):
+        return {'results': [{'from': {'id': item['id']},
+                             'to': [{'id': str(int(item['id']) * 10 + n)} for n in range(2)]}
+                            for item in body['inputs']]}
+
+    def _deals_all(self, params):
+        return self._v1_page('deals', lambda i: {'dealId': i + 1, 'portalId': PORTAL_ID, 'isDeleted': False,
+                                                 'properties': self._v1_properties(i, with_source=True)},
+                             params, 'hasMore')
+
+    _deals_recent = _deals_all
+
+    def _deals_detail(self, _, deal_id):
+        i = int(deal_id) - 1
+        return {'dealId': i + 1, 'portalId': PORTAL_ID, 'isDeleted': False,
+                'properties': self._v1_properties(i, with_source=True)}
+
+    def _deals_v3_batch_read(self, body):
+        return {'results': [{'id': item['id'],
+                             'properties': {name: self._iso(int(item['id']) - 1) for name in body['properties']}}
+                            for item in body['inputs']]}
+
+    def _deal_pipelines(self, _):
+        return [self._deal_pipeline(i) for i in range(min(self.record_count, 10))]
+
+    def _campaigns_all(self, params):
+        return self._v1_page('campaigns', lambda i: {'id': i + 1, 'appId': 1, 'appName': 'Batch'},
+                             params, 'hasMore')
+
+    def _campaigns_detail(self, _, campaign_id):
+        return self._campaign(int(campaign_id) - 1)
+
+    def _engagements_all(self, params):
+        return self._v1_page('results', self._engagement, params, 'hasMore')
+
+    def _subscription_changes(self, params):
+        return self._window_page('timeline', self._subscription_change, params)
+
+    def _email_events(self, params):
+        return self._window_page('events', self._email_event, params)
+
+    def _contact_lists(self, params):
+        return self._v1_page('lists', self._contact_list, params, 'has-more')
+
+    def _forms(self, _):
+        return [self._form(i) for i in range(self.record_count)]
+
+    def _workflows(self, _):
+        return {'workflows': [self._workflow(i) for i in range(self.record_count)]}
+
+    def _owners(self, params):
+        return self._v3_page(self._owner, params)
+
+    def _tickets(self, params):
+        return self._v3_page(lambda i: self._v3_record(i, params), params)
+
+    def _custom_objects_schema(self, _):
+        return {'results': [{'name': name, 'properties': self._property_definitions()}
+                            for name in self.custom_objects]}
+
+    def _custom_objects(self, params, object_name):
+        if object_name not in self.custom_objects:
+            return {'results': []}
+        return self._v3_page(lambda i: self._v3_record(i, params), params)
+
+
+class Cassette:
+    """
+    Recorded responses by `interaction_key`, saved as a JSON file.
+    """
+
+    def __init__(self, interactions=None):
+        self.interactions = collections.OrderedDict(interactions or {})
+        self._served = collections.Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as cassette_file:
+            return cls(json.load(cassette_file)['interactions'])
+
+    def save(self, path):
+        with self._lock:
+            data = {'interactions': self.interactions}
+            with open(path, 'w') as cassette_file:
+                json.dump(data, cassette_file, indent=1, sort_keys=True)
+
+    def add(self, key, status, headers, body):
+        with self._lock:
+            self.interactions.setdefault(key, []).append(
+                {'status': status, 'headers': headers, 'body': body.decode('utf-8')})
+
+    def respond(self, method, path, query, body):
+        key = interaction_key(method, path, query, body)
+        with self._lock:
+            responses = self.interactions.get(key)
+            if not responses:
+                return _json_response({'status': 'error', 'message': 'Not recorded: ' + key}, status=404)
+            response = responses[min(self._served[key], len(responses) - 1)]
+            self._served[key] += 1
+        return response['status'], dict(response['headers']), response['body'].encode('utf-8')
+
+
+class Recorder:
+    """
+    Forwards calls to `upstream` and records its responses in `cassette`.
+    Access tokens returned by the token endpoint are replaced before being
+    recorded; the real ones are only passed on to the tap.
+    """
+
+    def __init__(self, cassette, upstream=DEFAULT_BASE_URL, session=None):
+        self.cassette = cassette
+        self.upstream = upstream.rstrip('/')
+        self.session = session or requests.Session()
+
+    def respond(self, method, path, query, body, headers):
+        url = self.upstream + path + ('?' + query if query else '')
+        forwarded = {name: value for name, value in headers.items()
+                     if name.lower() in ('authorization', 'content-type')}
+        resp = self.session.request(method, url, data=body or None, headers=forwarded, timeout=300)
+        response_headers = {name: value for name, value in resp.headers.items()
+                            if name.lower() in RECORDED_HEADERS or name.lower().startswith('x-hubspot-ratelimit')}
+
+        recorded = resp.content
+        if path == TOKEN_PATH and resp.ok:
+            recorded = _token_response()[2]
+        self.cassette.add(interaction_key(method, path, query, body), resp.status_code, response_headers, recorded)
+        return resp.status_code, response_headers, resp.content
+
+
+class StandinServer:
+    """
+    Threaded HTTP server answering from a `SyntheticPortal`, a `Recorder`
+    or a `Cassette`, after an injected delay of `latency` plus up to
+    `jitter` seconds. `port=0` picks a free port.
+    """
+
+    def __init__(self, source, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, seed=0):
+        self.source = source
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def _delay(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def respond(self, method, target, body, headers):
+        parts = urllib.parse.urlsplit(target)
+        self._delay()
+        if isinstance(self.source, Recorder):
+            return self.source.respond(method, parts.path, parts.query, body, headers)
+        if isinstance(self.source, Cassette):
+            return self.source.respond(method, parts.path, parts.query, body)
+        params = {}
+        for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True):
+            if name in params:
+                params[name] = (params[name] if isinstance(params[name], list) else [params[name]]) + [value]
+            else:
+                params[name] = value
+        return self.source.respond(method, parts.path, params, body)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, headers, payload = server.respond(self.command, self.path, body, self.headers)
+                if 'gzip' in (self.headers.get('Accept-Encoding') or '') and payload:
+                    payload = gzip.compress(payload)
+                    headers = {**headers, 'Content-Encoding': 'gzip'}
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args): # pylint: disable=redefined-builtin
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mode', choices=['synthetic', 'record', 'replay'], default='synthetic')
+    parser.add_argument('--cassette', help='Cassette file written by record and read by replay')
+    parser.add_argument('--upstream', default=DEFAULT_BASE_URL, help='API recorded from')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many random seconds more')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--property-count', type=int, default=20)
+    parser.add_argument('--value-size', type=int, default=16)
+    parser.add_argument('--custom-objects', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.mode != 'synthetic' and not args.cassette:
+        parser.error('--cassette is required in {} mode'.format(args.mode))
+    if args.mode == 'synthetic':
+        source = SyntheticPortal(pages=args.pages, page_size=args.page_size, property_count=args.property_count,
+                                 value_size=args.value_size, custom_objects=args.custom_objects)
+    elif args.mode == 'record':
+        source = Recorder(Cassette(), upstream=args.upstream)
+    else:
+        source = Cassette.load(args.cassette)
+
+    server = StandinServer(source, host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+                           seed=args.seed)
+    print('Serving {} responses on {}'.format(args.mode, server.base_url))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        if args.mode == 'record':
+            source.cassette.save(args.cassette)
+            print('Saved {} recorded calls to {}'.format(len(source.cassette.interactions), args.cassette))
+
+
+if __name__ == '__main__':
+    main()
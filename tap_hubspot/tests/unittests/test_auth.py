@@ -0,0 +1,136 @@
+import threading
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.auth import TokenManager
+from tap_hubspot.tests.utils import FakeClock
+
+
+class FakeTimer:
+    def __init__(self, delay, function):
+        self.delay = delay
+        self.function = function
+        self.daemon = False
+        self.started = False
+        self.cancelled = False
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TestTokenManager(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.timers = []
+        self.tokens = iter(['first', 'second', 'third'])
+        self.fetch_token = mock.Mock(side_effect=lambda: (next(self.tokens), 1800))
+        self.manager = TokenManager(self.fetch_token, refresh_margin=600, clock=self.clock,
+                                    timer_factory=self.make_timer)
+
+    def make_timer(self, delay, function):
+        timer = FakeTimer(delay, function)
+        self.timers.append(timer)
+        return timer
+
+    def test_first_call_fetches_token(self):
+        """
+            Verify that the first call fetches a token and later calls reuse it without fetching
+        """
+        self.assertEqual(self.manager.authorization_header(), 'Bearer first')
+        self.assertEqual(self.manager.authorization_header(), 'Bearer first')
+
+        self.assertEqual(self.fetch_token.call_count, 1)
+
+    def test_refresh_is_scheduled_ahead_of_expiry(self):
+        """
+            Verify that the background refresh runs `refresh_margin` seconds before expiry and swaps the header
+        """
+        self.manager.authorization_header()
+        timer = self.timers[-1]
+        self.assertEqual(timer.delay, 1200)
+        self.assertTrue(timer.daemon and timer.started)
+
+        self.clock.now = 1200
+        timer.function()
+
+        self.assertEqual(self.manager.authorization_header(), 'Bearer second')
+        self.assertEqual(self.fetch_token.call_count, 2)
+        self.assertEqual(self.timers[-1].delay, 1200)
+
+    def test_failed_background_refresh_keeps_current_token(self):
+        """
+            Verify that a failed background refresh keeps serving the current token and retries
+        """
+        self.manager.authorization_header()
+        self.fetch_token.side_effect = requests.exceptions.Timeout
+
+        self.clock.now = 1200
+        self.timers[-1].function()
+
+        self.assertEqual(self.manager.authorization_header(), 'Bearer first')
+        self.assertEqual(self.timers[-1].delay, 30)
+
+    def test_expired_token_is_refreshed_inline(self):
+        """
+            Verify that callers block on a refresh, and see its exception, once the token has expired
+        """
+        self.manager.authorization_header()
+        self.fetch_token.side_effect = requests.exceptions.Timeout
+
+        self.clock.now = 1800
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.manager.authorization_header()
+
+    def test_stop_cancels_timer(self):
+        """
+            Verify that stopping the manager cancels the pending refresh
+        """
+        self.manager.authorization_header()
+        self.manager.stop()
+
+        self.assertTrue(self.timers[-1].cancelled)
+
+    def test_concurrent_first_calls_fetch_once(self):
+        """
+            Verify that concurrent callers waiting for the first token share a single fetch
+        """
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+            return 'token', 1800
+
+        self.manager.fetch_token = mock.Mock(side_effect=slow_fetch)
+        headers = []
+        threads = [threading.Thread(target=lambda: headers.append(self.manager.authorization_header()))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(headers, ['Bearer token'] * 8)
+        self.assertEqual(self.manager.fetch_token.call_count, 1)
+
+
+class TestGetParamsAndHeaders(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.TOKEN_MANAGER')
+    def test_bearer_header_from_token_manager(self, mocked_manager):
+        """
+            Verify that requests are authorized with the token manager's header when no hapikey is configured
+        """
+        mocked_manager.authorization_header.return_value = 'Bearer abc'
+
+        with mock.patch.dict(tap_hubspot.CONFIG, {'hapikey': None}):
+            params, headers = tap_hubspot.get_params_and_headers({'count': 1})
+
+        self.assertEqual(params, {'count': 1})
+        self.assertEqual(headers['Authorization'], 'Bearer abc')
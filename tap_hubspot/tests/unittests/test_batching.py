@@ -0,0 +1,121 @@
+import unittest
+from unittest import mock
+
+import tap_hubspot
+from tap_hubspot.batching import (URL_HEADROOM, joined_param_length, pack, repeated_param_length,
+                                  split_on_error, url_length)
+
+URL = 'https://api.hubapi.com/crm/v4/objects/tickets'
+
+
+class MockResponse:
+
+    def __init__(self, json_data):
+        self.json_data = json_data
+
+    def json(self):
+        return self.json_data
+
+
+class TestPack(unittest.TestCase):
+
+    def test_batches_fit_url_length(self):
+        """
+            Verify that every packed batch of vids fits the url length and the batch size
+        """
+        url = 'https://api.hubapi.com/contacts/v1/contact/vids/batch/'
+        vids = list(range(10 ** 8, 10 ** 8 + 250))
+        max_length = URL_HEADROOM + 1000
+
+        batches = pack(vids, url_length(url, {}), repeated_param_length('vid'), max_length, max_items=100)
+
+        self.assertEqual([vid for batch in batches for vid in batch], vids)
+        for batch in batches:
+            self.assertLessEqual(url_length(url, {'vid': batch}), max_length - URL_HEADROOM)
+            self.assertLessEqual(len(batch), 100)
+        self.assertEqual(len(pack(vids, 0, repeated_param_length('vid'), 10 ** 6, max_items=100)), 3)
+
+    def test_joined_properties_fit(self):
+        """
+            Verify that comma joined property chunks are sized with their encoded length
+        """
+        names = ['hs_property_{}'.format(i) for i in range(300)]
+        params = {'limit': 100, 'properties': ''}
+        max_length = URL_HEADROOM + 1500
+
+        chunks = pack(names, url_length(URL, params), joined_param_length, max_length)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(url_length(URL, {'limit': 100, 'properties': ','.join(chunk)}),
+                                 max_length - URL_HEADROOM)
+
+    def test_oversized_item_gets_own_batch(self):
+        """
+            Verify that an item longer than the limit is still sent, on its own
+        """
+        self.assertEqual(pack(['a' * 50, 'b'], 0, len, URL_HEADROOM + 10), [['a' * 50], ['b']])
+
+
+class TestSplitOnError(unittest.TestCase):
+
+    def test_splits_until_parts_fit(self):
+        """
+            Verify that batches are halved recursively on the error and results kept in order
+        """
+        def fetch(items):
+            if len(items) > 2:
+                raise tap_hubspot.UriTooLongException()
+            return [items]
+
+        self.assertEqual(split_on_error(fetch, [1, 2, 3, 4, 5], tap_hubspot.UriTooLongException),
+                         [[1, 2], [3], [4, 5]])
+
+    def test_single_item_reraises(self):
+        """
+            Verify that the error is raised when a single item still fails
+        """
+        with self.assertRaises(tap_hubspot.UriTooLongException):
+            split_on_error(mock.Mock(side_effect=tap_hubspot.UriTooLongException), [1, 2],
+                           tap_hubspot.UriTooLongException)
+
+
+class TestRequests(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.request')
+    def test_contacts_detail_split_on_414(self, mocked_request):
+        """
+            Verify that a contacts detail batch answered with 414 is split and each half requested
+        """
+        def request(url, params, stream=False):
+            if len(params['vid']) > 2:
+                raise tap_hubspot.UriTooLongException()
+            return params['vid']
+
+        mocked_request.side_effect = request
+
+        self.assertEqual(tap_hubspot.request_contacts_detail([1, 2, 3, 4]), [[1, 2], [3, 4]])
+
+    @mock.patch('tap_hubspot.request')
+    def test_property_chunks_are_merged(self, mocked_request):
+        """
+            Verify that a page whose properties don't fit one url is requested per chunk and merged by id
+        """
+        def request(url, params, stream=False):
+            names = params['properties'].split(',')
+            return MockResponse({
+                'results': [{'id': record_id, 'properties': {name: record_id for name in names}}
+                            for record_id in ('1', '2')],
+                'paging': {'next': {'after': '2'}}})
+
+        mocked_request.side_effect = request
+        names = ['hs_property_{}'.format(i) for i in range(300)]
+
+        with mock.patch.dict(tap_hubspot.CONFIG, {'max_url_length': 1500}):
+            page = tap_hubspot.get_properties_page(URL, {'limit': 100, 'properties': ','.join(names)}, 'results')
+
+        self.assertGreater(mocked_request.call_count, 1)
+        rows = list(page.rows())
+        self.assertEqual([row['id'] for row in rows], ['1', '2'])
+        self.assertEqual(rows[1]['properties'], {name: '2' for name in names})
+        self.assertEqual(page.data['paging'], {'next': {'after': '2'}})
@@ -0,0 +1,108 @@
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from tap_hubspot.tests.utils import FakeClock
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('email', failure_rate=0.5, window=4, min_calls=4,
+                                      reset_timeout=30, clock=self.clock)
+
+    def trip(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+
+    def test_stays_closed_below_min_calls(self):
+        """
+            Verify that the breaker does not open before `min_calls` outcomes are recorded
+        """
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+    def test_opens_at_failure_rate(self):
+        """
+            Verify that the breaker opens once the failure rate is reached and then refuses calls
+        """
+        self.breaker.record_success()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_lets_one_probe_through(self):
+        """
+            Verify that after the reset timeout a single probe is allowed and its success closes the breaker
+        """
+        self.trip()
+        self.clock.now = 31
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        """
+            Verify that a failed probe opens the breaker for another reset timeout
+        """
+        self.trip()
+        self.clock.now = 31
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, 'open')
+        self.clock.now = 60
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 62
+        self.assertTrue(self.breaker.allow())
+
+
+@mock.patch('time.sleep')
+class TestRequestWithCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        registry = CircuitBreakerRegistry(enabled=True, failure_rate=0.5, window=4, min_calls=4, reset_timeout=600)
+        patcher = mock.patch.object(tap_hubspot, 'CIRCUIT_BREAKERS', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('tap_hubspot.get_params_and_headers', return_value=({}, {}))
+    @mock.patch('requests.Session.send')
+    def test_open_circuit_fails_fast(self, mocked_send, mocked_params, mocked_sleep):
+        """
+            Verify that once the email API trips its breaker, later calls fail without reaching HubSpot
+        """
+        response = requests.Response()
+        response.status_code = 502
+        mocked_send.return_value = response
+        url = 'https://api.hubapi.com/email/public/v1/events'
+
+        with self.assertRaises(tap_hubspot.CircuitOpenException):
+            tap_hubspot.request(url)
+        self.assertEqual(mocked_send.call_count, 4)
+
+        with self.assertRaises(tap_hubspot.CircuitOpenException):
+            tap_hubspot.request(url)
+        self.assertEqual(mocked_send.call_count, 4)
+
+    def test_registry_is_disabled_by_default(self, mocked_sleep):
+        """
+            Verify that no breaker is handed out unless the circuit breaker is configured
+        """
+        self.assertIsNone(CircuitBreakerRegistry().get('email'))
@@ -0,0 +1,89 @@
+import threading
+import unittest
+from unittest import mock
+
+import tap_hubspot
+from tap_hubspot.coalesce import RequestCoalescer
+from tap_hubspot.tests.utils import FakeClock
+
+
+class TestRequestCoalescer(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_fetch(self):
+        """
+            Verify that callers asking for a key already in flight wait for it instead of fetching again
+        """
+        coalescer = RequestCoalescer()
+        started = threading.Event()
+        release = threading.Event()
+        fetch = mock.Mock(side_effect=lambda: started.set() or release.wait(5) and 'response')
+
+        results = []
+        owner = threading.Thread(target=lambda: results.append(coalescer.get('url', fetch)))
+        owner.start()
+        started.wait(5)
+        waiters = [threading.Thread(target=lambda: results.append(coalescer.get('url', fetch)))
+                   for _ in range(4)]
+        for waiter in waiters:
+            waiter.start()
+        release.set()
+        for thread in [owner] + waiters:
+            thread.join()
+
+        self.assertEqual(results, ['response'] * 5)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(coalescer.coalesced, 4)
+
+    def test_results_are_reused_within_window(self):
+        """
+            Verify that a result is reused until the memo window has passed
+        """
+        clock = FakeClock()
+        coalescer = RequestCoalescer(window=5, clock=clock)
+        fetch = mock.Mock(side_effect=['first', 'second'])
+
+        self.assertEqual(coalescer.get('url', fetch), 'first')
+        clock.now = 4.9
+        self.assertEqual(coalescer.get('url', fetch), 'first')
+        clock.now = 5
+        self.assertEqual(coalescer.get('url', fetch), 'second')
+        self.assertEqual(coalescer.get('other', mock.Mock(return_value='other')), 'other')
+
+    def test_no_memo_by_default(self):
+        """
+            Verify that sequential calls each fetch when no window is configured
+        """
+        coalescer = RequestCoalescer()
+        fetch = mock.Mock(side_effect=['first', 'second'])
+
+        self.assertEqual(coalescer.get('url', fetch), 'first')
+        self.assertEqual(coalescer.get('url', fetch), 'second')
+
+    def test_failures_are_not_remembered(self):
+        """
+            Verify that a failed fetch raises to its caller and the next call fetches again
+        """
+        coalescer = RequestCoalescer(window=60)
+        fetch = mock.Mock(side_effect=[RuntimeError('boom'), 'response'])
+
+        with self.assertRaises(RuntimeError):
+            coalescer.get('url', fetch)
+        self.assertEqual(coalescer.get('url', fetch), 'response')
+
+
+class TestRequest(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.send_get')
+    def test_identical_gets_are_coalesced(self, mocked_send_get):
+        """
+            Verify that identical GETs within the window reach HubSpot once, and streamed or different ones are sent
+        """
+        with mock.patch.object(tap_hubspot, 'REQUEST_COALESCER', RequestCoalescer(window=60)):
+            url = 'https://api.hubapi.com/companies/v2/properties'
+            first = tap_hubspot.request(url)
+            self.assertIs(tap_hubspot.request(url, {}), first)
+            self.assertEqual(mocked_send_get.call_count, 1)
+
+            tap_hubspot.request(url, {'count': 1})
+            tap_hubspot.request(url, stream=True)
+            self.assertEqual(mocked_send_get.call_count, 3)
@@ -0,0 +1,122 @@
+import datetime
+import decimal
+import io
+import json
+import unittest
+from unittest import mock
+
+import requests
+import singer
+import singer.messages
+import tap_hubspot
+from tap_hubspot import codec
+from tap_hubspot.transport import JsonResponse
+
+DOCUMENTS = [
+    b'{"vid": 12345, "score": 1.5, "name": "Zo\xc3\xab \\u2603", "flags": [true, false, null]}',
+    b'{"big": 123456789012345678901234567890, "neg": -9223372036854775809}',
+    b'{"tiny": 1e-320, "huge": 1e400}',
+    b'{"surrogate": "\\ud800"}',
+    b'[1, 2.0, -0.0, "x"]',
+]
+
+
+class TestLoads(unittest.TestCase):
+
+    def test_matches_stdlib(self):
+        """
+            Verify that decoded values (including types) are the same as the standard library's
+        """
+        for document in DOCUMENTS:
+            expected = json.loads(document)
+            actual = codec.loads(document)
+            self.assertEqual(repr(actual), repr(expected), document)
+
+    def test_without_orjson(self):
+        """
+            Verify that the codec falls back to the standard library when orjson isn't installed
+        """
+        with mock.patch.object(codec, 'orjson', None):
+            self.assertEqual(codec.loads(DOCUMENTS[0]), json.loads(DOCUMENTS[0]))
+
+    def test_invalid_json_raises_value_error(self):
+        """
+            Verify that invalid documents raise a ValueError like json.loads
+        """
+        with self.assertRaises(ValueError):
+            codec.loads(b'{"results": [')
+
+    def test_json_response_uses_codec(self):
+        """
+            Verify that responses sent through the transport decode with the codec
+        """
+        response = requests.Response()
+        response._content = DOCUMENTS[1]
+        response.__class__ = JsonResponse
+
+        with mock.patch.object(codec, 'loads', wraps=codec.loads) as mocked_loads:
+            self.assertEqual(response.json(), json.loads(DOCUMENTS[1]))
+        mocked_loads.assert_called_once()
+
+
+class TestFormatMessage(unittest.TestCase):
+
+    def assert_same_as_singer(self, message):
+        expected = singer.messages.format_message(message)
+        actual = codec.format_message(message)
+        self.assertEqual(json.loads(actual), json.loads(expected))
+        self.assertNotIn(b'\n', actual)
+
+    def test_record_message(self):
+        """
+            Verify that records decode to the same value as singer-python's encoding
+        """
+        record = {'vid': 1, 'name': 'Zoë ☃', 'score': 0.1, 'updatedAt': '2023-01-01T00:00:00.000000Z',
+                  'nested': {'list': [1, None, True]}}
+        self.assert_same_as_singer(singer.RecordMessage(
+            stream='contacts', record=record,
+            time_extracted=datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)))
+
+    def test_decimal_and_large_integers_fall_back(self):
+        """
+            Verify that values orjson can't encode exactly are encoded by singer-python
+        """
+        message = singer.RecordMessage(stream='deals', record={'amount': decimal.Decimal('1.10'),
+                                                               'id': 2 ** 70})
+
+        self.assertEqual(codec.format_message(message),
+                         singer.messages.format_message(message).encode('utf-8'))
+
+    def test_non_finite_floats_fall_back(self):
+        """
+            Verify that NaN and infinite floats are written as singer-python writes them, not as null
+        """
+        message = singer.RecordMessage(stream='deals', record={'a': float('nan'), 'b': float('inf'),
+                                                               'c': [float('-inf')], 'd': None})
+
+        encoded = codec.format_message(message)
+
+        self.assertEqual(encoded, singer.messages.format_message(message).encode('utf-8'))
+        self.assertIn(b'NaN', encoded)
+        self.assertIn(b'-Infinity', encoded)
+
+    def test_datetime_values_are_rejected_like_singer(self):
+        """
+            Verify that a datetime left in a record fails the same way it does with singer-python
+        """
+        message = singer.RecordMessage(stream='deals', record={'closedate': datetime.datetime(2023, 1, 1)})
+
+        with self.assertRaises(TypeError):
+            codec.format_message(message)
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_write_record(self, mocked_stdout):
+        """
+            Verify that `write_record` writes one RECORD message line per record
+        """
+        tap_hubspot.write_record('contacts', {'vid': 1}, 'hubspot_contacts')
+        tap_hubspot.WRITER.flush()
+
+        self.assertEqual(json.loads(mocked_stdout.getvalue()),
+                         {'type': 'RECORD', 'stream': 'hubspot_contacts', 'record': {'vid': 1}})
+        self.assertTrue(mocked_stdout.getvalue().endswith('\n'))
@@ -0,0 +1,117 @@
+import threading
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.concurrency import AIMDController
+
+
+class TestAIMDController(unittest.TestCase):
+
+    def healthy_calls(self, controller, count, latency=0.1, key=None):
+        for _ in range(count):
+            controller.release(controller.acquire(), overloaded=False, latency=latency, key=key)
+
+    def test_additive_increase(self):
+        """
+            Verify that the window grows by about one slot per window of healthy calls, up to the maximum
+        """
+        controller = AIMDController(max_window=4)
+        self.assertEqual(controller.limit, 1)
+
+        self.healthy_calls(controller, 1)
+        self.assertEqual(controller.limit, 2)
+        self.healthy_calls(controller, 2)
+        self.assertEqual(controller.limit, 2)
+        self.healthy_calls(controller, 1)
+        self.assertEqual(controller.limit, 3)
+        self.healthy_calls(controller, 100)
+        self.assertEqual(controller.limit, 4)
+
+    def test_multiplicative_decrease_once_per_window(self):
+        """
+            Verify that failures of calls started before a cut don't cut the window again
+        """
+        controller = AIMDController(max_window=16, initial_window=16)
+        slots = [controller.acquire() for _ in range(8)]
+
+        for slot in slots:
+            controller.release(slot, overloaded=True)
+        self.assertEqual(controller.limit, 8)
+
+        controller.release(controller.acquire(), overloaded=True)
+        self.assertEqual(controller.limit, 4)
+
+    def test_latency_spike_cuts_window(self):
+        """
+            Verify that a call much slower than the smoothed latency cuts the window
+        """
+        controller = AIMDController(max_window=8, initial_window=8)
+        self.healthy_calls(controller, 10, latency=0.1)
+
+        controller.release(controller.acquire(), overloaded=False, latency=1)
+
+        self.assertEqual(controller.limit, 4)
+
+    def test_latency_compared_per_endpoint(self):
+        """
+            Verify that a call is only a spike against earlier calls to its own endpoint
+        """
+        controller = AIMDController(max_window=8, initial_window=8)
+        self.healthy_calls(controller, 10, latency=0.1, key='/crm/v3/owners/')
+        self.healthy_calls(controller, 10, latency=1, key='/contacts/v1/contact/vids/batch/')
+
+        self.assertEqual(controller.limit, 8)
+
+        controller.release(controller.acquire(), overloaded=False, latency=1, key='/crm/v3/owners/')
+
+        self.assertEqual(controller.limit, 4)
+
+    def test_window_bounds_calls_in_flight(self):
+        """
+            Verify that callers wait for a slot once the window is full
+        """
+        controller = AIMDController(max_window=4, initial_window=1)
+        slot = controller.acquire()
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: controller.acquire() is not None and acquired.set())
+        waiter.start()
+
+        self.assertFalse(acquired.wait(0.05))
+        controller.release(slot, overloaded=False)
+        self.assertTrue(acquired.wait(5))
+        waiter.join()
+
+    def test_on_change(self):
+        """
+            Verify that window changes are reported
+        """
+        on_change = mock.Mock()
+        controller = AIMDController(max_window=2, on_change=on_change)
+
+        self.healthy_calls(controller, 3)
+        controller.release(controller.acquire(), overloaded=True)
+
+        self.assertEqual(on_change.call_args_list, [mock.call(2), mock.call(1)])
+
+
+class TestSendRequest(unittest.TestCase):
+
+    def test_throttled_response_cuts_window(self):
+        """
+            Verify that send_request reports 429 responses and timeouts to the controller
+        """
+        controller = AIMDController(max_window=8, initial_window=8)
+        response = requests.Response()
+        response.status_code = 429
+
+        with mock.patch.object(tap_hubspot, 'CONCURRENCY', controller):
+            tap_hubspot.send_request('https://api.hubapi.com/crm/v3/owners/', lambda: response)
+            self.assertEqual(controller.limit, 4)
+
+            with self.assertRaises(requests.exceptions.Timeout):
+                tap_hubspot.send_request('https://api.hubapi.com/crm/v3/owners/',
+                                         mock.Mock(side_effect=requests.exceptions.Timeout))
+            self.assertEqual(controller.limit, 2)
+        self.assertEqual(controller.in_flight, 0)
@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import tap_hubspot
+from tap_hubspot.engine import RequestEngine
+
+
+class TestRequestEngine(unittest.TestCase):
+
+    def test_results_are_returned_in_submission_order(self):
+        """
+            Verify that results come back in the order of the calls even when later calls finish first
+        """
+        def slow_echo(value):
+            time.sleep(0.01 * (5 - value))
+            return value
+
+        results = RequestEngine(max_concurrency=5).map(slow_echo, [(i,) for i in range(5)])
+
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+
+    def test_concurrency_is_bounded(self):
+        """
+            Verify that no more than `max_concurrency` calls are in flight at once
+        """
+        lock = threading.Lock()
+        in_flight = {'current': 0, 'peak': 0}
+
+        def tracked(_):
+            with lock:
+                in_flight['current'] += 1
+                in_flight['peak'] = max(in_flight['peak'], in_flight['current'])
+            time.sleep(0.02)
+            with lock:
+                in_flight['current'] -= 1
+
+        RequestEngine(max_concurrency=3).map(tracked, [(i,) for i in range(12)])
+
+        self.assertEqual(in_flight['peak'], 3)
+
+    def test_exceptions_are_propagated(self):
+        """
+            Verify that the exception raised by a call (e.g. UriTooLongException) reaches the caller unchanged
+        """
+        def failing(value):
+            if value == 2:
+                raise tap_hubspot.UriTooLongException("too long")
+            return value
+
+        with self.assertRaises(tap_hubspot.UriTooLongException):
+            RequestEngine(max_concurrency=4).map(failing, [(i,) for i in range(6)])
+
+    def test_keyword_arguments_are_passed(self):
+        """
+            Verify that `(args, kwargs)` pairs are unpacked into the call
+        """
+        results = RequestEngine(max_concurrency=2).map(
+            lambda url, params=None: (url, params),
+            [(('url_1',), {'params': {'a': 1}}), (('url_2',), {})])
+
+        self.assertEqual(results, [('url_1', {'a': 1}), ('url_2', None)])
+
+
+class TestRequestConcurrently(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.request', side_effect=lambda url: url)
+    def test_request_concurrently_uses_config(self, mocked_request):
+        """
+            Verify that `request_concurrently` issues every call with the configured concurrency
+        """
+        tap_hubspot.CONFIG['max_concurrency'] = 4
+        try:
+            tap_hubspot.configure_engine()
+            urls = ['url_{}'.format(i) for i in range(8)]
+            results = tap_hubspot.request_concurrently(tap_hubspot.request, urls)
+            self.assertEqual(tap_hubspot.ENGINE.max_concurrency, 4)
+        finally:
+            tap_hubspot.CONFIG.pop('max_concurrency')
+            tap_hubspot.configure_engine()
+
+        self.assertEqual(results, urls)
+        self.assertEqual(mocked_request.call_count, 8)
+
+    def test_pool_is_reused(self):
+        """
+            Verify that every call to the engine runs on the same long-lived pool of threads
+        """
+        engine = RequestEngine(max_concurrency=2)
+        self.addCleanup(engine.close)
+        threads = set()
+
+        def record_thread(_):
+            time.sleep(0.01)
+            threads.add(threading.get_ident())
+
+        for _ in range(5):
+            engine.map(record_thread, [(i,) for i in range(2)])
+
+        self.assertLessEqual(len(threads), 2)
+
+    def test_default_concurrency_is_serial(self):
+        """
+            Verify that requests are serial unless `max_concurrency` is configured
+        """
+        tap_hubspot.CONFIG.pop('max_concurrency', None)
+
+        self.assertEqual(tap_hubspot.get_max_concurrency(), 1)
@@ -0,0 +1,187 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.hedging import Hedger
+from tap_hubspot.latency import LatencyTracker, endpoint_key
+
+KEY = '/companies/v2/companies/{id}'
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_endpoint_key(self):
+        """
+            Verify that numeric ids are replaced so every detail call shares one key
+        """
+        self.assertEqual(endpoint_key('https://api.hubapi.com/companies/v2/companies/123?hapikey=x'), KEY)
+        self.assertEqual(endpoint_key('https://api.hubapi.com/email/public/v1/campaigns/9/'),
+                         '/email/public/v1/campaigns/{id}/')
+        self.assertEqual(endpoint_key('https://api.hubapi.com/contacts/v1/contact/vids/batch/'),
+                         '/contacts/v1/contact/vids/batch/')
+
+    def test_percentile(self):
+        """
+            Verify that percentiles are reported once enough latencies are recorded, over the window only
+        """
+        tracker = LatencyTracker(window=100, min_samples=10)
+        for i in range(9):
+            tracker.record(KEY, i)
+        self.assertIsNone(tracker.percentile(KEY, 0.5))
+
+        for i in range(200):
+            tracker.record(KEY, i)
+
+        self.assertEqual(tracker.percentile(KEY, 0.5), 150)
+        self.assertEqual(tracker.percentile(KEY, 0.99), 199)
+        self.assertIsNone(tracker.percentile('/other', 0.5))
+
+
+class TestHedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = LatencyTracker(min_samples=1)
+        self.tracker.record(KEY, 0.01)
+        self.hedger = Hedger(self.tracker, percentile=0.95, budget=1)
+        self.addCleanup(self.hedger.close)
+
+    def test_fast_call_is_not_hedged(self):
+        """
+            Verify that a call responding within the threshold is made once
+        """
+        attempt = mock.Mock(return_value='response')
+
+        self.assertEqual(self.hedger.run(KEY, attempt), 'response')
+        self.assertEqual(attempt.call_count, 1)
+        self.assertEqual(self.hedger.hedges, 0)
+
+    def test_no_hedge_without_latencies(self):
+        """
+            Verify that endpoints without recorded latencies are called directly
+        """
+        attempt = mock.Mock(return_value='response')
+
+        self.assertEqual(self.hedger.run('/other', attempt), 'response')
+        self.assertEqual(self.hedger.hedges, 0)
+
+    def test_slow_call_is_hedged_and_first_response_wins(self):
+        """
+            Verify that a second copy is sent after the threshold and its response is used when it arrives first
+        """
+        release = threading.Event()
+        responses = iter(['slow', 'hedge'])
+
+        def attempt(sending):
+            sending()
+            response = next(responses)
+            if response == 'slow':
+                release.wait(5)
+            return response
+
+        self.assertEqual(self.hedger.run(KEY, attempt), 'hedge')
+        release.set()
+        self.assertEqual((self.hedger.hedges, self.hedger.hedge_wins), (1, 1))
+
+    def test_failed_copy_waits_for_other(self):
+        """
+            Verify that the call only fails when both copies fail
+        """
+        release = threading.Event()
+        outcomes = iter(['slow', 'fail'])
+
+        def attempt(sending):
+            sending()
+            if next(outcomes) == 'fail':
+                raise RuntimeError('boom')
+            release.wait(0.2)
+            return 'slow'
+
+        self.assertEqual(self.hedger.run(KEY, attempt), 'slow')
+
+        failing = Hedger(self.tracker, budget=1)
+        self.addCleanup(failing.close)
+
+        def always_fails(sending):
+            sending()
+            release.wait(0.05)
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            failing.run(KEY, always_fails)
+
+    def test_error_response_waits_for_ok_one(self):
+        """
+            Verify that a fast error response doesn't beat a slower successful one, and is used if it's all there is
+        """
+        slow_ok = mock.Mock(ok=True)
+        fast_error = mock.Mock(ok=False, status_code=429)
+        responses = iter([slow_ok, fast_error])
+
+        def attempt(sending):
+            sending()
+            response = next(responses)
+            if response is slow_ok:
+                threading.Event().wait(0.1)
+            return response
+
+        self.assertIs(self.hedger.run(KEY, attempt), slow_ok)
+        self.assertEqual(self.hedger.hedge_wins, 0)
+
+        errors = iter([mock.Mock(ok=False, status_code=503), fast_error])
+
+        def failing(sending):
+            sending()
+            response = next(errors)
+            if response is not fast_error:
+                threading.Event().wait(0.1)
+            return response
+
+        self.assertEqual(self.hedger.run(KEY, failing).status_code, 429)
+
+    def test_time_before_sending_is_not_hedged(self):
+        """
+            Verify that a call held back before it is sent, e.g. by the rate limiter, isn't hedged for it
+        """
+        attempt = mock.Mock(side_effect=lambda sending: threading.Event().wait(0.1) or sending() or 'response')
+
+        self.assertEqual(self.hedger.run(KEY, attempt), 'response')
+        self.assertEqual(attempt.call_count, 1)
+        self.assertEqual(self.hedger.hedges, 0)
+
+    def test_budget_caps_hedges(self):
+        """
+            Verify that hedges stop once they reach the budget share of calls
+        """
+        hedger = Hedger(self.tracker, budget=0.25)
+        self.addCleanup(hedger.close)
+        attempt = mock.Mock(side_effect=lambda sending: sending() or threading.Event().wait(0.03) or 'response')
+
+        for _ in range(8):
+            hedger.run(KEY, attempt)
+
+        self.assertEqual(hedger.hedges, 2)
+        self.assertEqual(attempt.call_count, 10)
+
+
+class TestSendGetLatency(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.get_params_and_headers', return_value=({}, {}))
+    @mock.patch('requests.Session.send')
+    def test_rate_limiter_wait_is_not_recorded(self, mocked_send, mocked_params):
+        """
+            Verify that the latency recorded for an endpoint leaves out the time waited for the rate limiter
+        """
+        response = requests.Response()
+        response.status_code = 200
+        mocked_send.return_value = response
+        limiter = mock.Mock(acquire=mock.Mock(side_effect=lambda: time.sleep(0.2)))
+        tracker = LatencyTracker(min_samples=1)
+
+        with mock.patch.object(tap_hubspot, 'RATE_LIMITER', limiter), \
+             mock.patch.object(tap_hubspot, 'LATENCY', tracker):
+            tap_hubspot.send_get('https://api.hubapi.com/companies/v2/companies/1')
+
+        self.assertLess(tracker.percentile(KEY, 1), 0.1)
@@ -0,0 +1,114 @@
+import io
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.http_metrics import LATENCY_BUCKETS, EndpointTemplates, Histogram, HttpMetrics
+from tap_hubspot.transport import JsonResponse
+
+
+class TestEndpointTemplates(unittest.TestCase):
+
+    def test_urls_are_named_after_their_template(self):
+        """
+            Verify that urls are named after their ENDPOINTS entry and unknown ones after their path
+        """
+        templates = EndpointTemplates(tap_hubspot.ENDPOINTS)
+        base_url = 'https://api.hubapi.com'
+
+        self.assertEqual(templates.name(base_url + '/companies/v2/companies/123?hapikey=x', base_url),
+                         'companies_detail')
+        self.assertEqual(templates.name(base_url + '/deals/v1/deal/paged?offset=5', base_url), 'deals_all')
+        self.assertEqual(templates.name(base_url + '/deals/v1/deal/42', base_url), 'deals_detail')
+        self.assertEqual(templates.name(base_url + '/crm/v3/owners/', base_url), 'owners')
+        self.assertEqual(templates.name('http://127.0.0.1:8000/crm/v3/objects/p_cars', 'http://127.0.0.1:8000'),
+                         'custom_objects')
+        self.assertEqual(templates.name(base_url + '/integrations/v1/123/timeline', base_url),
+                         '/integrations/v1/{id}/timeline')
+
+
+class TestHttpMetrics(unittest.TestCase):
+
+    def test_histogram_percentiles(self):
+        """
+            Verify that percentiles are reported as the upper bound of their bucket, capped by the maximum
+        """
+        histogram = Histogram(LATENCY_BUCKETS)
+        for latency in [0.01] * 90 + [0.3] * 9 + [7.0]:
+            histogram.add(latency)
+
+        self.assertEqual(histogram.percentile(0.5), 0.05)
+        self.assertEqual(histogram.percentile(0.95), 0.5)
+        self.assertEqual(histogram.percentile(1), 7.0)
+        self.assertIsNone(Histogram(LATENCY_BUCKETS).percentile(0.5))
+
+    def test_summary_by_stream(self):
+        """
+            Verify that the summary lists the endpoints slowest first, for one stream or all of them
+        """
+        registry = HttpMetrics()
+        registry.record_call('companies', 'companies_detail', 200, 0.2)
+        registry.record_call('companies', 'companies_detail', 429, 0.1)
+        registry.record_retry('companies', 'companies_detail', 1.5)
+        registry.record_size('companies', 'companies_detail', 2048)
+        registry.record_call('companies', 'companies_all', 200, 0.1)
+        registry.record_call('deals', 'deals_all', 'ReadTimeout', 5.0)
+
+        self.assertEqual(registry.summary('companies'), [
+            'companies_detail: 2 calls (200=1 429=1), 0.30s total, p50 0.10s, p95 0.20s, max 0.20s, '
+            '2.0 kB received (max 2.0 kB), 1 retries, 1.50s in backoff',
+            'companies_all: 1 calls (200=1), 0.10s total, p50 0.10s, p95 0.10s, max 0.10s'])
+        self.assertEqual([line.split(':')[0] for line in registry.summary()],
+                         ['deals_all', 'companies_detail', 'companies_all'])
+
+
+class TestRecording(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = HttpMetrics()
+        patcher = mock.patch.object(tap_hubspot, 'HTTP_METRICS', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_traced_send_records_calls(self):
+        """
+            Verify that calls are recorded under their endpoint with their status, size or error
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"results": []}'
+        response._content_consumed = True
+
+        tap_hubspot.traced_send('GET', 'https://api.hubapi.com/crm/v3/owners/?limit=100', lambda: response)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            tap_hubspot.traced_send('POST', 'https://api.hubapi.com/crm/v3/objects/deals/batch/read',
+                                    mock.Mock(side_effect=requests.exceptions.ConnectionError))
+
+        stats = self.registry.stats()
+        self.assertEqual(stats['owners'].statuses, {200: 1})
+        self.assertEqual(stats['owners'].size.sum, 15)
+        self.assertEqual(stats['deals_v3_batch_read'].statuses, {'ConnectionError': 1})
+
+    def test_streamed_size_recorded_on_close(self):
+        """
+            Verify that the size of a streamed response is recorded once it has been read and closed
+        """
+        response = JsonResponse()
+        response.status_code = 200
+        response.raw = io.BytesIO(b'{"results": []}')
+        tap_hubspot.traced_send('GET', 'https://api.hubapi.com/crm/v4/objects/tickets', lambda: response)
+
+        self.assertEqual(self.registry.stats()['tickets'].size.total, 0)
+        b''.join(response.iter_content(4))
+        response.close()
+        self.assertEqual(self.registry.stats()['tickets'].size.sum, 15)
+
+    def test_retries_are_recorded(self):
+        """
+            Verify that retries and their backoff are recorded under the endpoint being retried
+        """
+        tap_hubspot.on_backoff({'args': ('https://api.hubapi.com/companies/v2/companies/1', {}), 'wait': 2.0})
+
+        stats = self.registry.stats()['companies_detail']
+        self.assertEqual((stats.retries, stats.backoff), (1, 2.0))
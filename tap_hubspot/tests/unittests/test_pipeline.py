@@ -0,0 +1,197 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from singer import Transformer
+
+import tap_hubspot
+from tap_hubspot import pipeline
+from tap_hubspot.pipeline import Pipeline
+from tap_hubspot.transform_pool import TransformFailed, TransformPool
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_records_emitted_in_order(self):
+        """
+            Verify that every transformed row is emitted, in source order, with dropped rows skipped
+        """
+        emitted = []
+        staged = Pipeline('test', lambda row: None if row % 3 == 0 else row * 2, emitted.append, queue_size=2)
+        staged.run(range(100))
+
+        self.assertEqual(emitted, [row * 2 for row in range(100) if row % 3])
+        self.assertEqual((staged.counts['fetch'], staged.counts['transform'], staged.counts['emit']), (100, 100, 66))
+
+    def test_stages_run_concurrently(self):
+        """
+            Verify that fetching, transforming and emitting overlap instead of adding up
+        """
+        def source():
+            for row in range(5):
+                time.sleep(0.05)
+                yield row
+
+        def transform(row):
+            time.sleep(0.05)
+            return row
+
+        started = time.monotonic()
+        staged = Pipeline('test', transform, lambda record: time.sleep(0.05))
+        staged.run(source())
+
+        self.assertLess(time.monotonic() - started, 0.6)
+        for stage in ('fetch', 'transform', 'emit'):
+            self.assertGreaterEqual(staged.timings[stage], 0.25)
+
+    def test_backpressure(self):
+        """
+            Verify that a slow emit stage stops the fetch stage from reading ahead of the queues
+        """
+        fetched = []
+        release = threading.Event()
+
+        def source():
+            for row in range(100):
+                fetched.append(row)
+                yield row
+
+        staged = Pipeline('test', lambda row: row, lambda record: release.wait(5), queue_size=2)
+        thread = threading.Thread(target=staged.run, args=(source(),))
+        thread.start()
+        time.sleep(0.2)
+        fetched_while_blocked = len(fetched)
+        release.set()
+        thread.join()
+
+        # One row being emitted, two queued on each side and one held by each of the other stages
+        self.assertLessEqual(fetched_while_blocked, 7)
+        self.assertEqual(len(fetched), 100)
+
+    def test_deferred_calls_run_after_earlier_records(self):
+        """
+            Verify that calls deferred from the fetch stage run once the records fetched before them are emitted
+        """
+        events = []
+
+        def source():
+            for page in range(3):
+                yield from (page * 10, page * 10 + 1)
+                pipeline.current().defer(events.append, 'state {}'.format(page))
+
+        Pipeline('test', lambda row: row, events.append, queue_size=1).run(source())
+
+        self.assertEqual(events, [0, 1, 'state 0', 10, 11, 'state 1', 20, 21, 'state 2'])
+        self.assertIsNone(pipeline.current())
+
+    def test_errors_are_raised_after_earlier_records(self):
+        """
+            Verify that an error in the fetch or transform stage is raised once the records before it are emitted
+        """
+        def source():
+            yield from range(3)
+            raise tap_hubspot.SourceUnavailableException('forbidden')
+
+        def transform(row):
+            if row == 5:
+                raise ValueError(row)
+            return row
+
+        emitted = []
+        with self.assertRaises(tap_hubspot.SourceUnavailableException):
+            Pipeline('test', lambda row: row, emitted.append).run(source())
+        self.assertEqual(emitted, [0, 1, 2])
+
+        emitted = []
+        with self.assertRaises(ValueError):
+            Pipeline('test', transform, emitted.append).run(range(10))
+        self.assertEqual(emitted, [0, 1, 2, 3, 4])
+
+    def test_emit_error_stops_the_source(self):
+        """
+            Verify that an error in the emit stage closes the source instead of letting it fetch on
+        """
+        closed = threading.Event()
+
+        def source():
+            try:
+                yield from range(1000)
+            finally:
+                closed.set()
+
+        def emit(record):
+            if record == 3:
+                raise IOError('broken pipe')
+
+        with self.assertRaises(IOError):
+            Pipeline('test', lambda row: row, emit, queue_size=2).run(source())
+        self.assertTrue(closed.is_set())
+
+
+class TestWriteState(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.WRITER.write_state')
+    def test_state_written_after_records(self, mocked_write_state):
+        """
+            Verify that states written from the fetch stage are snapshots written after the records before them
+        """
+        state = {'bookmarks': {}}
+        events = []
+        mocked_write_state.side_effect = lambda written: events.append(written)
+
+        def source():
+            for page in range(2):
+                yield page
+                state['bookmarks']['deals'] = {'offset': page}
+                tap_hubspot.write_state(state)
+
+        Pipeline('deals', lambda row: row, events.append, queue_size=1).run(source())
+
+        self.assertEqual(events, [0, {'bookmarks': {'deals': {'offset': 0}}}, 1, {'bookmarks': {'deals': {'offset': 1}}}])
+
+        tap_hubspot.write_state(state)
+        mocked_write_state.assert_called_with(state)
+
+
+class TestTransformPool(unittest.TestCase):
+
+    def test_chunks_emitted_in_order_with_deferred_calls(self):
+        """
+            Verify that rows transformed by worker processes are emitted in order, with deferred calls in between
+        """
+        schema = {'type': 'object', 'properties': {'id': {'type': 'integer'},
+                                                   'property_name': {'type': ['null', 'string']}}}
+        mdata = {(): {'selected': True}, ('properties', 'id'): {'inclusion': 'automatic'},
+                 ('properties', 'property_name'): {'selected': True}}
+        events = []
+
+        def source():
+            for page in range(3):
+                yield from ({'id': str(page * 250 + i), 'properties': {'name': 'n{}'.format(i)}} for i in range(250))
+                pipeline.current().defer(events.append, 'state {}'.format(page))
+
+        with Transformer() as transformer, \
+             TransformPool(2, transformer, schema, mdata, tap_hubspot.lift_properties_and_versions) as pool:
+            staged = Pipeline('test', None, events.append, queue_size=300, pool=pool)
+            staged.run(source())
+
+        expected = []
+        for page in range(3):
+            expected += [{'id': page * 250 + i, 'property_name': 'n{}'.format(i)} for i in range(250)]
+            expected.append('state {}'.format(page))
+        self.assertEqual(events, expected)
+        self.assertEqual(staged.counts['transform'], 750)
+        self.assertEqual(transformer.removed, {'properties'})
+
+    def test_worker_errors_are_raised(self):
+        """
+            Verify that a record failing its transform in a worker fails the sync
+        """
+        schema = {'type': 'object', 'properties': {'id': {'type': 'integer'}}}
+        mdata = {(): {'selected': True}, ('properties', 'id'): {'inclusion': 'automatic'}}
+
+        with Transformer() as transformer, \
+             TransformPool(1, transformer, schema, mdata, tap_hubspot.lift_properties_and_versions) as pool:
+            with self.assertRaises(TransformFailed):
+                Pipeline('test', None, lambda record: None, pool=pool).run([{'id': 1}, {'id': 'x'}])
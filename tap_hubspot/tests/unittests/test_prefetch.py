@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import tap_hubspot
+from tap_hubspot.prefetch import iter_pages
+from tap_hubspot.streaming import BufferedPage
+
+
+def paged(count):
+    """
+    `fetch` and `next_params` of an endpoint with `count` pages, recording the offsets fetched.
+    """
+    fetched = []
+
+    def fetch(params):
+        fetched.append(params['offset'])
+        offset = params['offset']
+        return {'rows': [offset * 10 + i for i in range(3)], 'offset': offset + 1, 'has-more': offset + 1 < count}
+
+    def next_params(params, page):
+        return {'offset': page['offset']} if page['has-more'] else None
+
+    return fetch, next_params, fetched
+
+
+class TestIterPages(unittest.TestCase):
+
+    def test_pages_in_order(self):
+        """
+            Verify that pages are yielded in order with or without prefetching
+        """
+        for depth in (0, 1, 3):
+            fetch, next_params, _ = paged(5)
+            pages = list(iter_pages(fetch, {'offset': 0}, next_params, depth))
+            self.assertEqual([page['offset'] for page in pages], [1, 2, 3, 4, 5])
+
+    def test_next_page_fetched_while_consuming(self):
+        """
+            Verify that the next page is requested while the current one is still being consumed
+        """
+        fetch, next_params, fetched = paged(3)
+        second_page_requested = threading.Event()
+
+        def fetch_and_signal(params):
+            page = fetch(params)
+            if params['offset'] == 1:
+                second_page_requested.set()
+            return page
+
+        pages = iter_pages(fetch_and_signal, {'offset': 0}, next_params, depth=1)
+        next(pages)
+
+        self.assertTrue(second_page_requested.wait(5))
+        self.assertEqual(list(pages)[-1]['offset'], 3)
+        self.assertEqual(fetched, [0, 1, 2])
+
+    def test_prefetch_depth_is_bounded(self):
+        """
+            Verify that no more than depth pages are fetched ahead of the page being consumed
+        """
+        fetch, next_params, fetched = paged(10)
+        pages = iter_pages(fetch, {'offset': 0}, next_params, depth=2)
+        next(pages)
+        time.sleep(0.1)
+
+        self.assertEqual(fetched, [0, 1, 2])
+        pages.close()
+
+    def test_errors_are_raised_in_order(self):
+        """
+            Verify that a failed prefetch is raised once the pages before it have been consumed
+        """
+        fetch, next_params, _ = paged(5)
+
+        def failing_fetch(params):
+            if params['offset'] == 2:
+                raise tap_hubspot.SourceUnavailableException('forbidden')
+            return fetch(params)
+
+        consumed = []
+        with self.assertRaises(tap_hubspot.SourceUnavailableException):
+            for page in iter_pages(failing_fetch, {'offset': 0}, next_params, depth=2):
+                consumed.append(page['offset'])
+        self.assertEqual(consumed, [1, 2])
+
+
+class TestGenRequestPrefetch(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.WRITER.write_state')
+    @mock.patch('tap_hubspot.get_page')
+    def test_offsets_only_cover_emitted_pages(self, mocked_get_page, mocked_write_state):
+        """
+            Verify that the offset in the state points after the last emitted page, not the prefetched ones
+        """
+        def get_page(url, params, path, stream=False):
+            offset = params.get('offset', 0)
+            self.assertFalse(stream)
+            return BufferedPage({'deals': [{'dealId': offset * 10 + i} for i in range(2)],
+                                 'hasMore': offset < 4, 'offset': offset + 1}, path)
+
+        mocked_get_page.side_effect = get_page
+        params = {'limit': 2}
+
+        with mock.patch.dict(tap_hubspot.CONFIG, {'prefetch_pages': 2}):
+            rows = tap_hubspot.gen_request({}, 'deals', 'url', params, 'deals', 'hasMore', ['offset'], ['offset'])
+            emitted = [next(rows) for _ in range(5)]
+            time.sleep(0.1)
+            rows.close()
+
+        self.assertEqual([row['dealId'] for row in emitted], [0, 1, 10, 11, 20])
+        self.assertGreaterEqual(mocked_get_page.call_count, 4)
+        last_state = mocked_write_state.call_args[0][0]
+        self.assertEqual(last_state['bookmarks']['deals']['offset'], {'offset': 2})
+        self.assertEqual(params, {'limit': 2})
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.circuit_breaker import CircuitBreakerRegistry
+from tap_hubspot.quota import QuotaLedger
+from tap_hubspot.tests.utils import FakeClock
+
+
+class FakeDay:
+    def __init__(self):
+        self.day = '2023-01-01'
+
+    def __call__(self):
+        return self.day
+
+
+class TestQuotaLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'quota.json')
+        self.today = FakeDay()
+
+    def ledger(self, portal='portal', reserve=100):
+        return QuotaLedger(self.path, portal, reserve=reserve, today=self.today)
+
+    def test_unknown_until_seeded(self):
+        """
+            Verify that the remaining quota is unknown until HubSpot reports it
+        """
+        ledger = self.ledger()
+        ledger.record_call({})
+
+        self.assertIsNone(ledger.remaining)
+        self.assertFalse(ledger.exhausted())
+
+    def test_seeded_from_headers(self):
+        """
+            Verify that the daily remaining header re-seeds the ledger and later calls count down from it
+        """
+        ledger = self.ledger()
+        ledger.record_call({'X-HubSpot-RateLimit-Daily': '250000',
+                            'X-HubSpot-RateLimit-Daily-Remaining': '103'})
+        self.assertEqual(ledger.remaining, 103)
+        self.assertFalse(ledger.exhausted())
+
+        for _ in range(3):
+            ledger.record_call({})
+
+        self.assertEqual(ledger.remaining, 100)
+        self.assertTrue(ledger.exhausted())
+        self.assertEqual(ledger.calls, 4)
+
+    def test_persisted_per_portal_and_day(self):
+        """
+            Verify that counts survive a restart on the same UTC day only, and portals are kept apart
+        """
+        ledger = self.ledger()
+        ledger.record_call({'X-HubSpot-RateLimit-Daily-Remaining': '500'})
+        ledger.record_call({})
+        ledger.save()
+        self.ledger(portal='other').save()
+
+        restarted = self.ledger()
+        self.assertEqual((restarted.calls, restarted.remaining), (2, 499))
+        with open(self.path) as ledger_file:
+            self.assertEqual(set(json.load(ledger_file)), {'portal', 'other'})
+
+        self.today.day = '2023-01-02'
+        self.assertIsNone(restarted.remaining)
+        self.assertEqual(self.ledger().calls, 0)
+
+
+class TestLowPriorityStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        ledger = QuotaLedger(os.path.join(self.directory.name, 'quota.json'), 'portal', reserve=100)
+        ledger.record_call({'X-HubSpot-RateLimit-Daily-Remaining': '100'})
+        for patcher in [mock.patch.object(tap_hubspot, 'QUOTA', ledger),
+                        mock.patch.dict(tap_hubspot.CONFIG, {'low_priority_streams': ['companies']})]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_low_priority_calls_are_refused(self):
+        """
+            Verify that low priority streams can't spend the reserve while other streams can
+        """
+        response = requests.Response()
+        response.status_code = 200
+        url = 'https://api.hubapi.com/companies/v2/companies/1'
+
+        with mock.patch.object(tap_hubspot, 'CURRENT_STREAM', 'companies'):
+            with self.assertRaises(tap_hubspot.QuotaReservedException):
+                tap_hubspot.send_request(url, lambda: response)
+
+        with mock.patch.object(tap_hubspot, 'CURRENT_STREAM', 'deals'):
+            self.assertIs(tap_hubspot.send_request(url, lambda: response), response)
+        self.assertEqual(tap_hubspot.QUOTA.remaining, 99)
+
+    def test_refusal_leaves_half_open_probe(self):
+        """
+            Verify that a call refused for the quota doesn't take the single probe of a half-open circuit breaker
+        """
+        clock = FakeClock()
+        registry = CircuitBreakerRegistry(enabled=True, failure_rate=0.5, window=4, min_calls=4,
+                                          reset_timeout=30, clock=clock)
+        breaker = registry.get('companies')
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 31
+        response = requests.Response()
+        response.status_code = 200
+        url = 'https://api.hubapi.com/companies/v2/companies/1'
+
+        with mock.patch.object(tap_hubspot, 'CIRCUIT_BREAKERS', registry):
+            with mock.patch.object(tap_hubspot, 'CURRENT_STREAM', 'companies'):
+                with self.assertRaises(tap_hubspot.QuotaReservedException):
+                    tap_hubspot.send_request(url, lambda: response)
+
+            with mock.patch.object(tap_hubspot, 'CURRENT_STREAM', 'deals'):
+                self.assertIs(tap_hubspot.send_request(url, lambda: response), response)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_quota_reserved_for(self):
+        """
+            Verify that only low priority streams are deferred once the reserve is reached
+        """
+        self.assertTrue(tap_hubspot.quota_reserved_for('companies'))
+        self.assertFalse(tap_hubspot.quota_reserved_for('contacts'))
@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.rate_limit import RateLimiter
+from tap_hubspot.tests.utils import FakeClock
+
+
+def rate_limit_headers(remaining, max_calls=100, interval_ms=10000):
+    return {'X-HubSpot-RateLimit-Max': str(max_calls),
+            'X-HubSpot-RateLimit-Remaining': str(remaining),
+            'X-HubSpot-RateLimit-Interval-Milliseconds': str(interval_ms),
+            'X-HubSpot-RateLimit-Daily': '500000',
+            'X-HubSpot-RateLimit-Daily-Remaining': '499000'}
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(headroom=0, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_no_wait_before_headers_are_seen(self):
+        """
+            Verify that calls are not paced until HubSpot reports a rate limit
+        """
+        for _ in range(1000):
+            self.assertEqual(self.limiter.acquire(), 0.0)
+
+    def test_waits_when_remaining_is_exhausted(self):
+        """
+            Verify that once the interval is used up, calls are spaced at max / interval
+        """
+        self.limiter.update(rate_limit_headers(remaining=1))
+
+        self.assertEqual(self.limiter.acquire(), 0.0)
+        # 100 calls per 10 seconds -> one token every 0.1 seconds
+        self.assertAlmostEqual(self.limiter.acquire(), 0.1)
+        self.assertAlmostEqual(self.limiter.acquire(), 0.1)
+        self.assertAlmostEqual(self.limiter.total_wait, 0.2)
+
+    def test_headroom_is_kept_unused(self):
+        """
+            Verify that the configured headroom is subtracted from the remaining calls
+        """
+        limiter = RateLimiter(headroom=5, clock=self.clock, sleep=self.clock.sleep)
+        limiter.update(rate_limit_headers(remaining=6))
+
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertGreater(limiter.acquire(), 0.0)
+
+    def test_daily_headers_are_recorded(self):
+        """
+            Verify that the daily limit headers are captured
+        """
+        self.limiter.update(rate_limit_headers(remaining=50))
+
+        self.assertEqual(self.limiter.daily_max, 500000)
+        self.assertEqual(self.limiter.daily_remaining, 499000)
+
+    def test_disabled_limiter_never_waits(self):
+        """
+            Verify that pacing can be switched off
+        """
+        limiter = RateLimiter(enabled=False, clock=self.clock, sleep=self.clock.sleep)
+        limiter.update(rate_limit_headers(remaining=0))
+
+        self.assertEqual(limiter.acquire(), 0.0)
+
+
+class TestRequestUpdatesRateLimiter(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.get_params_and_headers', return_value=({}, {}))
+    @mock.patch('requests.Session.send')
+    def test_request_reads_rate_limit_headers(self, mocked_send, mocked_params):
+        """
+            Verify that `request` feeds every response's headers to the rate limiter
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update(rate_limit_headers(remaining=42))
+        mocked_send.return_value = response
+
+        with mock.patch.object(tap_hubspot, 'RATE_LIMITER', RateLimiter()) as limiter:
+            tap_hubspot.request('https://api.hubapi.com/crm/v3/owners/')
+
+        self.assertEqual(limiter.capacity, 100 - limiter.headroom)
+        self.assertEqual(limiter.daily_remaining, 499000)
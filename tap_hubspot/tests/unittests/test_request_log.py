@@ -0,0 +1,96 @@
+import json
+import logging
+import threading
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.request_log import RequestTracer, redact_url
+
+
+class CapturingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = []
+
+    def emit(self, record):
+        self.records.append(record.getMessage())
+        self.threads.append(threading.current_thread())
+
+
+class TestRedactUrl(unittest.TestCase):
+
+    def test_credentials_are_masked(self):
+        """
+            Verify that credentials in the query string are masked
+        """
+        self.assertEqual(redact_url('https://api.hubapi.com/deals/v1/deal/paged?hapikey=secret&offset=1'),
+                         'https://api.hubapi.com/deals/v1/deal/paged?hapikey=***&offset=1')
+
+    def test_repeated_params_are_collapsed(self):
+        """
+            Verify that a long repeated param such as a contacts batch of vids is logged as a count
+        """
+        url = requests.Request('GET', 'https://api.hubapi.com/contacts/v1/contact/vids/batch/',
+                               params={'vid': list(range(100)), 'showListMemberships': True}).prepare().url
+
+        self.assertEqual(redact_url(url), 'https://api.hubapi.com/contacts/v1/contact/vids/batch/'
+                                          '?vid=[100 values]&showListMemberships=True')
+
+
+class TestRequestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = CapturingHandler()
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        self.addCleanup(root.removeHandler, self.handler)
+
+    def test_sampling_and_counts(self):
+        """
+            Verify that every request is counted but only the sampled share is logged
+        """
+        rand = mock.Mock(side_effect=[0.05, 0.5, 0.95, 0.2])
+        tracer = RequestTracer(sample_rate=0.1, rand=rand)
+
+        for status in [200, 200, 429]:
+            tracer.trace('GET', 'https://api.hubapi.com/crm/v3/owners/', status, 0.1)
+        tracer.trace('POST', 'https://api.hubapi.com/crm/v3/objects/deals/search', error='Timeout')
+
+        self.assertEqual(tracer.counts(), {('GET', '2xx'): 2, ('GET', '4xx'): 1, ('POST', 'Timeout'): 1})
+        self.assertEqual(len(self.handler.records), 1)
+
+    def test_records_are_written_by_listener_thread(self):
+        """
+            Verify that trace records are JSON lines written from the listener thread once started
+        """
+        tracer = RequestTracer()
+        tracer.start()
+        tracer.trace('GET', 'https://api.hubapi.com/crm/v3/owners/?hapikey=secret', 200, 0.25, stream='owners')
+        tracer.stop()
+
+        self.assertEqual(len(self.handler.records), 1)
+        self.assertIsNot(self.handler.threads[0], threading.current_thread())
+        message = self.handler.records[0]
+        self.assertTrue(message.startswith('request '))
+        self.assertEqual(json.loads(message[len('request '):]),
+                         {'method': 'GET', 'url': 'https://api.hubapi.com/crm/v3/owners/?hapikey=***',
+                          'status': 200, 'duration_ms': 250.0, 'stream': 'owners'})
+
+    def test_traced_send(self):
+        """
+            Verify that calls made through traced_send are traced with their status or error
+        """
+        tracer = RequestTracer(sample_rate=0)
+        response = requests.Response()
+        response.status_code = 200
+
+        with mock.patch.object(tap_hubspot, 'REQUEST_TRACER', tracer):
+            tap_hubspot.traced_send('GET', 'https://api.hubapi.com/crm/v3/owners/', lambda: response)
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                tap_hubspot.traced_send('GET', 'https://api.hubapi.com/crm/v3/owners/',
+                                        mock.Mock(side_effect=requests.exceptions.ConnectionError))
+
+        self.assertEqual(tracer.counts(), {('GET', '2xx'): 1, ('GET', 'ConnectionError'): 1})
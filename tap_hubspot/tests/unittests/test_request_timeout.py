@@ -2,6 +2,8 @@ import unittest
 import requests
 from unittest import mock
 import tap_hubspot
+from tap_hubspot.latency import LatencyTracker
+from tap_hubspot.timeouts import TimeoutPolicy
 class TestRequestTimeoutValue(unittest.TestCase):
 
     def test_integer_request_timeout_in_config(self):
@@ -93,7 +95,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         self.assertEqual(mocked_send.call_count, 5)
 
     @mock.patch('tap_hubspot.get_params_and_headers', return_value = ({}, {}))
-    @mock.patch('requests.post', side_effect = requests.exceptions.Timeout)
+    @mock.patch('tap_hubspot.transport.Transport.post', side_effect = requests.exceptions.Timeout)
     def test_request_timeout_backoff_for_post_search_endpoint(self, mocked_post, mocked_get, mocked_sleep):
         """
             Verify post_search_endpoint function is backoff for only 5 times on Timeout exception.
@@ -103,10 +105,10 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         except Exception:
             pass
 
-        # Verify that requests.post is called 5 times
+        # Verify that Transport.post is called 5 times
         self.assertEqual(mocked_post.call_count, 5)
 
-    @mock.patch('requests.post', side_effect = requests.exceptions.Timeout)
+    @mock.patch('tap_hubspot.transport.Transport.post', side_effect = requests.exceptions.Timeout)
     def test_request_timeout_backoff_for_acquire_access_token_from_refresh_token(self, mocked_post, mocked_sleep):
         """
             Verify request function is backoff for only 5 times instead of 25 times on Timeout exception that thrown from `acquire_access_token_from_refresh_token` method.
@@ -117,5 +119,86 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         except Exception:
             pass
 
-        # Verify that requests.post is called 5 times
+        # Verify that Transport.post is called 5 times
         self.assertEqual(mocked_post.call_count, 5)
+
+class TestTimeoutPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = LatencyTracker(min_samples=5)
+        self.policy = TimeoutPolicy(connect=10, read=300,
+                                    profiles={"/crm/v3/owners": {"connect": 2, "read": 30},
+                                              "/crm": {"read": 60},
+                                              "/email/": {"connect": 5}})
+
+    def test_profiles_by_longest_prefix(self):
+        """
+            Verify that the longest matching path prefix overrides the default connect and read timeouts
+        """
+        self.assertEqual(self.policy.timeouts('https://api.hubapi.com/crm/v3/owners/'), (2.0, 30.0))
+        self.assertEqual(self.policy.timeouts('https://api.hubapi.com/crm/v3/objects/deals'), (10.0, 60.0))
+        self.assertEqual(self.policy.timeouts('https://api.hubapi.com/email/public/v1/events'), (5.0, 300.0))
+        self.assertEqual(self.policy.timeouts('https://api.hubapi.com/crmx/v1'), (10.0, 300.0))
+
+    def test_adaptive_read_timeout(self):
+        """
+            Verify that the adaptive read timeout follows p99 * factor between the minimum and configured read timeout
+        """
+        policy = TimeoutPolicy(connect=10, read=300, tracker=self.tracker, factor=3, minimum=10)
+        url = 'https://api.hubapi.com/companies/v2/companies/1'
+        self.assertEqual(policy.timeouts(url), (10.0, 300.0))
+
+        for _ in range(5):
+            self.tracker.record('/companies/v2/companies/{id}', 20)
+        self.assertEqual(policy.timeouts(url), (10.0, 60.0))
+
+        for _ in range(500):
+            self.tracker.record('/companies/v2/companies/{id}', 1)
+        self.assertEqual(policy.timeouts(url), (10.0, 10.0))
+
+        for _ in range(500):
+            self.tracker.record('/companies/v2/companies/{id}', 200)
+        self.assertEqual(policy.timeouts(url), (10.0, 300.0))
+
+    def test_scalar_timeout_by_default(self):
+        """
+            Verify that the single `request_timeout` value is used unless per endpoint timeouts are configured
+        """
+        with mock.patch.dict(tap_hubspot.CONFIG, {"request_timeout": 100}):
+            tap_hubspot.configure_timeouts()
+            self.assertEqual(tap_hubspot.get_request_timeouts('https://api.hubapi.com/crm/v3/owners/'), 100.0)
+
+            with mock.patch.dict(tap_hubspot.CONFIG, {"connect_timeout": 5}):
+                tap_hubspot.configure_timeouts()
+                self.assertEqual(tap_hubspot.get_request_timeouts('https://api.hubapi.com/crm/v3/owners/'),
+                                 (5.0, 100.0))
+        tap_hubspot.configure_timeouts()
+
+    @mock.patch('time.sleep')
+    @mock.patch('tap_hubspot.get_params_and_headers', return_value=({}, {}))
+    @mock.patch('requests.Session.send')
+    def test_endpoint_slowing_down_past_adaptive_timeout(self, mocked_send, mocked_params, mocked_sleep):
+        """
+            Verify that an endpoint slowing down after its latencies filled the window gets its configured read timeout back
+        """
+        def send(prepared, timeout=None, **kwargs):
+            # The endpoint now takes 15 seconds
+            if timeout[1] < 15:
+                raise requests.exceptions.ReadTimeout()
+            response = requests.Response()
+            response.status_code = 200
+            return response
+
+        mocked_send.side_effect = send
+        url = 'https://api.hubapi.com/companies/v2/companies/1'
+        for _ in range(500):
+            self.tracker.record('/companies/v2/companies/{id}', 1)
+        policy = TimeoutPolicy(connect=10, read=300, tracker=self.tracker, factor=3, minimum=10)
+        self.assertEqual(policy.timeouts(url), (10.0, 10.0))
+
+        with mock.patch.object(tap_hubspot, 'TIMEOUT_POLICY', policy), \
+             mock.patch.object(tap_hubspot, 'LATENCY', self.tracker):
+            self.assertEqual(tap_hubspot.request(url).status_code, 200)
+
+        self.assertEqual([call[1]['timeout'] for call in mocked_send.call_args_list], [(10.0, 10.0), (10.0, 300.0)])
+        self.assertEqual(policy.timeouts(url), (10.0, 10.0))
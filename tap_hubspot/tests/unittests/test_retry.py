@@ -0,0 +1,134 @@
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.retry import (RetryPolicy, SleepLedger, build_policies, classify,
+                               parse_retry_after, with_retries)
+
+
+def http_error(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(response=response)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_wait_is_jittered_below_exponential_cap(self):
+        """
+            Verify that waits are drawn between 0 and base * factor ** (failures - 1), capped at max_delay
+        """
+        policy = RetryPolicy(base_delay=1, max_delay=5, factor=2)
+        for failures, cap in [(1, 1), (2, 2), (3, 4), (4, 5), (10, 5)]:
+            for _ in range(50):
+                self.assertTrue(0 <= policy.wait(failures) <= cap)
+
+    def test_retry_after_sets_the_minimum_wait(self):
+        """
+            Verify that a Retry-After value is waited out, up to the policy's max_delay
+        """
+        policy = RetryPolicy(base_delay=1, max_delay=10)
+
+        self.assertGreaterEqual(policy.wait(1, retry_after=7), 7)
+        self.assertEqual(policy.wait(1, retry_after=86400), 10)
+
+    def test_config_overrides_defaults(self):
+        """
+            Verify that `retry_policies` from the config only override the given values
+        """
+        policies = build_policies({'rate_limit': {'max_tries': 8}})
+
+        self.assertEqual(policies['rate_limit'].max_tries, 8)
+        self.assertEqual(policies['rate_limit'].max_delay, 60.0)
+        self.assertEqual(policies['server_error'], build_policies()['server_error'])
+
+
+class TestClassification(unittest.TestCase):
+
+    def test_classify(self):
+        """
+            Verify that failures are sorted into the 429, 5xx and timeout classes
+        """
+        self.assertEqual(classify(http_error(429)), 'rate_limit')
+        self.assertEqual(classify(http_error(502)), 'server_error')
+        self.assertEqual(classify(requests.exceptions.Timeout()), 'timeout')
+        self.assertEqual(classify(requests.exceptions.ConnectionError()), 'timeout')
+
+    def test_parse_retry_after(self):
+        """
+            Verify that Retry-After is read in seconds and as an HTTP date
+        """
+        self.assertEqual(parse_retry_after(http_error(429, {'Retry-After': '3'})), 3.0)
+        self.assertEqual(parse_retry_after(http_error(429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})), 0.0)
+        self.assertIsNone(parse_retry_after(http_error(429)))
+        self.assertIsNone(parse_retry_after(requests.exceptions.Timeout()))
+
+
+@mock.patch('time.sleep')
+class TestWithRetries(unittest.TestCase):
+
+    def setUp(self):
+        self.ledger = SleepLedger()
+        self.gave_up = []
+
+    def decorate(self, func, policies=None):
+        return with_retries((requests.exceptions.RequestException,),
+                            get_policies=lambda: policies or build_policies(),
+                            giveup=tap_hubspot.giveup,
+                            on_giveup=self.gave_up.append,
+                            on_backoff=lambda details: self.ledger.add('deals', details['wait']))(func)
+
+    def test_each_class_has_its_own_budget(self, mocked_sleep):
+        """
+            Verify that a 429 and a 502 each count against their own policy
+        """
+        errors = iter([http_error(429), http_error(502), http_error(429)])
+        def flaky():
+            error = next(errors, None)
+            if error:
+                raise error
+            return 'ok'
+
+        policies = build_policies({'rate_limit': {'max_tries': 3}, 'server_error': {'max_tries': 2}})
+
+        self.assertEqual(self.decorate(flaky, policies)(), 'ok')
+        self.assertEqual(self.gave_up, [])
+        self.assertEqual(mocked_sleep.call_count, 3)
+
+    def test_gives_up_after_max_tries(self, mocked_sleep):
+        """
+            Verify that the call is tried `max_tries` times and `on_giveup` receives the details
+        """
+        func = mock.Mock(side_effect=requests.exceptions.Timeout, __name__='func')
+
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.decorate(func)('url', {})
+
+        self.assertEqual(func.call_count, 5)
+        self.assertEqual(mocked_sleep.call_count, 4)
+        self.assertEqual(self.gave_up[0]['tries'], 5)
+        self.assertEqual(self.gave_up[0]['args'], ('url', {}))
+        self.assertAlmostEqual(self.ledger.get('deals'), sum(c[0][0] for c in mocked_sleep.call_args_list))
+
+    def test_client_errors_are_not_retried(self, mocked_sleep):
+        """
+            Verify that 4xx responses other than 429 give up immediately
+        """
+        func = mock.Mock(side_effect=http_error(404), __name__='func')
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.decorate(func)()
+
+        self.assertEqual(func.call_count, 1)
+        mocked_sleep.assert_not_called()
+
+    def test_retry_after_is_honoured(self, mocked_sleep):
+        """
+            Verify that a 429 waits at least the Retry-After value
+        """
+        func = mock.Mock(side_effect=[http_error(429, {'Retry-After': '12'}), 'ok'], __name__='func')
+
+        self.assertEqual(self.decorate(func)(), 'ok')
+        self.assertGreaterEqual(mocked_sleep.call_args[0][0], 12)
@@ -0,0 +1,177 @@
+import collections
+import copy
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.tests.standin_server import (Cassette, Recorder, StandinServer, SyntheticPortal,
+                                              match_endpoint)
+
+
+def select_everything(catalog):
+    for stream in catalog['streams']:
+        for entry in stream['metadata']:
+            entry['metadata']['selected'] = True
+    return catalog
+
+
+class TestSyntheticPortal(unittest.TestCase):
+
+    def test_every_endpoint_is_served(self):
+        """
+            Verify that every ENDPOINTS entry is matched to its own synthetic response
+        """
+        portal = SyntheticPortal(pages=1, page_size=2)
+        for name, path in tap_hubspot.ENDPOINTS.items():
+            path = path.format(company_id=1, deal_id=1, campaign_id=1, object_name='standin_object_0')
+            self.assertEqual(match_endpoint(path)[0], name)
+            self.assertTrue(hasattr(portal, '_' + name), name)
+
+    def test_payload_size(self):
+        """
+            Verify that the record count follows the page options and the payload size the value size
+        """
+        small = SyntheticPortal(pages=2, page_size=5, value_size=10)
+        large = SyntheticPortal(pages=2, page_size=5, value_size=100)
+        params = {'properties': ''}
+
+        status, _, body = small.respond('GET', '/crm/v4/objects/tickets', params, b'')
+        page = json.loads(body)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(page['results']), 5)
+        self.assertEqual(page['paging'], {'next': {'after': '5'}})
+        self.assertGreater(len(large.respond('GET', '/crm/v4/objects/tickets', params, b'')[2]), 2 * len(body))
+
+
+class TestStandinServer(unittest.TestCase):
+
+    def sync_messages(self, portal, state=None, streams=None, **config):
+        server = StandinServer(portal).start()
+        self.addCleanup(server.stop)
+        config.update({'base_url': server.base_url, 'hapikey': 'standin', 'start_date': '2023-12-31T00:00:00Z',
+                       'email_chunk_size': 10 * 365 * 24 * 60 * 60 * 1000,
+                       'subscription_chunk_size': 10 * 365 * 24 * 60 * 60 * 1000})
+        self.addCleanup(tap_hubspot.configure_base_url)
+        self.addCleanup(tap_hubspot.configure_engine)
+        stdout = io.StringIO()
+
+        with mock.patch.dict(tap_hubspot.CONFIG, config), \
+             mock.patch.object(tap_hubspot, 'STREAMS', list(tap_hubspot.STREAMS)), \
+             mock.patch('sys.stdout', stdout):
+            tap_hubspot.configure_base_url()
+            tap_hubspot.configure_engine()
+            catalog = select_everything(tap_hubspot.discover_schemas())
+            if streams:
+                catalog['streams'] = [stream for stream in catalog['streams'] if stream['tap_stream_id'] in streams]
+            tap_hubspot.do_sync(copy.deepcopy(state or {}), catalog)
+            tap_hubspot.WRITER.flush()
+
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def sync_offline(self, **config):
+        records = collections.defaultdict(list)
+        for message in self.sync_messages(SyntheticPortal(pages=2, page_size=3, property_count=3), **config):
+            if message['type'] == 'RECORD':
+                records[message['stream']].append(message['record'])
+        return records
+
+    def test_do_sync_offline(self):
+        """
+            Verify that a full discover and sync runs against the stand-in server
+        """
+        records = self.sync_offline()
+
+        self.assertEqual({stream: len(rows) for stream, rows in records.items()}, {**{stream: 6 for stream in [
+            'subscription_changes', 'email_events', 'contacts', 'deals', 'companies', 'tickets', 'owners',
+            'forms', 'workflows', 'contact_lists', 'engagements', 'campaigns', 'deal_pipelines',
+            'standin_object_0']}, 'contacts_by_company': 12})
+        self.assertIn('property_hs_v2_date_entered_closedwon', records['deals'][0])
+
+    def test_do_sync_offline_with_prefetch(self):
+        """
+            Verify that prefetching pages emits the same records in the same order
+        """
+        self.assertEqual(self.sync_offline(prefetch_pages=2), self.sync_offline())
+
+    def test_do_sync_offline_with_pipeline(self):
+        """
+            Verify that syncing through the staged pipeline emits the same records in the same order
+        """
+        self.assertEqual(self.sync_offline(pipeline_queue_size=2), self.sync_offline())
+
+    def test_do_sync_offline_with_transform_processes(self):
+        """
+            Verify that transforming records in worker processes emits the same records in the same order
+        """
+        self.assertEqual(self.sync_offline(transform_processes=2), self.sync_offline())
+
+    def test_contacts_resume_with_max_concurrency(self):
+        """
+            Verify that a contacts sync resumed from any of its states, with concurrent detail fetches, misses no contact
+        """
+        portal = SyntheticPortal(pages=3, page_size=4, property_count=3)
+        messages = self.sync_messages(portal, streams=['contacts'], max_concurrency=2)
+        vids = [message['record']['vid'] for message in messages if message['type'] == 'RECORD']
+        self.assertEqual(vids, list(range(1, 13)))
+
+        emitted = set()
+        resumed_from = 0
+        for message in messages:
+            if message['type'] == 'RECORD':
+                emitted.add(message['record']['vid'])
+            elif message['type'] == 'STATE' and message['value'].get('bookmarks', {}).get('contacts', {}).get('offset'):
+                state = message['value']
+                resumed = self.sync_messages(portal, state=state, streams=['contacts'], max_concurrency=2)
+                resumed_vids = {message['record']['vid'] for message in resumed if message['type'] == 'RECORD'}
+                self.assertEqual(emitted | resumed_vids, set(vids))
+                resumed_from += 1
+        self.assertEqual(resumed_from, 2)
+
+    def test_injected_latency(self):
+        """
+            Verify that every response is delayed by the configured latency
+        """
+        with StandinServer(SyntheticPortal(), latency=0.2) as server:
+            started = time.monotonic()
+            resp = requests.get(server.base_url + '/crm/v3/owners/')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    def test_record_and_replay(self):
+        """
+            Verify that recorded calls are replayed identically and without credentials
+        """
+        path = os.path.join(tempfile.mkdtemp(), 'cassette.json')
+        calls = [('GET', '/crm/v3/owners/?hapikey=secret&limit=100', None),
+                 ('POST', '/crm/v3/objects/deals/batch/read?hapikey=secret',
+                  {'inputs': [{'id': '1'}], 'properties': ['hs_v2_date_entered_closedwon']})]
+
+        with StandinServer(SyntheticPortal()) as upstream:
+            recorder = Recorder(Cassette(), upstream=upstream.base_url)
+            with StandinServer(recorder) as server:
+                recorded = [requests.request(method, server.base_url + url, json=body).json()
+                            for method, url, body in calls]
+                token = requests.post(server.base_url + '/oauth/v1/token',
+                                      data={'grant_type': 'refresh_token', 'refresh_token': 'secret'}).json()
+            recorder.cassette.save(path)
+
+        with StandinServer(Cassette.load(path)) as server:
+            replayed = [requests.request(method, server.base_url + url.replace('secret', 'other'), json=body).json()
+                        for method, url, body in calls]
+            replayed_token = requests.post(server.base_url + '/oauth/v1/token',
+                                           data={'grant_type': 'refresh_token', 'refresh_token': 'other'}).json()
+            missing = requests.get(server.base_url + '/crm/v3/owners/?limit=1')
+
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(replayed_token, token)
+        self.assertEqual(missing.status_code, 404)
+        with open(path) as cassette_file:
+            self.assertNotIn('secret', cassette_file.read())
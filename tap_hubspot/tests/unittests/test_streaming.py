@@ -0,0 +1,184 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot.retry import RetryPolicy
+from tap_hubspot.streaming import BufferedPage, StreamingPage
+
+PAGE = {
+    "has-more": True,
+    "contacts": [
+        {"vid": 12345, "properties": {"firstname": {"value": "Zoë ☃"}}, "score": 1.5e3},
+        {"vid": 67890, "is-contact": False, "merged-vids": [], "identity": None},
+        {"vid": 1, "nested": {"a": [1, 2, {"b": "]},{"}]}},
+    ],
+    "vid-offset": 1234567,
+    "paging": {"next": {"after": "MTAw"}},
+}
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestStreamingPage(unittest.TestCase):
+
+    def test_rows_and_continuation_keys_match_json_loads(self):
+        """
+            Verify that rows and continuation keys are decoded exactly as json.loads would, for any chunking
+        """
+        body = json.dumps(PAGE, ensure_ascii=False).encode('utf-8')
+        for size in [1, 2, 3, 7, 64, len(body)]:
+            page = StreamingPage(chunked(body, size), 'contacts')
+
+            self.assertEqual(list(page.rows()), PAGE['contacts'])
+            self.assertEqual(page.data, {k: v for k, v in PAGE.items() if k != 'contacts'})
+
+    def test_numbers_split_across_chunks(self):
+        """
+            Verify that a number split over two chunks is not cut short
+        """
+        page = StreamingPage([b'{"offset": 12', b'34, "results": [56', b'78]}'], 'results')
+
+        self.assertEqual(list(page.rows()), [5678])
+        self.assertEqual(page.data, {'offset': 1234})
+
+    def test_large_rows_are_not_decoded_per_chunk(self):
+        """
+            Verify that a row spanning many chunks is decoded a logarithmic number of times, not once per chunk
+        """
+        row = {'vid': 1, 'properties': {'property_{}'.format(i): {'value': 'x' * 20} for i in range(2000)}}
+        body = json.dumps({'contacts': [row], 'has-more': False}).encode('utf-8')
+        page = StreamingPage(chunked(body, 64), 'contacts')
+        decoder = mock.Mock(wraps=page._json_decoder)
+        page._json_decoder = decoder
+
+        self.assertEqual(list(page.rows()), [row])
+        self.assertGreater(len(body) // 64, 1000)
+        self.assertLess(decoder.raw_decode.call_count, 20)
+
+    def test_first_row_is_yielded_before_body_is_read(self):
+        """
+            Verify that the first row is available without reading the rest of the body
+        """
+        def chunks():
+            yield b'{"results": [{"id": "1"},'
+            raise AssertionError("read past the first row")
+
+        self.assertEqual(next(StreamingPage(chunks(), 'results').rows()), {'id': '1'})
+
+    def test_missing_path_raises(self):
+        """
+            Verify that a body without the rows key raises the same error as the buffered path
+        """
+        page = StreamingPage([b'{"status": "error", "message": "nope"}'], 'results')
+
+        with self.assertRaises(RuntimeError) as ctx:
+            list(page.rows())
+        self.assertIn('results not in', str(ctx.exception))
+
+        with self.assertRaises(RuntimeError):
+            BufferedPage({'status': 'error'}, 'results')
+
+    def test_top_level_values_when_path_is_none(self):
+        """
+            Verify that a contacts detail body keyed by vid yields its values
+        """
+        page = StreamingPage([b'{"1": {"vid": 1}, "2": {"vid": 2}}'], None)
+
+        self.assertEqual(list(page.rows()), [{'vid': 1}, {'vid': 2}])
+
+    def test_response_is_closed(self):
+        """
+            Verify that the response is closed once the rows are consumed
+        """
+        resp = mock.Mock()
+        resp.iter_content.return_value = [b'{"results": [], "paging": null}']
+
+        page = StreamingPage.from_response(resp, 'results')
+        self.assertEqual(list(page.rows()), [])
+
+        resp.close.assert_called_once_with()
+        self.assertEqual(page.data, {'paging': None})
+
+
+class TestGetPage(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.request')
+    def test_streaming_is_opt_in(self, mocked_request):
+        """
+            Verify that pages are only streamed when `stream_json` is configured
+        """
+        mocked_request.return_value.json.return_value = {'results': [1]}
+        mocked_request.return_value.iter_content.return_value = [b'{"results": [2]}']
+
+        tap_hubspot.CONFIG.pop('stream_json', None)
+        self.assertEqual(list(tap_hubspot.get_page('url', {}, 'results', stream=True).rows()), [1])
+
+        tap_hubspot.CONFIG['stream_json'] = True
+        try:
+            self.assertEqual(list(tap_hubspot.get_page('url', {}, 'results', stream=True).rows()), [2])
+            self.assertEqual(list(tap_hubspot.get_page('url', {}, 'results', stream=False).rows()), [1])
+        finally:
+            tap_hubspot.CONFIG.pop('stream_json')
+
+
+def dropped_response(*chunks):
+    # Response whose connection drops after sending `chunks`
+    def iter_content(chunk_size=None):
+        yield from chunks
+        raise requests.exceptions.ChunkedEncodingError('Connection broken')
+    return mock.Mock(iter_content=iter_content)
+
+
+def complete_response(body):
+    return mock.Mock(iter_content=mock.Mock(return_value=[body]))
+
+
+@mock.patch.dict('tap_hubspot.CONFIG', {'stream_json': True})
+@mock.patch.object(tap_hubspot, 'RETRY_POLICIES', {name: RetryPolicy(base_delay=0)
+                                                   for name in ('rate_limit', 'server_error', 'timeout')})
+class TestDroppedConnections(unittest.TestCase):
+
+    @mock.patch('tap_hubspot.request')
+    def test_page_requested_again_when_dropped_before_first_row(self, mocked_request):
+        """
+            Verify that a streamed page whose connection drops before its first row is read is requested again
+        """
+        mocked_request.side_effect = [dropped_response(b'{"results": [{"id"'),
+                                      complete_response(b'{"results": [{"id": "1"}, {"id": "2"}]}')]
+
+        page = tap_hubspot.get_page('url', {}, 'results', stream=True)
+
+        self.assertEqual(list(page.rows()), [{'id': '1'}, {'id': '2'}])
+        self.assertEqual(mocked_request.call_count, 2)
+
+    @mock.patch('tap_hubspot.request')
+    def test_drop_after_first_row_is_raised(self, mocked_request):
+        """
+            Verify that a connection dropped once rows were handed out is raised rather than duplicating them
+        """
+        mocked_request.return_value = dropped_response(b'{"results": [{"id": "1"}, {"id"')
+
+        rows = tap_hubspot.get_page('url', {}, 'results', stream=True).rows()
+
+        self.assertEqual(next(rows), {'id': '1'})
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            next(rows)
+        self.assertEqual(mocked_request.call_count, 1)
+
+    @mock.patch('tap_hubspot.request')
+    def test_contacts_detail_batch_read_in_full_and_retried(self, mocked_request):
+        """
+            Verify that a streamed contacts detail batch is read in full by its request, and requested again if dropped
+        """
+        complete = complete_response(b'{"1": {"vid": 1}, "2": {"vid": 2}}')
+        mocked_request.side_effect = [dropped_response(b'{"1": {"vid": 1}, "2"'), complete]
+
+        pages = tap_hubspot.request_contacts_detail([1, 2], stream=True)
+
+        complete.close.assert_called_once_with()
+        self.assertEqual([row for page in pages for row in page.rows()], [{'vid': 1}, {'vid': 2}])
+        self.assertEqual(mocked_request.call_count, 2)
@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+import tap_hubspot
+from tap_hubspot import token_cache
+from tap_hubspot.auth import TokenManager
+from tap_hubspot.token_cache import TokenCache
+from tap_hubspot.tests.utils import FakeClock
+
+CONFIG = {'client_id': 'client', 'client_secret': 'secret', 'refresh_token': 'refresh', 'hapikey': None}
+
+
+@unittest.skipIf(token_cache.Fernet is None, "cryptography is not installed")
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.clock = FakeClock(start=1000.0)
+
+    def cache(self, client_secret='secret', refresh_token='refresh'):
+        return TokenCache(self.directory.name, 'client', client_secret, refresh_token, clock=self.clock)
+
+    def test_round_trip(self):
+        """
+            Verify that a saved token is loaded back with its remaining lifetime, and is not stored in clear
+        """
+        self.cache().save('access-token', 1800)
+        self.clock.now += 300
+
+        self.assertEqual(self.cache().load(), ('access-token', 1500))
+        with open(self.cache().path, 'rb') as cache_file:
+            self.assertNotIn(b'access-token', cache_file.read())
+
+    def test_expiring_token_is_not_returned(self):
+        """
+            Verify that a token valid for less than `min_remaining` seconds is not returned
+        """
+        self.cache().save('access-token', 1800)
+        self.clock.now += 1300
+
+        self.assertIsNone(self.cache().load(min_remaining=600))
+
+    def test_other_credentials_do_not_share_tokens(self):
+        """
+            Verify that tokens are keyed by refresh token and can't be decrypted with another client secret
+        """
+        self.cache().save('access-token', 1800)
+
+        self.assertIsNone(self.cache(refresh_token='other').load())
+
+        other_secret = self.cache(client_secret='other')
+        self.assertEqual(other_secret.path, self.cache().path)
+        self.assertIsNone(other_secret.load())
+
+    def test_malformed_entry_is_a_miss(self):
+        """
+            Verify that a cache that decrypts but lacks `expires_at`, or holds a non-numeric one, is ignored
+        """
+        cache = self.cache()
+        for entry in [{'access_token': 'access-token'}, {'access_token': 'access-token', 'expires_at': 'soon'},
+                      {'access_token': 'access-token', 'expires_at': None}, ['access-token']]:
+            with self.subTest(entry=entry):
+                with open(cache.path, 'wb') as cache_file:
+                    cache_file.write(cache._fernet.encrypt(json.dumps(entry).encode('utf-8')))
+
+                self.assertIsNone(cache.load())
+
+    def test_unwritable_directory_is_ignored(self):
+        """
+            Verify that failing to write the cache does not fail the sync
+        """
+        path = os.path.join(self.directory.name, 'file')
+        with open(path, 'w'):
+            pass
+        cache = TokenCache(path, 'client', 'secret', 'refresh', clock=self.clock)
+
+        cache.save('access-token', 1800)
+        self.assertIsNone(cache.load())
+
+    @mock.patch('tap_hubspot.acquire_access_token_from_refresh_token', return_value=('fresh-token', 1800))
+    def test_fetch_access_token_uses_cache_first(self, mocked_acquire):
+        """
+            Verify that the first token of a run comes from the cache and later ones from HubSpot
+        """
+        self.cache().save('cached-token', 1800)
+
+        with mock.patch.object(tap_hubspot, 'TOKEN_CACHE', self.cache()), \
+             mock.patch.dict(tap_hubspot.CONFIG, {'access_token': None, 'token_expires': None}):
+            self.assertEqual(tap_hubspot.fetch_access_token(), ('cached-token', 1800))
+            mocked_acquire.assert_not_called()
+
+            self.assertEqual(tap_hubspot.fetch_access_token(), ('fresh-token', 1800))
+            mocked_acquire.assert_called_once_with()
+
+        self.assertEqual(self.cache().load(), ('fresh-token', 1800))
+
+    @mock.patch('tap_hubspot.get_request_timeouts', return_value=(1, 1))
+    @mock.patch('tap_hubspot.acquire_access_token_from_refresh_token', return_value=('fresh-token', 1800))
+    @mock.patch('requests.Session.send')
+    def test_rejected_cached_token_is_evicted(self, mocked_send, mocked_acquire, mocked_timeouts):
+        """
+            Verify that a 401 to the cached token drops it from the cache and the call is made again with a fresh one
+        """
+        def send(prepared, **kwargs):
+            response = requests.Response()
+            response.status_code = 200 if prepared.headers['Authorization'] == 'Bearer fresh-token' else 401
+            return response
+
+        mocked_send.side_effect = send
+        self.cache().save('cached-token', 1800)
+
+        with mock.patch.object(tap_hubspot, 'TOKEN_CACHE', self.cache()), \
+             mock.patch.object(tap_hubspot, 'CACHED_TOKEN_HEADER', None), \
+             mock.patch.object(tap_hubspot, 'TOKEN_MANAGER',
+                               TokenManager(tap_hubspot.fetch_access_token, timer_factory=mock.MagicMock())), \
+             mock.patch.dict(tap_hubspot.CONFIG, {**CONFIG, 'access_token': None, 'token_expires': None}):
+            resp = tap_hubspot.request('https://api.hubapi.com/crm/v3/owners/')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([call[0][0].headers['Authorization'] for call in mocked_send.call_args_list],
+                         ['Bearer cached-token', 'Bearer fresh-token'])
+        mocked_acquire.assert_called_once_with()
+        self.assertEqual(self.cache().load(), ('fresh-token', 1800))
+
+
+class TestTokenCacheConfig(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        """
+            Verify that no cache is used unless `token_cache_path` is configured
+        """
+        self.assertIsNone(TokenCache.from_config(CONFIG))
+
+    def test_disabled_without_cryptography(self):
+        """
+            Verify that a warning is logged and no cache is used when cryptography is missing
+        """
+        with mock.patch.object(token_cache, 'Fernet', None), \
+             mock.patch.object(token_cache.LOGGER, 'warning') as mocked_warning:
+            self.assertIsNone(TokenCache.from_config({**CONFIG, 'token_cache_path': '/tmp'}))
+        mocked_warning.assert_called_once()
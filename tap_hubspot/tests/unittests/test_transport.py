@@ -0,0 +1,115 @@
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from tap_hubspot.streaming import StreamingPage
+from tap_hubspot.transport import Transport
+
+BODY = json.dumps({'results': [{'id': str(i), 'properties': {'dealname': 'Deal'}} for i in range(200)]}).encode()
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = BODY
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, *args): # pylint: disable=arguments-differ
+        pass
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{}/crm/v3/objects/deals/batch/read'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_and_post_share_connections(self):
+        """
+            Verify that GET and POST calls go through the same pool and reuse its connection
+        """
+        transport = Transport()
+
+        transport.send(requests.Request('GET', self.url).prepare(), timeout=5)
+        transport.post(self.url, json={'inputs': []}, timeout=5)
+        transport.post(self.url, json={'inputs': []}, timeout=5)
+
+        self.assertEqual(transport.connection_stats(),
+                         {'requests': 3, 'new_connections': 1, 'reused_connections': 2})
+        transport.close()
+
+    def test_keep_alive_disabled(self):
+        """
+            Verify that every call opens a new connection when keep-alive is disabled
+        """
+        transport = Transport(keep_alive=False)
+
+        for _ in range(3):
+            transport.post(self.url, json={'inputs': []}, timeout=5)
+
+        self.assertEqual(transport.connection_stats()['new_connections'], 3)
+        transport.close()
+
+    def test_compressed_responses_are_counted(self):
+        """
+            Verify that gzip is negotiated and both wire and decoded bytes are recorded under the tag
+        """
+        transport = Transport()
+
+        resp = transport.send(requests.Request('GET', self.url).prepare(), tag='deals', timeout=5)
+        self.assertEqual(resp.json(), json.loads(BODY))
+        self.assertIn('gzip', resp.request.headers['Accept-Encoding'])
+
+        transferred = transport.transfer.get('deals')
+        self.assertEqual(transferred['compressed'], len(gzip.compress(BODY)))
+        self.assertEqual(transferred['uncompressed'], len(BODY))
+        self.assertEqual(transport.transfer.get('contacts'), {'compressed': 0, 'uncompressed': 0})
+        transport.close()
+
+    def test_streamed_responses_are_counted_when_closed(self):
+        """
+            Verify that a streamed body is decompressed into the page decoder and counted once closed
+        """
+        transport = Transport()
+
+        resp = transport.send(requests.Request('GET', self.url).prepare(), tag='deals', stream=True, timeout=5)
+        rows = list(StreamingPage.from_response(resp, 'results').rows())
+
+        self.assertEqual(rows, json.loads(BODY)['results'])
+        self.assertEqual(transport.transfer.get('deals'),
+                         {'compressed': len(gzip.compress(BODY)), 'uncompressed': len(BODY)})
+        transport.close()
+
+    def test_compression_disabled(self):
+        """
+            Verify that only identity encoding is accepted when compression is disabled
+        """
+        transport = Transport(compression=False)
+
+        transport.post(self.url, json={'inputs': []}, tag='deals', timeout=5)
+
+        self.assertEqual(transport.transfer.get('deals'), {'compressed': len(BODY), 'uncompressed': len(BODY)})
+        transport.close()
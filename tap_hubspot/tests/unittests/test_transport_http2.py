@@ -0,0 +1,149 @@
+import json
+import socket
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from tap_hubspot.streaming import StreamingPage
+from tap_hubspot.transport_http2 import Http2Transport, http2_available
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    h2 = None
+
+
+class H2Server:
+    """
+    Plain text HTTP/2 (prior knowledge) server answering every request with
+    a JSON page echoing its method, path and body.
+    """
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        self.connections = 0
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(client,), daemon=True).start()
+
+    def handle(self, client):
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        client.sendall(conn.data_to_send())
+        requests_by_stream = {}
+        with client:
+            while True:
+                data = client.recv(65535)
+                if not data:
+                    return
+                for event in conn.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        headers = dict(event.headers)
+                        requests_by_stream[event.stream_id] = [headers, b'']
+                    elif isinstance(event, h2.events.DataReceived):
+                        requests_by_stream[event.stream_id][1] += event.data
+                        conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        headers, body = requests_by_stream.pop(event.stream_id)
+                        self.respond(conn, event.stream_id, headers, body)
+                client.sendall(conn.data_to_send())
+
+    @staticmethod
+    def respond(conn, stream_id, headers, body):
+        payload = json.dumps({'results': [{'id': str(i)} for i in range(3)],
+                              'method': headers[b':method'].decode(),
+                              'path': headers[b':path'].decode(),
+                              'body': body.decode()}).encode()
+        status = b'429' if b'/ratelimited' in headers[b':path'] else b'200'
+        conn.send_headers(stream_id, [(b':status', status), (b'content-type', b'application/json'),
+                                      (b'content-length', str(len(payload)).encode()),
+                                      (b'x-hubspot-ratelimit-remaining', b'99')])
+        conn.send_data(stream_id, payload, end_stream=True)
+
+    def close(self):
+        self.sock.close()
+
+
+@unittest.skipUnless(http2_available() and h2 is not None, "httpx with HTTP/2 support is not installed")
+class TestHttp2Transport(unittest.TestCase):
+
+    def setUp(self):
+        self.server = H2Server()
+        self.addCleanup(self.server.close)
+        self.url = 'http://127.0.0.1:{}/crm/v3/objects/deals'.format(self.server.port)
+        self.transport = Http2Transport(pool_maxsize=4)
+        self.addCleanup(self.transport.close)
+
+    def test_get_and_post(self):
+        """
+            Verify that GET and POST return requests responses with the body, status and headers
+        """
+        resp = self.transport.send(requests.Request('GET', self.url, params={'limit': 2}).prepare(),
+                                   tag='deals', timeout=5)
+        self.assertIsInstance(resp, requests.Response)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-HubSpot-RateLimit-Remaining'], '99')
+        self.assertEqual(resp.json()['path'], '/crm/v3/objects/deals?limit=2')
+
+        resp = self.transport.post(self.url + '/search', json={'limit': 100}, timeout=(5, 5))
+        self.assertEqual(resp.json()['method'], 'POST')
+        self.assertEqual(json.loads(resp.json()['body']), {'limit': 100})
+
+        self.assertGreater(self.transport.transfer.get('deals')['uncompressed'], 0)
+
+    def test_error_status_raises_requests_error(self):
+        """
+            Verify that raise_for_status raises the requests HTTPError used by the retry logic
+        """
+        resp = self.transport.send(requests.Request('GET', self.url + '/ratelimited').prepare(), timeout=5)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            resp.raise_for_status()
+
+    def test_streamed_page(self):
+        """
+            Verify that a streamed response feeds the incremental page decoder
+        """
+        resp = self.transport.send(requests.Request('GET', self.url).prepare(), stream=True, timeout=5)
+
+        rows = list(StreamingPage.from_response(resp, 'results').rows())
+
+        self.assertEqual(rows, [{'id': '0'}, {'id': '1'}, {'id': '2'}])
+
+    def test_concurrent_requests_share_a_connection(self):
+        """
+            Verify that concurrent calls are multiplexed over one connection
+        """
+        self.transport.send(requests.Request('GET', self.url).prepare(), timeout=5)
+
+        with ThreadPoolExecutor(8) as executor:
+            statuses = list(executor.map(
+                lambda _: self.transport.send(requests.Request('GET', self.url).prepare(), timeout=5).status_code,
+                range(32)))
+
+        self.assertEqual(statuses, [200] * 32)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.transport.connection_stats(),
+                         {'requests': 33, 'new_connections': 1, 'reused_connections': 32})
+
+    def test_connection_errors_are_requests_exceptions(self):
+        """
+            Verify that httpx errors surface as the requests exceptions the tap retries on
+        """
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            Http2Transport().send(requests.Request('GET', 'http://127.0.0.1:1/').prepare(), timeout=5)
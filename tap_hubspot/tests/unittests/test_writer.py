@@ -0,0 +1,129 @@
+import io
+import json
+import time
+import unittest
+from unittest import mock
+
+import singer
+import tap_hubspot
+from tap_hubspot.writer import MessageWriter
+
+
+class FakeStdout(io.TextIOWrapper):
+    def __init__(self):
+        self.raw_output = io.BytesIO()
+        super().__init__(self.raw_output, encoding='utf-8')
+
+    def messages(self):
+        self.flush()
+        return [json.loads(line) for line in self.raw_output.getvalue().splitlines()]
+
+
+class TestMessageWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = FakeStdout()
+        self.written = []
+        original_write = self.stdout.buffer.write
+
+        def write(data):
+            self.written.append(bytes(data))
+            return original_write(data)
+
+        patcher = mock.patch.object(self.stdout.buffer, 'write', side_effect=write)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('sys.stdout', self.stdout)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, i):
+        return singer.RecordMessage(stream='deals', record={'dealId': i})
+
+    def test_records_written_in_batches(self):
+        """
+            Verify that records are written together once the buffer is full, and nothing is lost on flush
+        """
+        writer = MessageWriter(buffer_size=200, flush_interval=60)
+        for i in range(10):
+            writer.write_message(self.record(i))
+        writes_before_flush = len(self.written)
+        writer.flush()
+
+        self.assertEqual(writes_before_flush, 3)
+        self.assertEqual(len(self.written), 4)
+        self.assertTrue(all(len(data) <= 200 for data in self.written))
+        self.assertEqual([message['record']['dealId'] for message in self.stdout.messages()], list(range(10)))
+
+    def test_state_flushes_records_before_it(self):
+        """
+            Verify that a state is written right away, after the records buffered before it
+        """
+        writer = MessageWriter(buffer_size=1 << 16, flush_interval=60)
+        writer.write_message(self.record(1))
+        self.assertEqual(self.written, [])
+
+        writer.write_state({'bookmarks': {'deals': {'offset': 1}}})
+
+        self.assertEqual(len(self.written), 1)
+        self.assertEqual([message['type'] for message in self.stdout.messages()], ['RECORD', 'STATE'])
+
+    @mock.patch('tap_hubspot.writer.time.monotonic')
+    def test_flush_interval(self, mocked_monotonic):
+        """
+            Verify that buffered records are written once the oldest of them has waited the flush interval
+        """
+        mocked_monotonic.return_value = 100.0
+        writer = MessageWriter(buffer_size=1 << 16, flush_interval=1)
+        self.addCleanup(writer.close)
+        writer.write_message(self.record(1))
+        mocked_monotonic.return_value = 100.5
+        writer.write_message(self.record(2))
+        self.assertEqual(self.written, [])
+
+        mocked_monotonic.return_value = 101.0
+        writer.write_message(self.record(3))
+        self.assertEqual(len(self.written), 1)
+
+    def test_flushed_without_further_messages(self):
+        """
+            Verify that buffered records are written once due even when no other message follows
+        """
+        writer = MessageWriter(buffer_size=1 << 16, flush_interval=0.05)
+        self.addCleanup(writer.close)
+        writer.write_message(self.record(1))
+        self.assertEqual(self.written, [])
+
+        deadline = time.monotonic() + 5
+        while not self.written and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.written), 1)
+        self.assertEqual([message['record']['dealId'] for message in self.stdout.messages()], [1])
+
+    def test_unbuffered(self):
+        """
+            Verify that with no buffer every message is written on its own, large ones included
+        """
+        writer = MessageWriter(buffer_size=0)
+        writer.write_message(self.record(1))
+        writer.write_message(singer.RecordMessage(stream='deals', record={'dealId': 2, 'notes': 'x' * 1000}))
+
+        self.assertEqual(len(self.written), 2)
+        self.assertEqual(len(self.stdout.messages()), 2)
+
+    def test_sync_functions_write_through_the_writer(self):
+        """
+            Verify that schemas, records and states are written by the tap's writer, in order
+        """
+        with mock.patch.object(tap_hubspot, 'WRITER', MessageWriter()):
+            tap_hubspot.write_schema('deals', {'type': 'object'}, 'dealId', ['hs_lastmodifieddate'], 'hubspot_deals')
+            tap_hubspot.write_record('deals', {'dealId': 1})
+            self.assertEqual(self.written, [])
+            tap_hubspot.write_state({'currently_syncing': 'deals'})
+
+        self.assertEqual(self.stdout.messages(), [
+            {'type': 'SCHEMA', 'stream': 'hubspot_deals', 'schema': {'type': 'object'},
+             'key_properties': ['dealId'], 'bookmark_properties': ['hs_lastmodifieddate']},
+            {'type': 'RECORD', 'stream': 'deals', 'record': {'dealId': 1}},
+            {'type': 'STATE', 'value': {'currently_syncing': 'deals'}}])
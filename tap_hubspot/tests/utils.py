@@ -78,3 +78,19 @@ def write_to_singer():
     singer.write_state = our_write_state
     singer.write_record = our_write_record
     singer.write_schema = our_write_schema
+
+
+class FakeClock:
+    """
+    Stand-in for `time.monotonic`, at `start` seconds until a test moves
+    `now` forward, by hand or through `sleep`.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
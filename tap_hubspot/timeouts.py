@@ -0,0 +1,72 @@
+"""
+Connect and read timeouts by endpoint.
+"""
+import threading
+import urllib.parse
+
+from tap_hubspot.latency import endpoint_key
+
+DEFAULT_ADAPTIVE_FACTOR = 3.0
+DEFAULT_ADAPTIVE_MIN = 10.0
+ADAPTIVE_PERCENTILE = 0.99
+
+
+class TimeoutPolicy:
+    """
+    Picks the `(connect, read)` timeout pair for a url.
+
+    `profiles` maps url path prefixes, e.g. `/crm/v3/owners` or `/email`,
+    to `{"connect": seconds, "read": seconds}` overrides of the defaults; the
+    longest matching prefix wins. When `tracker` is given, the read timeout
+    of endpoints with enough recorded latencies is lowered to their p99
+    times `factor`, but never below `minimum` or above the configured read
+    timeout, so stuck calls are abandoned and retried sooner. Calls cut by
+    the read timeout are reported through `record_timeout`. They count as
+    latencies of the timeout they hit, and the endpoint gets its configured
+    read timeout back until a call to it succeeds. An endpoint that slows
+    down past its adaptive timeout then isn't failed on every retry.
+    """
+
+    def __init__(self, connect, read, profiles=None, tracker=None,
+                 factor=DEFAULT_ADAPTIVE_FACTOR, minimum=DEFAULT_ADAPTIVE_MIN):
+        self.connect = connect
+        self.read = read
+        self.profiles = sorted(((prefix.rstrip('/'), profile) for prefix, profile in (profiles or {}).items()),
+                               key=lambda item: len(item[0]), reverse=True)
+        self.tracker = tracker
+        self.factor = factor
+        self.minimum = minimum
+        self._lock = threading.Lock()
+        # Endpoints whose last call hit its read timeout
+        self._timed_out = set()
+
+    def _profile(self, path):
+        for prefix, profile in self.profiles:
+            if path == prefix or path.startswith(prefix + '/'):
+                return profile
+        return {}
+
+    def timeouts(self, url):
+        profile = self._profile(urllib.parse.urlsplit(url).path)
+        connect = float(profile.get('connect') or self.connect)
+        read = float(profile.get('read') or self.read)
+
+        key = endpoint_key(url)
+        if self.tracker is not None and key not in self._timed_out:
+            p99 = self.tracker.percentile(key, ADAPTIVE_PERCENTILE)
+            if p99 is not None:
+                read = min(read, max(p99 * self.factor, self.minimum))
+        return connect, read
+
+    def record_timeout(self, url, read):
+        key = endpoint_key(url)
+        if self.tracker is not None:
+            self.tracker.record(key, read)
+        with self._lock:
+            self._timed_out.add(key)
+
+    def record_success(self, url):
+        key = endpoint_key(url)
+        if key in self._timed_out:
+            with self._lock:
+                self._timed_out.discard(key)
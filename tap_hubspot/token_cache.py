@@ -0,0 +1,104 @@
+"""
+Encrypted on-disk cache of the OAuth access token, so consecutive runs with
+the same credentials can skip the token round trip.
+
+Each client_id/refresh_token pair gets its own file in the cache directory,
+named after a hash of the pair and encrypted with a key derived from the
+client secret and refresh token, so the file is useless without the
+credentials that produced it. Encryption needs the optional `cryptography`
+package; without it the cache is disabled with a warning.
+"""
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import singer
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError: # pragma: no cover
+    Fernet = None
+
+LOGGER = singer.get_logger()
+
+
+def _digest(*parts):
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).digest()
+
+
+class TokenCache:
+    """
+    `load(min_remaining)` returns a cached `(access_token, expires_in)` pair
+    when the token is valid for more than `min_remaining` seconds, and `save`
+    stores a freshly acquired one. Read and write errors are logged and
+    otherwise ignored: the cache only ever saves a round trip.
+    """
+
+    def __init__(self, directory, client_id, client_secret, refresh_token, clock=time.time):
+        self.path = os.path.join(directory, '{}.token'.format(_digest(client_id, refresh_token).hex()))
+        self.clock = clock
+        self._fernet = Fernet(base64.urlsafe_b64encode(_digest(client_secret, refresh_token)))
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build the cache configured by `token_cache_path`, or return None when
+        it isn't configured, the tap uses an API key, or `cryptography` is
+        missing.
+        """
+        directory = config.get('token_cache_path')
+        if not directory or config.get('hapikey'):
+            return None
+        if Fernet is None:
+            LOGGER.warning("token_cache_path is set but the cryptography package is not installed, "
+                           "access tokens will not be cached")
+            return None
+        return cls(directory, config['client_id'], config['client_secret'], config['refresh_token'])
+
+    def load(self, min_remaining=0):
+        try:
+            with open(self.path, 'rb') as cache_file:
+                entry = json.loads(self._fernet.decrypt(cache_file.read()))
+            access_token, expires_at = entry['access_token'], float(entry['expires_at'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError, InvalidToken) as ex:
+            LOGGER.warning("Ignoring unreadable token cache %s: %s", self.path, type(ex).__name__)
+            return None
+
+        expires_in = expires_at - self.clock()
+        if expires_in <= min_remaining:
+            return None
+        return access_token, expires_in
+
+    def clear(self):
+        """
+        Forget the cached token, e.g. once HubSpot has rejected it.
+        """
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as ex:
+            LOGGER.warning("Could not remove token cache %s: %s", self.path, ex)
+
+    def save(self, access_token, expires_in):
+        entry = json.dumps({'access_token': access_token,
+                            'expires_at': self.clock() + expires_in}).encode('utf-8')
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename so concurrent runs never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as tmp_file:
+                    tmp_file.write(self._fernet.encrypt(entry))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as ex:
+            LOGGER.warning("Could not write token cache %s: %s", self.path, ex)
@@ -0,0 +1,88 @@
+"""
+Transformation of records in worker processes, for streams whose records
+are too large for one core to keep up with HubSpot and stdout.
+
+Every worker is started with the stream's schema and metadata once, and is
+then sent chunks of raw rows to transform. Results are collected in the
+order the chunks were submitted, so records keep the order they were
+fetched in. The fields a worker's transformer removed or filtered out are
+merged back into the transformer of the sync, which logs them as usual.
+"""
+import multiprocessing
+import time
+
+_worker = None
+
+
+class TransformFailed(Exception):
+    pass
+
+
+def _start_worker(prepare, transformer_class, integer_datetime_fmt, schema, mdata):
+    global _worker # pylint: disable=global-statement
+    _worker = (prepare, transformer_class(integer_datetime_fmt), schema, mdata)
+
+
+def _transform_rows(rows):
+    prepare, transformer, schema, mdata = _worker
+    start = time.monotonic()
+    try:
+        records = [transformer.transform(prepare(row), schema, mdata) for row in rows]
+    except Exception as ex: # pylint: disable=broad-except
+        # Not every exception survives the trip back, SchemaMismatch can't be rebuilt from its message
+        raise TransformFailed('{}: {}'.format(type(ex).__name__, ex)) from None
+    removed, transformer.removed = transformer.removed, set()
+    filtered, transformer.filtered = transformer.filtered, set()
+    return records, time.monotonic() - start, removed, filtered
+
+
+def _context():
+    # Workers aren't forked from the tap itself, as its other threads may hold locks at that moment
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class PendingChunk:
+    def __init__(self, result, transformer):
+        self._result = result
+        self._transformer = transformer
+
+    def get(self):
+        """
+        The transformed records of the chunk and the seconds the worker
+        spent on them, waiting for the worker if need be.
+        """
+        records, seconds, removed, filtered = self._result.get()
+        self._transformer.removed.update(removed)
+        self._transformer.filtered.update(filtered)
+        return records, seconds
+
+
+class TransformPool:
+    """
+    `processes` workers doing `transformer.transform(prepare(row), schema,
+    mdata)`. `prepare` must be a module level function so it can be sent to
+    the workers.
+    """
+
+    def __init__(self, processes, transformer, schema, mdata, prepare):
+        self._transformer = transformer
+        self._pool = _context().Pool(processes, _start_worker,
+                                     (prepare, type(transformer), transformer.integer_datetime_fmt, schema, mdata))
+
+    def submit(self, rows):
+        """
+        Start transforming a list of rows, returning a `PendingChunk`.
+        """
+        return PendingChunk(self._pool.apply_async(_transform_rows, (rows,)), self._transformer)
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,204 @@
+"""
+Pooled HTTP transport shared by every call the tap makes to HubSpot.
+"""
+import collections
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from tap_hubspot import codec
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+
+def _brotli_available():
+    # urllib3 decodes `br` bodies only when one of these is installed
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+ACCEPT_ENCODING = 'gzip, deflate, br' if _brotli_available() else 'gzip, deflate'
+
+
+class TransferLedger:
+    """
+    Thread safe totals of response body bytes, as received on the wire
+    (`compressed`) and after content decoding (`uncompressed`), by tag.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = collections.defaultdict(lambda: [0, 0])
+
+    def add(self, key, compressed, uncompressed):
+        with self._lock:
+            totals = self._totals[key]
+            totals[0] += compressed
+            totals[1] += uncompressed
+
+    def get(self, key):
+        with self._lock:
+            compressed, uncompressed = self._totals.get(key, (0, 0))
+            return {'compressed': compressed, 'uncompressed': uncompressed}
+
+    def totals(self):
+        with self._lock:
+            return {key: {'compressed': compressed, 'uncompressed': uncompressed}
+                    for key, (compressed, uncompressed) in self._totals.items()}
+
+
+def _wire_bytes(resp):
+    try:
+        return resp.raw.tell()
+    except AttributeError:
+        return 0
+
+
+class JsonResponse(requests.Response):
+    """
+    Response whose `json()` decodes UTF-8 bodies with the tap's codec,
+    falling back to `requests` for anything else.
+
+    Streamed bodies are decompressed chunk by chunk as they are iterated, and
+    their byte counts are added to the transport's ledger (and passed to any
+    other `on_close` hook) once the response is closed.
+    """
+    _body_bytes = None
+    _close_hooks = None
+
+    def _track_transfer(self, ledger, tag):
+        self.on_close(lambda wire_bytes, body_bytes: ledger.add(tag, wire_bytes, body_bytes))
+
+    def on_close(self, hook):
+        """
+        Call `hook(wire_bytes, body_bytes)` once this streamed response is
+        closed.
+        """
+        if self._close_hooks is None:
+            self._close_hooks = []
+            self._body_bytes = [0]
+        self._close_hooks.append(hook)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        chunks = super().iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode)
+        if self._body_bytes is None or decode_unicode:
+            return chunks
+        return self._count_chunks(chunks, self._body_bytes)
+
+    @staticmethod
+    def _count_chunks(chunks, counter):
+        for chunk in chunks:
+            counter[0] += len(chunk)
+            yield chunk
+
+    def close(self):
+        if self._close_hooks:
+            hooks, self._close_hooks = self._close_hooks, []
+            for hook in hooks:
+                hook(_wire_bytes(self), self._body_bytes[0])
+        super().close()
+
+    def json(self, **kwargs):
+        if not kwargs and (self.encoding or 'utf-8').lower() in ('utf-8', 'utf8'):
+            try:
+                return codec.loads(self.content)
+            except ValueError:
+                pass
+        return super().json(**kwargs)
+
+
+def _counting_pool_class(pool_cls, on_connect):
+    """
+    Subclass `pool_cls` so that every socket its connections open, including
+    reconnects of a pooled connection object, is reported to `on_connect`.
+    """
+    class CountingConnection(pool_cls.ConnectionCls):
+        def connect(self):
+            super().connect()
+            on_connect()
+
+    return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': CountingConnection})
+
+
+class Transport:
+    """
+    Owns the `requests.Session` and the connection pool behind it so GET and
+    POST calls (including OAuth token refreshes) reuse the same keep-alive
+    connections.
+
+    `pool_connections` is the number of per-host pools kept around and
+    `pool_maxsize` the number of connections kept open to a single host.
+    Compressed responses are requested unless `compression` is False, and
+    body sizes are recorded in `transfer` under the `tag` given to `send`.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True, compression=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.transfer = TransferLedger()
+
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+        self._new_connections = 0
+
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize)
+        self.adapter.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self._record_connection),
+            'https': _counting_pool_class(HTTPSConnectionPool, self._record_connection),
+        }
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        # Requests prepared outside the session don't pick up its default
+        # headers, so `send` sets these on every request itself
+        self.headers = {'Accept-Encoding': ACCEPT_ENCODING if compression else 'identity'}
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
+    def _record_connection(self):
+        with self._lock:
+            self._new_connections += 1
+
+    def _record_request(self):
+        with self._lock:
+            self._requests_sent += 1
+
+    def send(self, prepared_request, tag=None, **kwargs):
+        prepared_request.headers.update(self.headers)
+        self._record_request()
+        resp = self.session.send(prepared_request, **kwargs)
+        resp.__class__ = JsonResponse
+        if kwargs.get('stream'):
+            resp._track_transfer(self.transfer, tag) # pylint: disable=protected-access
+        else:
+            self.transfer.add(tag, _wire_bytes(resp), len(resp.content or b''))
+        return resp
+
+    def post(self, url, data=None, json=None, params=None, headers=None, **kwargs): # pylint: disable=too-many-arguments
+        # Prepared and sent like GET requests so both verbs are keyed to the same pool
+        req = requests.Request('POST', url, data=data, json=json, params=params, headers=headers)
+        return self.send(self.session.prepare_request(req), **kwargs)
+
+    def connection_stats(self):
+        """
+        Returns the number of requests sent, connections opened and
+        requests that reused an already open connection.
+        """
+        with self._lock:
+            return {'requests': self._requests_sent,
+                    'new_connections': self._new_connections,
+                    'reused_connections': max(self._requests_sent - self._new_connections, 0)}
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,177 @@
+"""
+HTTP/2 transport backend built on the optional `httpx` package (installed
+with its `http2` extra).
+
+It has the same interface as `tap_hubspot.transport.Transport` and returns
+`requests` responses and raises `requests` exceptions, so the rest of the
+tap, including retries, can't tell which backend is in use. Concurrent
+calls to a host are multiplexed over a single connection instead of
+needing one connection each.
+"""
+import threading
+import weakref
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from tap_hubspot.transport import (ACCEPT_ENCODING, DEFAULT_POOL_MAXSIZE, JsonResponse,
+                                   TransferLedger, _wire_bytes)
+
+try:
+    import httpx
+    import h2 # pylint: disable=unused-import
+except ImportError: # pragma: no cover
+    httpx = None
+
+
+def http2_available():
+    return httpx is not None
+
+
+def _timeout(timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def _requests_exception(ex, prepared_request):
+    if isinstance(ex, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(ex, request=prepared_request)
+    if isinstance(ex, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(ex, request=prepared_request)
+    return requests.exceptions.ConnectionError(ex, request=prepared_request)
+
+
+class _StreamedBody:
+    """
+    File-like `raw` of a streamed response, reading the decoded body from
+    the httpx response.
+    """
+
+    def __init__(self, resp, prepared_request):
+        self._resp = resp
+        self._prepared_request = prepared_request
+        self._chunks = resp.iter_bytes()
+        self._buffer = b''
+
+    def read(self, size=-1, **kwargs): # pylint: disable=unused-argument
+        try:
+            while size < 0 or len(self._buffer) < size:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._buffer += chunk
+        except httpx.TransportError as ex:
+            raise _requests_exception(ex, self._prepared_request) from ex
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def tell(self):
+        return self._resp.num_bytes_downloaded
+
+    def close(self):
+        self._resp.close()
+
+    def release_conn(self):
+        self._resp.close()
+
+
+class _ReadBody:
+    """
+    `raw` of a buffered response, only reporting the bytes received.
+    """
+
+    def __init__(self, num_bytes_downloaded):
+        self._num_bytes_downloaded = num_bytes_downloaded
+
+    def tell(self):
+        return self._num_bytes_downloaded
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class Http2Transport:
+    """
+    Drop-in replacement for `Transport` speaking HTTP/2 (negotiated with
+    ALPN on https, assumed with prior knowledge on plain http). At most
+    `pool_maxsize` connections are opened per host; `pool_connections` and
+    `keep_alive` are accepted for compatibility only, as HTTP/2 connections
+    are always persistent and shared.
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True, # pylint: disable=unused-argument
+                 compression=True):
+        if httpx is None:
+            raise RuntimeError("HTTP/2 needs the httpx package with its http2 extra")
+        self.pool_maxsize = pool_maxsize
+        self.transfer = TransferLedger()
+        self.headers = {'Accept-Encoding': ACCEPT_ENCODING if compression else 'identity'}
+        self.client = httpx.Client(http1=False, http2=True, follow_redirects=True,
+                                   limits=httpx.Limits(max_connections=pool_maxsize,
+                                                       max_keepalive_connections=pool_maxsize))
+
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+        self._new_connections = 0
+        self._connections = weakref.WeakSet()
+
+    def _record(self, resp):
+        stream = resp.extensions.get('network_stream')
+        with self._lock:
+            self._requests_sent += 1
+            if stream is not None and stream not in self._connections:
+                self._connections.add(stream)
+                self._new_connections += 1
+
+    def send(self, prepared_request, tag=None, stream=False, timeout=None, **kwargs): # pylint: disable=unused-argument
+        headers = {**prepared_request.headers, **self.headers}
+        request = self.client.build_request(prepared_request.method, prepared_request.url,
+                                            headers=headers, content=prepared_request.body,
+                                            timeout=_timeout(timeout))
+        try:
+            resp = self.client.send(request, stream=stream)
+            if not stream:
+                resp.read()
+        except httpx.TransportError as ex:
+            raise _requests_exception(ex, prepared_request) from ex
+        self._record(resp)
+
+        out = JsonResponse()
+        out.status_code = resp.status_code
+        out.headers = CaseInsensitiveDict(resp.headers)
+        out.url = str(resp.url)
+        out.reason = resp.reason_phrase
+        out.request = prepared_request
+        out.encoding = get_encoding_from_headers(out.headers)
+        if stream:
+            out.raw = _StreamedBody(resp, prepared_request)
+            out._track_transfer(self.transfer, tag) # pylint: disable=protected-access
+        else:
+            out.raw = _ReadBody(resp.num_bytes_downloaded)
+            out._content = resp.content # pylint: disable=protected-access
+            out._content_consumed = True # pylint: disable=protected-access
+            out.elapsed = resp.elapsed
+            self.transfer.add(tag, _wire_bytes(out), len(resp.content))
+        return out
+
+    def post(self, url, data=None, json=None, params=None, headers=None, **kwargs): # pylint: disable=too-many-arguments
+        req = requests.Request('POST', url, data=data, json=json, params=params, headers=headers)
+        return self.send(req.prepare(), **kwargs)
+
+    def connection_stats(self):
+        with self._lock:
+            return {'requests': self._requests_sent,
+                    'new_connections': self._new_connections,
+                    'reused_connections': max(self._requests_sent - self._new_connections, 0)}
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,118 @@
+"""
+Buffered writer of Singer messages to stdout.
+
+`singer.write_message` writes and flushes every message on its own, which
+costs a write and a flush syscall per record. `MessageWriter` serialises
+messages into one preallocated buffer instead, and writes it out once the
+next message doesn't fit, once the oldest buffered message has waited
+`flush_interval` seconds (checked by a background thread, so records don't
+sit in the buffer through a long HTTP wait or backoff), or right after a
+STATE message. A target never
+sees a state before the records it covers, and a tap that dies loses at
+most the records after the last state, which the next run syncs again.
+"""
+import sys
+import threading
+import time
+
+import singer
+
+from tap_hubspot import codec
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class MessageWriter:
+    """
+    Thread safe writer of Singer messages, buffering up to `buffer_size`
+    bytes of them. With a `buffer_size` of 0, every message is written as
+    soon as it is serialised.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = bytearray(buffer_size)
+        self._length = 0
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._flusher = None
+        self._closed = False
+
+    def write_message(self, message):
+        line = codec.format_message(message) + b'\n'
+        with self._cond:
+            self._append(line)
+            if self._length and time.monotonic() - self._oldest >= self.flush_interval:
+                self._flush()
+
+    def write_state(self, value):
+        """
+        Write a STATE message along with every message buffered before it.
+        """
+        line = codec.format_message(singer.StateMessage(value=value)) + b'\n'
+        with self._cond:
+            self._append(line)
+            self._flush()
+
+    def flush(self):
+        with self._cond:
+            self._flush()
+
+    def close(self):
+        """
+        Write out the buffer and stop the background flushes.
+        """
+        with self._cond:
+            self._flush()
+            self._closed = True
+            self._cond.notify_all()
+
+    def _append(self, line):
+        if self._length + len(line) > self.buffer_size:
+            self._flush()
+        if len(line) > self.buffer_size:
+            self._write(line)
+            return
+        if not self._length:
+            self._oldest = time.monotonic()
+            self._start_flusher()
+            self._cond.notify_all()
+        self._buffer[self._length:self._length + len(line)] = line
+        self._length += len(line)
+
+    def _start_flusher(self):
+        if self._flusher is None and self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_when_due, name='message-writer', daemon=True)
+            self._flusher.start()
+
+    def _flush_when_due(self):
+        with self._cond:
+            while not self._closed:
+                if not self._length:
+                    self._cond.wait()
+                    continue
+                due_in = self._oldest + self.flush_interval - time.monotonic()
+                if due_in > 0:
+                    self._cond.wait(due_in)
+                else:
+                    self._flush()
+
+    def _flush(self):
+        if self._length:
+            with memoryview(self._buffer) as view:
+                self._write(view[:self._length])
+            self._length = 0
+
+    @staticmethod
+    def _write(data):
+        out = getattr(sys.stdout, 'buffer', None)
+        if out is None:
+            sys.stdout.write(bytes(data).decode('utf-8'))
+            sys.stdout.flush()
+            return
+        # Anything written through the text layer must go out before these bytes
+        sys.stdout.flush()
+        out.write(data)
+        out.flush()